@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Local Control Channel
+
+A lean framed protocol over a Unix domain socket for the UI's command
+stream to the WebSocket server. Each frame is a 4-byte big-endian length
+followed by a UTF-8 JSON payload. The connection is persistent, so sending
+a command costs one write instead of a WebSocket handshake.
+
+Overlays keep using the WebSocket; this channel is only for the local UI.
+Unix domain sockets aren't available everywhere (e.g. older Windows
+Pythons), so callers should check is_supported() and fall back.
+"""
+
+import asyncio
+import json
+import os
+import select
+import socket
+import struct
+import threading
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+def is_supported():
+    """Return True if Unix domain sockets can be used on this platform."""
+    return hasattr(socket, "AF_UNIX") and hasattr(asyncio, "start_unix_server")
+
+
+def default_socket_path():
+    """Return the default control socket path, next to the server script."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), ".server.sock")
+
+
+def encode_frame(payload):
+    """Encode a JSON message string as a length-prefixed frame."""
+    data = payload.encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+
+async def read_frame(reader):
+    """Read one frame from an asyncio StreamReader. Returns None at EOF."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+        (length,) = HEADER.unpack(header)
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"Control frame too large ({length} bytes)")
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+class ControlServer:
+    """Unix socket listener that passes each decoded frame to handle_message(data)."""
+
+    def __init__(self, path, handle_message, logger):
+        self.path = path
+        self.handle_message = handle_message
+        self.logger = logger
+        self.server = None
+        self._writers = set()
+
+    async def start(self):
+        # Remove a stale socket left behind by a crashed server
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.server = await asyncio.start_unix_server(self._handle_connection, self.path)
+        os.chmod(self.path, 0o600)
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    data = await read_frame(reader)
+                except (ValueError, json.JSONDecodeError) as e:
+                    self.logger.warning(f"Invalid control frame: {e}")
+                    break
+                if data is None:
+                    break
+                # A command that fails mustn't cost the sender its connection
+                try:
+                    await self.handle_message(data)
+                except Exception:
+                    self.logger.exception(f"Error handling control frame: {str(data)[:200]}")
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def close(self):
+        """Stop listening and disconnect clients, so they reconnect to whoever owns the path now."""
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+
+async def start_control_server(path, handle_message, logger):
+    """Start a ControlServer on path and return it."""
+    server = ControlServer(path, handle_message, logger)
+    await server.start()
+    return server
+
+
+class ControlClient:
+    """Blocking, thread-safe client for the control channel."""
+
+    def __init__(self, path, timeout=2.0):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        self._sock = sock
+
+    def send(self, payload):
+        """Send one JSON message string, reconnecting once if the connection dropped.
+
+        Raises OSError if the server can't be reached.
+        """
+        frame = encode_frame(payload)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is not None and self._peer_closed():
+                        self._close_socket()
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(frame)
+                    return
+                except OSError:
+                    self._close_socket()
+                    if attempt:
+                        raise
+
+    def _peer_closed(self):
+        """Return True if the server closed the connection (e.g. it was reloaded).
+
+        Checked before each send, so a command is never written into a
+        connection nobody will read.
+        """
+        # select() rather than MSG_DONTWAIT: with a timeout set, recv() first
+        # waits up to the timeout for the socket to become readable
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            return bool(readable) and self._sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _close_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        with self._lock:
+            self._close_socket()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Persistent TTL Cache
+
+A small JSON-file-backed key/value cache with per-entry expiry and a size
+cap, used for YouTube search results and video metadata so repeated
+lookups don't cost API quota or network round trips.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLDiskCache:
+    """Dict-like cache persisted to a JSON file.
+
+    Entries older than ttl seconds are treated as missing. When more than
+    max_entries are stored, the oldest are evicted. Writes are batched:
+    set() only marks the cache dirty, and flush() writes it out atomically.
+    Entries are kept oldest first, so eviction doesn't sort.
+    """
+
+    def __init__(self, path, ttl, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # One writer at a time
+        self._entries = OrderedDict()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                self._entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1]["time"]))
+        except Exception as e:
+            print(f"Error loading cache {self.path}: {e}")
+            self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if time.time() - entry["time"] > self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                return default
+            return entry["value"]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def set(self, key, value):
+        """Store value under key. Call flush() to persist."""
+        with self._lock:
+            self._entries[key] = {"time": time.time(), "value": value}
+            self._entries.move_to_end(key)
+            self._dirty = True
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, values):
+        """Store several key/value pairs at once."""
+        for key, value in values.items():
+            self.set(key, value)
+
+    def flush(self):
+        """Write the cache to disk if it changed."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                now = time.time()
+                while self._entries and now - next(iter(self._entries.values()))["time"] > self.ttl:
+                    self._entries.popitem(last=False)
+                # Serialized under the lock: set() may run on other threads meanwhile
+                data = json.dumps(self._entries, ensure_ascii=False)
+                self._dirty = False
+
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                                suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.path)))
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"Error saving cache {self.path}: {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._dirty = True
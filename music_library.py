@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+SQLite Music Library
+
+Optional storage backend for very large libraries (50k+ tracks). Instead of
+parsing and rewriting one big JSON file, tracks live in an indexed SQLite
+table that supports paginated reads and transactional batch writes.
+
+The library keeps the playlist order in a contiguous "position" column.
+On first use it migrates saved_playlist.json automatically.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    position INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    source TEXT,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_video_id ON tracks (video_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_title ON tracks (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tracks_author ON tracks (author COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tracks_added_at ON tracks (added_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Rows fetched per round trip when streaming the whole library
+READ_CHUNK_SIZE = 1000
+
+
+def track_to_row(track, position, added_at):
+    """Convert a playlist entry dict to a tracks table row."""
+    video_id = track.get("id", "")
+    return (
+        position,
+        video_id,
+        track.get("title", f"Video {video_id}"),
+        track.get("author", "Unknown Artist"),
+        track.get("source"),
+        added_at
+    )
+
+
+def row_to_track(row):
+    """Convert a tracks table row back to a playlist entry dict.
+
+    added_at stays in the database: entries go out to overlays as they are.
+    """
+    _, video_id, title, author, source, _ = row
+    track = {"id": video_id, "title": title, "author": author}
+    if source:
+        track["source"] = source
+    return track
+
+
+class MusicLibrary:
+    """Ordered track library stored in SQLite.
+
+    A single connection is shared behind a lock, so the library can be used
+    from the UI thread and scheduler workers alike.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def count(self):
+        """Return the number of tracks in the library."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def page(self, offset, limit):
+        """Return up to limit tracks starting at playlist position offset."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM tracks WHERE position >= ? ORDER BY position LIMIT ?",
+                (offset, limit)
+            ).fetchall()
+        return [row_to_track(row) for row in rows]
+
+    def iter_tracks(self, chunk_size=READ_CHUNK_SIZE):
+        """Yield every track in playlist order, reading one page at a time."""
+        offset = 0
+        while True:
+            tracks = self.page(offset, chunk_size)
+            if not tracks:
+                return
+            yield from tracks
+            offset += len(tracks)
+
+    def find_positions(self, video_id):
+        """Return the playlist positions holding a video ID."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position FROM tracks WHERE video_id = ? ORDER BY position",
+                (video_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def append_tracks(self, tracks):
+        """Append tracks to the end of the library in one transaction."""
+        now = time.time()
+        with self._lock, self._conn:
+            start = self._conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM tracks").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?)",
+                (track_to_row(track, start + i, now) for i, track in enumerate(tracks))
+            )
+
+    def remove_at(self, position):
+        """Remove the track at a position and close the gap."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tracks WHERE position = ?", (position,))
+            # Shift in ascending order so the primary key never collides
+            self._conn.execute(
+                "UPDATE tracks SET position = -(position - 1) WHERE position > ?", (position,))
+            self._conn.execute("UPDATE tracks SET position = -position WHERE position < 0")
+
+    def save_playlist(self, tracks):
+        """Make the library match an in-memory playlist, writing as little as possible.
+
+        Rows are compared in order and only the tail after the first
+        difference is rewritten, so the common case of appending an import
+        only inserts the new tracks.
+
+        Returns:
+            The number of rows written.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            first_diff = 0
+            cursor = self._conn.execute(
+                "SELECT video_id, title, author, source FROM tracks ORDER BY position")
+            for existing in cursor:
+                if first_diff >= len(tracks):
+                    break
+                track = tracks[first_diff]
+                if existing != (track.get("id", ""), track.get("title"), track.get("author"), track.get("source")):
+                    break
+                first_diff += 1
+            cursor.close()
+
+            # Rewritten rows that were already in the library keep their added_at
+            added_at = dict(self._conn.execute(
+                "SELECT video_id, MIN(added_at) FROM tracks WHERE position >= ? GROUP BY video_id",
+                (first_diff,)))
+            self._conn.execute("DELETE FROM tracks WHERE position >= ?", (first_diff,))
+            self._conn.executemany(
+                "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?)",
+                (track_to_row(tracks[i], i, added_at.get(tracks[i].get("id", ""), now))
+                 for i in range(first_diff, len(tracks)))
+            )
+        return len(tracks) - first_diff
+
+    def get_meta(self, key, default=None):
+        """Return a JSON-decoded value from the meta table."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, **values):
+        """Store JSON-encodable values in the meta table in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in values.items()]
+            )
+
+    def migrate_from_json(self, json_path):
+        """Import a saved_playlist.json file once, on first run.
+
+        Returns:
+            True if a migration happened.
+        """
+        if self.get_meta("migratedFrom") is not None or self.count() > 0:
+            return False
+        if not os.path.exists(json_path):
+            self.set_meta(migratedFrom="")
+            return False
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        self.append_tracks(data.get("playlist", []))
+        self.set_meta(
+            migratedFrom=os.path.basename(json_path),
+            currentIndex=data.get("currentIndex", -1),
+            syncedPlaylists=data.get("syncedPlaylists", {})
+        )
+        return True
@@ -1,11 +1,105 @@
 // Global variables
 let currentVideoId = '';
 let playlist = [];
+let upNext = [];  // the next few entries, from the server's "upNext" topic
+let progress = null;  // latest progress anchor, with receivedAt = performance.now()
+let progressFrame = 0;
+let spectrumLevels = null;  // latest band levels (0-255) from the "visualizer" topic
+let spectrumFrame = 0;
 let currentIndex = 0;
 let controlsVisible = false;
 let socket = null;
 let reconnectAttempts = 0;
 
+// Wire formats offered to the server, most compact first. The Python server
+// answers with binary MessagePack frames if it supports them, otherwise JSON.
+const WIRE_SUBPROTOCOLS = ['ytmusic.msgpack', 'ytmusic.json'];
+
+// Minimal MessagePack decoder (no ext types), enough for server messages
+function decodeMsgpack(buffer) {
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+    const textDecoder = new TextDecoder();
+    let offset = 0;
+    
+    function str(length) {
+        const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+        offset += length;
+        return value;
+    }
+    function array(length) {
+        const value = new Array(length);
+        for (let i = 0; i < length; i++) value[i] = read();
+        return value;
+    }
+    function map(length) {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+            const key = read();
+            value[key] = read();
+        }
+        return value;
+    }
+    function read() {
+        const type = bytes[offset++];
+        if (type <= 0x7f) return type;
+        if (type <= 0x8f) return map(type & 0x0f);
+        if (type <= 0x9f) return array(type & 0x0f);
+        if (type <= 0xbf) return str(type & 0x1f);
+        if (type >= 0xe0) return type - 0x100;
+        let value;
+        switch (type) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: value = bytes.slice(offset + 1, offset + 1 + bytes[offset]); offset += 1 + value.length; return value;
+            case 0xc5: { const n = view.getUint16(offset); offset += 2; value = bytes.slice(offset, offset + n); offset += n; return value; }
+            case 0xc6: { const n = view.getUint32(offset); offset += 4; value = bytes.slice(offset, offset + n); offset += n; return value; }
+            case 0xca: value = view.getFloat32(offset); offset += 4; return value;
+            case 0xcb: value = view.getFloat64(offset); offset += 8; return value;
+            case 0xcc: return bytes[offset++];
+            case 0xcd: value = view.getUint16(offset); offset += 2; return value;
+            case 0xce: value = view.getUint32(offset); offset += 4; return value;
+            case 0xcf: value = Number(view.getBigUint64(offset)); offset += 8; return value;
+            case 0xd0: value = view.getInt8(offset); offset += 1; return value;
+            case 0xd1: value = view.getInt16(offset); offset += 2; return value;
+            case 0xd2: value = view.getInt32(offset); offset += 4; return value;
+            case 0xd3: value = Number(view.getBigInt64(offset)); offset += 8; return value;
+            case 0xd9: return str(bytes[offset++]);
+            case 0xda: value = view.getUint16(offset); offset += 2; return str(value);
+            case 0xdb: value = view.getUint32(offset); offset += 4; return str(value);
+            case 0xdc: value = view.getUint16(offset); offset += 2; return array(value);
+            case 0xdd: value = view.getUint32(offset); offset += 4; return array(value);
+            case 0xde: value = view.getUint16(offset); offset += 2; return map(value);
+            case 0xdf: value = view.getUint32(offset); offset += 4; return map(value);
+        }
+        throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+    return read();
+}
+
+// Server topics this overlay renders (see topic_router.py). Override with
+// ?topics=track,volume,playlist; the playlist is added while controls are shown.
+function requestedTopics() {
+    const urlTopics = new URLSearchParams(window.location.search).get('topics');
+    const topics = urlTopics ? urlTopics.split(',') : ['track', 'volume', 'upNext', 'progress'];
+    if (controlsVisible && !topics.includes('playlist')) {
+        topics.push('playlist');
+    }
+    return topics;
+}
+
+// Server room this overlay follows (see rooms.py), e.g. overlay.html?room=stream2
+function requestedRoom() {
+    const room = new URLSearchParams(window.location.search).get('room');
+    return room ? encodeURIComponent(room) : '';
+}
+
+// Decode a message in whichever format the server chose
+function decodeMessage(data) {
+    return typeof data === 'string' ? JSON.parse(data) : decodeMsgpack(data);
+}
+
 // WebSocket instead of BroadcastChannel for C++ compatibility
 function connectWebSocket() {
     // Try to get port from server-helper.js if available
@@ -15,10 +109,11 @@ function connectWebSocket() {
     
     // Connect to WebSocket server
     try {
-        socket = new WebSocket(`ws://localhost:${port}`);
+        socket = new WebSocket(`ws://localhost:${port}/${requestedRoom()}?topics=${requestedTopics().join(',')}`, WIRE_SUBPROTOCOLS);
+        socket.binaryType = 'arraybuffer';
         
         socket.onopen = function(e) {
-            console.log('WebSocket connection established successfully!');
+            console.log(`WebSocket connection established successfully! (format: ${socket.protocol || 'json'})`);
             document.getElementById('song-info').textContent = 'Connected to music player...';
             reconnectAttempts = 0; // Reset reconnect attempts on successful connection
             
@@ -50,8 +145,13 @@ function connectWebSocket() {
         
         socket.onmessage = function(event) {
             try {
-                // Parse the received JSON message
-                const data = JSON.parse(event.data);
+                // Spectrum frames are raw binary, not a MessagePack message
+                if (event.data instanceof ArrayBuffer && isSpectrumFrame(event.data)) {
+                    handleSpectrumFrame(event.data);
+                    return;
+                }
+                // Parse the received message (MessagePack or JSON)
+                const data = decodeMessage(event.data);
                 updateSongInfo(data);
             } catch (e) {
                 console.error('Error parsing WebSocket message:', e);
@@ -59,6 +159,14 @@ function connectWebSocket() {
         };
         
         socket.onclose = function(event) {
+            // 1012 = server restarting: a new server already owns the port,
+            // so reconnect right away and keep showing the current song
+            if (event.code === 1012) {
+                console.log('Server is reloading, reconnecting...');
+                reconnectAttempts = 0;
+                setTimeout(connectWebSocket, 50);
+                return;
+            }
             if (event.wasClean) {
                 console.log(`WebSocket connection closed cleanly, code=${event.code}, reason=${event.reason}`);
             } else {
@@ -212,6 +320,14 @@ function toggleControls() {
     } else {
         document.body.classList.remove('show-controls');
     }
+    
+    // The playlist is only needed while the controls are visible
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({
+            command: controlsVisible ? "subscribe" : "unsubscribe",
+            topics: ["playlist"]
+        }));
+    }
 }
 
 // Update the song information display based on the data received
@@ -261,7 +377,55 @@ function updateSongInfo(data) {
         }
         return;
     }
-    
+
+    // Handle metadata patches for entries that were added with placeholder info
+    if (data.command === "playlistPatch" && data.params && data.params.updates) {
+        data.params.updates.forEach(update => {
+            if (playlist[update.index]) {
+                playlist[update.index].title = update.title;
+                playlist[update.index].author = update.author;
+            }
+            if (update.index === currentIndex) {
+                document.getElementById('song-info').textContent = `Now Playing: ${update.title} by ${update.author}`;
+            }
+        });
+        updatePlaylistUI();
+        savePlaylistToStorage();
+        return;
+    }
+
+    // Topic updates: the current track without the playlist, and the playlist on its own
+    if (data.command === "trackUpdate" && data.params) {
+        if (data.params.currentIndex !== undefined) {
+            currentIndex = data.params.currentIndex;
+        }
+        if (data.params.title && data.params.author) {
+            document.getElementById('song-info').textContent = `Now Playing: ${data.params.title} by ${data.params.author}`;
+            restartMarqueeAnimation();
+        }
+        updateAlbumArt(data.params.videoId);
+        return;
+    }
+    if (data.command === "progressUpdate" && data.params) {
+        progress = { ...data.params, receivedAt: performance.now() };
+        startProgressAnimation();
+        return;
+    }
+    if (data.command === "upNextUpdate" && data.params) {
+        upNext = data.params.entries || [];
+        prefetchNextAlbumArt();
+        return;
+    }
+    if (data.command === "playlistUpdate" && data.params) {
+        playlist = data.params.playlist || [];
+        if (data.params.currentIndex !== undefined) {
+            currentIndex = data.params.currentIndex;
+        }
+        updatePlaylistUI();
+        savePlaylistToStorage();
+        return;
+    }
+
     // Handle data wrapped in command structure from Python UI
     if (data.command && data.params) {
         console.log('Command data received:', data.command);
@@ -284,6 +448,8 @@ function updateSongInfo(data) {
                     updatePlaylistUI();
                 }
                 
+                updateAlbumArt(data.params.videoId);
+                
                 // Restart the marquee animation
                 restartMarqueeAnimation();
                 
@@ -310,6 +476,8 @@ function updateSongInfo(data) {
             updatePlaylistUI();
         }
         
+        updateAlbumArt(data.videoId);
+        
         // Restart the marquee animation
         restartMarqueeAnimation();
         
@@ -356,6 +524,117 @@ function addForceRefreshButton() {
     document.body.appendChild(refreshButton);
 }
 
+// Album art is resized and cached by the server, so every overlay shares one download
+function albumArtUrl(videoId) {
+    const port = typeof getServerPort === 'function' ? getServerPort() : 8765;
+    return `http://localhost:${port}/art/${videoId}/small.jpg`;
+}
+
+function updateAlbumArt(videoId) {
+    const art = document.getElementById('album-art');
+    if (!art) return;
+    
+    if (!videoId) {
+        art.classList.remove('loaded');
+        art.removeAttribute('src');
+        delete art.dataset.videoId;
+        return;
+    }
+    
+    if (art.dataset.videoId !== videoId) {
+        art.dataset.videoId = videoId;
+        // The bar stays hidden until an anchor for the new track arrives
+        startProgressAnimation();
+        art.onload = () => art.classList.add('loaded');
+        art.onerror = () => art.classList.remove('loaded');
+        art.src = albumArtUrl(videoId);
+    }
+    
+    prefetchNextAlbumArt();
+}
+
+// The server only sends a progress anchor when playback starts, pauses or
+// drifts; between anchors the position is extrapolated once per frame.
+function currentProgressMs() {
+    let position = progress.positionMs;
+    if (progress.playing) {
+        position += performance.now() - progress.receivedAt;
+    }
+    return progress.durationMs > 0 ? Math.min(position, progress.durationMs) : position;
+}
+
+function startProgressAnimation() {
+    if (!progressFrame) {
+        progressFrame = requestAnimationFrame(renderProgress);
+    }
+}
+
+function renderProgress() {
+    progressFrame = 0;
+    const bar = document.getElementById('progress-bar');
+    if (!bar) return;
+    // Hide the bar when it's for another track or the duration isn't known yet
+    const art = document.getElementById('album-art');
+    const trackVideoId = art ? art.dataset.videoId : undefined;
+    if (!progress || !progress.durationMs || (trackVideoId && progress.videoId !== trackVideoId)) {
+        bar.classList.remove('active');
+        return;
+    }
+    bar.classList.add('active');
+    bar.style.transform = `scaleX(${currentProgressMs() / progress.durationMs})`;
+    // Paused: one frame is enough until the next anchor arrives
+    if (progress.playing && currentProgressMs() < progress.durationMs) {
+        progressFrame = requestAnimationFrame(renderProgress);
+    }
+}
+
+// Visualizer frames (see spectrum.py): 0xC1, band count, 16-bit sequence,
+// then one byte per band. They arrive at up to 30 fps; drawing is done at
+// most once per animation frame with whatever arrived last.
+const SPECTRUM_MAGIC = 0xC1;
+
+function isSpectrumFrame(buffer) {
+    return buffer.byteLength >= 4 && new Uint8Array(buffer, 0, 1)[0] === SPECTRUM_MAGIC;
+}
+
+function handleSpectrumFrame(buffer) {
+    const bands = new Uint8Array(buffer, 1, 1)[0];
+    spectrumLevels = new Uint8Array(buffer, 4, Math.min(bands, buffer.byteLength - 4));
+    if (!spectrumFrame) {
+        spectrumFrame = requestAnimationFrame(renderSpectrum);
+    }
+}
+
+function renderSpectrum() {
+    spectrumFrame = 0;
+    const canvas = document.getElementById('visualizer');
+    if (!canvas || !spectrumLevels) return;
+    canvas.classList.add('active');
+    if (canvas.width !== canvas.clientWidth || canvas.height !== canvas.clientHeight) {
+        canvas.width = canvas.clientWidth;
+        canvas.height = canvas.clientHeight;
+    }
+    const context = canvas.getContext('2d');
+    const barWidth = canvas.width / spectrumLevels.length;
+    context.clearRect(0, 0, canvas.width, canvas.height);
+    context.fillStyle = '#ffffff';
+    spectrumLevels.forEach((level, index) => {
+        const height = level / 255 * canvas.height;
+        context.fillRect(index * barWidth + 1, canvas.height - height, Math.max(1, barWidth - 2), height);
+    });
+}
+
+// Warm the browser cache with the next track's art so it appears instantly
+function prefetchNextAlbumArt() {
+    let next = upNext[0];
+    if (!next && playlist.length > 1) {
+        next = playlist[(currentIndex + 1) % playlist.length];
+    }
+    if (next && next.id) {
+        new Image().src = albumArtUrl(next.id);
+    }
+}
+
 // Helper function to restart the marquee animation
 function restartMarqueeAnimation() {
     const marqueeElement = document.getElementById('song-info');
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Overlay Asset Server
+
+Serves the OBS overlay pages, scripts and stylesheets over HTTP from the
+WebSocket server's port, so a browser source can point at
+http://localhost:8765/overlay.html instead of a local file.
+
+Assets are read once at startup and kept in memory together with gzip
+(and brotli, if the brotli package is installed) variants. References
+between assets are rewritten to include a content hash, so scripts and
+stylesheets can be cached forever while pages are revalidated with ETags.
+server-helper.js is generated per request with the port the browser
+actually connected to.
+"""
+
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files served from the project directory
+ASSET_FILES = (
+    "overlay.html",
+    "overlay-white.html",
+    "overlay.js",
+    "overlay-receiver.js",
+    "overlay.css",
+    "overlay-white.css",
+    "style.css",
+)
+
+# Generated script that tells overlay-receiver.js which port to connect to
+HELPER_SCRIPT = "server-helper.js"
+
+# Pages and the helper are revalidated on every load; hashed assets never change
+PAGE_CACHE_CONTROL = "no-cache"
+HASHED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Don't bother compressing tiny responses
+MIN_COMPRESS_SIZE = 256
+
+ASSET_REF_RE = re.compile(r'(src|href)="([^"?#]+)"')
+
+
+def content_type(name):
+    mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if mime.startswith("text/") or mime == "application/javascript":
+        mime += "; charset=utf-8"
+    return mime
+
+
+def accepted_encodings(header):
+    """Return the content codings a client accepts, from its Accept-Encoding header."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def http_response(request, body, content_type, cache_control, etag, encoding="identity"):
+    """Build a cacheable response, or a 304 if the client already has this version."""
+    headers = Headers()
+    headers["Date"] = email.utils.formatdate(usegmt=True)
+    headers["Cache-Control"] = cache_control
+    headers["ETag"] = etag
+    headers["Vary"] = "Accept-Encoding"
+    headers["Connection"] = "close"
+
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(304, "Not Modified", headers, b"")
+
+    headers["Content-Type"] = content_type
+    headers["Content-Length"] = str(len(body))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(200, "OK", headers, body)
+
+
+class Asset:
+    """One preloaded file with its compressed variants."""
+
+    def __init__(self, name, body, cache_control):
+        self.name = name
+        self.content_type = content_type(name)
+        self.cache_control = cache_control
+        self.etag = hashlib.sha1(body).hexdigest()[:16]
+        # Encoding -> body, only kept when compression actually helps
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = compressed
+
+    def select(self, accept_encoding):
+        """Return (encoding, body) for the smallest variant the client accepts."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and encoding in accepted:
+                return encoding, self.variants[encoding]
+        return "identity", self.variants["identity"]
+
+
+class OverlayAssets:
+    """In-memory overlay assets, served through websockets' process_request hook."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}
+        self._helpers = {}  # port -> Asset
+        self.load()
+
+    def load(self):
+        """Read and compress every asset. Missing files are skipped."""
+        raw = {}
+        for name in ASSET_FILES:
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    raw[name] = f.read()
+
+        assets = {}
+        # Scripts and stylesheets first, so pages can reference their hashes
+        for name, body in raw.items():
+            if not name.endswith(".html"):
+                assets[name] = Asset(name, body, HASHED_CACHE_CONTROL)
+        for name, body in raw.items():
+            if name.endswith(".html"):
+                assets[name] = Asset(name, self._add_hashes(body, assets), PAGE_CACHE_CONTROL)
+        self.assets = assets
+
+    @staticmethod
+    def _add_hashes(page, assets):
+        """Point src/href references at hashed URLs (overlay.css -> overlay.css?v=<etag>)."""
+        def replace(match):
+            attribute, name = match.groups()
+            asset = assets.get(name)
+            if asset is None:
+                return match.group(0)
+            return f'{attribute}="{name}?v={asset.etag}"'
+        return ASSET_REF_RE.sub(replace, page.decode("utf-8")).encode("utf-8")
+
+    def helper_script(self, port):
+        """Return the server-helper.js asset for a port."""
+        asset = self._helpers.get(port)
+        if asset is None:
+            body = (
+                "// Generated by youtube_music_server.py\n"
+                f"function getServerPort() {{ return {port}; }}\n"
+            ).encode("utf-8")
+            asset = self._helpers[port] = Asset(HELPER_SCRIPT, body, PAGE_CACHE_CONTROL)
+        return asset
+
+    def find(self, path, port):
+        """Return the asset for a request path, or None."""
+        name = path.split("?", 1)[0].lstrip("/") or "overlay.html"
+        if name == HELPER_SCRIPT:
+            return self.helper_script(port)
+        return self.assets.get(name)
+
+    def respond(self, connection, request):
+        """process_request hook: answer plain HTTP GETs, let WebSocket upgrades through."""
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return None
+
+        port = connection.local_address[1]
+        asset = self.find(request.path, port)
+        if asset is None:
+            return connection.respond(404, "Not found\n")
+
+        encoding, body = asset.select(request.headers.get("Accept-Encoding", ""))
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        return http_response(request, body, asset.content_type, asset.cache_control, etag, encoding)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Playlist Search Index
+
+Incremental trigram index over playlist titles and authors, so type-ahead
+search stays fast with tens of thousands of tracks.
+
+Tracks are indexed by identity, not position, so inserting or removing
+entries never invalidates the index. refresh() brings the index in line
+with a playlist by re-tokenizing only tracks that were added or whose
+title/author changed, and dropping tracks that are gone.
+"""
+
+import re
+
+WORD_RE = re.compile(r'\w+')
+
+# Words shorter than this are matched through the prefix index
+TRIGRAM_SIZE = 3
+
+# Stop intersecting postings once this few candidates remain; verifying them is cheaper
+VERIFY_THRESHOLD = 256
+
+
+def normalize(text):
+    """Case-fold text for matching."""
+    return text.casefold()
+
+
+def trigrams(word):
+    """Return the set of trigrams in a word."""
+    return {word[i:i + TRIGRAM_SIZE] for i in range(len(word) - TRIGRAM_SIZE + 1)}
+
+
+class PlaylistSearchIndex:
+    """Trigram + short-prefix index keyed by track identity."""
+
+    def __init__(self):
+        self._tracks = {}     # id(track) -> track
+        self._raw = {}        # id(track) -> (title, author) as last indexed
+        self._texts = {}      # id(track) -> normalized "title author" that was indexed
+        self._trigrams = {}   # trigram -> set of id(track)
+        self._prefixes = {}   # 1-2 char word prefix -> set of id(track)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def add(self, track):
+        """Index a track (or re-index it if its text changed)."""
+        key = id(track)
+        raw = (track.get('title', ''), track.get('author', ''))
+        if self._raw.get(key) == raw:
+            return
+        if key in self._tracks:
+            self.remove(track)
+
+        text = normalize(f"{raw[0]} {raw[1]}")
+        self._tracks[key] = track
+        self._raw[key] = raw
+        self._texts[key] = text
+        for word in set(WORD_RE.findall(text)):
+            for gram in trigrams(word):
+                self._trigrams.setdefault(gram, set()).add(key)
+            for length in range(1, TRIGRAM_SIZE):
+                if len(word) >= length:
+                    self._prefixes.setdefault(word[:length], set()).add(key)
+
+    def remove(self, track):
+        """Drop a track from the index."""
+        key = id(track)
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        del self._tracks[key]
+        del self._raw[key]
+        for word in set(WORD_RE.findall(text)):
+            for gram in trigrams(word):
+                self._discard(self._trigrams, gram, key)
+            for length in range(1, TRIGRAM_SIZE):
+                if len(word) >= length:
+                    self._discard(self._prefixes, word[:length], key)
+
+    @staticmethod
+    def _discard(index, token, key):
+        postings = index.get(token)
+        if postings is not None:
+            postings.discard(key)
+            if not postings:
+                del index[token]
+
+    def refresh(self, playlist):
+        """Sync the index with a playlist, touching only added, changed or removed tracks."""
+        present = set()
+        for track in playlist:
+            present.add(id(track))
+            self.add(track)
+        for key in [key for key in self._tracks if key not in present]:
+            self.remove(self._tracks[key])
+
+    def search(self, query):
+        """Return the set of id(track) for tracks matching every word in query."""
+        words = WORD_RE.findall(normalize(query))
+        if not words:
+            return None
+
+        postings = []
+        for word in words:
+            if len(word) >= TRIGRAM_SIZE:
+                postings.extend(self._trigrams.get(gram, set()) for gram in trigrams(word))
+            else:
+                postings.append(self._prefixes.get(word, set()))
+
+        # Intersect smallest sets first, stopping once few enough remain to verify
+        candidates = None
+        for posting in sorted(postings, key=len):
+            candidates = set(posting) if candidates is None else candidates & posting
+            if len(candidates) <= VERIFY_THRESHOLD:
+                break
+
+        # Trigrams can match out of order; confirm each word really appears
+        return {key for key in candidates
+                if all(word in self._texts[key] for word in words)}
+
+    def matching_indexes(self, playlist, query):
+        """Return playlist positions matching query, or None when the query is empty."""
+        matches = self.search(query)
+        if matches is None:
+            return None
+        if not matches:
+            return []
+        return [i for i, track in enumerate(playlist) if id(track) in matches]
@@ -0,0 +1,26 @@
+#!/bin/bash
+
+# Script to reload a running YouTube Music WebSocket server without dropping overlays.
+# The server starts a new process on the same listening socket, then the old
+# one closes its connections with code 1012 so overlays reconnect immediately.
+
+echo "Looking for running WebSocket server processes..."
+
+# Find any Python processes running the youtube_music_server.py script
+server_pids=$(ps aux | grep "python.*youtube_music_server\.py" | grep -v grep | awk '{print $2}')
+
+if [ -z "$server_pids" ]; then
+    echo "No running server processes found. Use ./start-server.sh to start one."
+    exit 1
+fi
+
+for pid in $server_pids; do
+    echo "Reloading server process with PID $pid"
+    kill -HUP $pid
+done
+
+# Give the new process a moment to take over
+sleep 1
+
+echo "Running server processes:"
+ps aux | grep "python.*youtube_music_server\.py" | grep -v grep
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Rooms
+
+One server can drive several independent players, for example one per
+stream. Each room has its own song info, playlist, volume, connected
+clients and topic subscriptions. Overlays pick a room by WebSocket path:
+
+    ws://localhost:8765/                     - the default room
+    ws://localhost:8765/stream2?topics=track - room "stream2"
+
+Commands from the UI or the control socket go to the default room unless
+they carry a "room" key.
+
+Each room also caches the encoded messages a new client is sent on
+connect, so a room full of overlays reconnecting at once serializes its
+(possibly large) playlist once per wire format instead of once per client.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+import wire_format
+from topic_router import TopicRouter
+
+DEFAULT_ROOM = "default"
+ROOM_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def room_from_path(path):
+    """Return the room name for a connection path, or None if it isn't a valid room."""
+    name = urlsplit(path or "").path.strip("/")
+    if not name:
+        return DEFAULT_ROOM
+    return name if ROOM_NAME_RE.match(name) else None
+
+
+def default_song_info():
+    return {
+        "title": "No song playing",
+        "author": "",
+        "videoId": "",
+        "playlist": [],
+        "currentIndex": -1
+    }
+
+
+class Room:
+    """State and clients of one player."""
+
+    def __init__(self, name):
+        self.name = name
+        self.song_info = default_song_info()
+        self.playlist = []
+        self.volume = 100
+        self.progress = None                  # latest playback anchor; see progress_payload()
+        self.clients = set()
+        self.router = TopicRouter()           # which of this room's clients get which topics
+        self.last_published_playlist = None   # playlist last sent to "playlist" subscribers
+        self.last_published_up_next = None    # window last sent to "upNext" subscribers
+        self._messages = {}                   # cache key -> EncodedMessage of the current state
+
+    def __len__(self):
+        return len(self.clients)
+
+    def changed(self):
+        """Drop cached messages; call after every state change."""
+        self._messages.clear()
+
+    def cached_message(self, key, build):
+        """Return the EncodedMessage for key, building its payload with build() on a miss."""
+        message = self._messages.get(key)
+        if message is None:
+            message = self._messages[key] = wire_format.EncodedMessage(build())
+        return message
+
+    def to_snapshot(self, include_playlist=True):
+        """Return this room's state for a snapshot file.
+
+        song_info["playlist"] usually is the room playlist itself, so it's
+        stored once and re-linked on load. With include_playlist=False the
+        playlists are left out (a separate song playlist entirely, a linked
+        one as a None "songPlaylist"), for state updates that didn't touch
+        them.
+        """
+        song_playlist = self.song_info.get("playlist", [])
+        snapshot = {
+            "volume": self.volume,
+            "songInfo": {key: value for key, value in self.song_info.items() if key != "playlist"}
+        }
+        if include_playlist:
+            snapshot["playlist"] = self.playlist
+            snapshot["songPlaylist"] = None if song_playlist is self.playlist else song_playlist
+        elif song_playlist is self.playlist:
+            snapshot["songPlaylist"] = None
+        return snapshot
+
+    def restore(self, snapshot):
+        """Load state saved by to_snapshot(); missing playlists keep their current contents."""
+        song_playlist = self.song_info.get("playlist", self.playlist)
+        if "playlist" in snapshot:
+            self.playlist = snapshot["playlist"]
+        if "songPlaylist" in snapshot:
+            song_playlist = snapshot["songPlaylist"]
+            if song_playlist is None:
+                song_playlist = self.playlist
+        self.volume = snapshot.get("volume", self.volume)
+        self.song_info = dict(snapshot.get("songInfo", self.song_info))
+        self.song_info["playlist"] = song_playlist
+        self.changed()
+
+    def apply_playlist_change(self, change):
+        """Apply a "playlistChange" worker bus event (see mark_state_changed())."""
+        if "append" in change:
+            self.playlist.extend(change["append"])
+        for update in change.get("updates", ()):
+            index = update["index"]
+            if 0 <= index < len(self.playlist):
+                self.playlist[index].update(title=update["title"], author=update["author"])
+        self.changed()
+
+
+class RoomRegistry:
+    """Rooms by name, created on first use up to max_rooms."""
+
+    def __init__(self, max_rooms=1000):
+        self.max_rooms = max_rooms
+        self.rooms = {DEFAULT_ROOM: Room(DEFAULT_ROOM)}
+
+    def __iter__(self):
+        return iter(list(self.rooms.values()))
+
+    def __len__(self):
+        return len(self.rooms)
+
+    @property
+    def default(self):
+        return self.rooms[DEFAULT_ROOM]
+
+    def can_open(self, name):
+        """Return True if get(name) would succeed."""
+        return name in self.rooms or (name is not None and len(self.rooms) < self.max_rooms)
+
+    def get(self, name=None):
+        """Return a room, creating it if needed; None for invalid names or when full."""
+        name = name or DEFAULT_ROOM
+        if not isinstance(name, str):
+            return None
+        room = self.rooms.get(name)
+        if room is None:
+            if not ROOM_NAME_RE.match(name) or len(self.rooms) >= self.max_rooms:
+                return None
+            room = self.rooms[name] = Room(name)
+        return room
+
+    def client_count(self):
+        return sum(len(room) for room in self.rooms.values())
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Server Benchmarks
+
+Starts youtube_music_server.py as a subprocess, connects many WebSocket
+clients to it and drives it through the control socket, measuring how long
+connections and broadcasts take as seen by the clients.
+
+    python server_benchmark.py rooms --rooms 200 --clients 2000
+    python server_benchmark.py workers --workers 0,1,2,4 --clients 2000
+    python server_benchmark.py churn --cycles 5000
+    python server_benchmark.py churn --cycles 5000 --workers 2
+
+The server's own log goes to /dev/null so logging doesn't dominate the
+numbers. Unix only (the control socket is needed to drive the server).
+
+The churn benchmark is a soak test for connection handling: client
+processes connect and disconnect thousands of times (some hanging up
+before the server has sent anything) against a server running in this
+process, so its event loop, tasks and memory can be watched directly. It
+exits with status 1 if any limit is exceeded, so it can gate changes.
+"""
+
+import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+import control_channel
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "youtube_music_server.py")
+
+
+def raise_file_limit():
+    """Allow as many open sockets as the hard limit permits (inherited by the server)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def make_playlist(count, room_index=0):
+    return [{
+        "title": f"Track {i} (Official Audio)",
+        "author": f"Artist {(i + room_index) % 200} - Topic",
+        "id": f"{room_index:05d}{i:06d}"
+    } for i in range(count)]
+
+
+class ServerProcess:
+    """A benchmark server subprocess on a free port with its own control socket."""
+
+    def __init__(self, extra_args=()):
+        self.directory = tempfile.mkdtemp(prefix="ytmusic-bench-")
+        self.control_path = os.path.join(self.directory, "server.sock")
+        self.extra_args = list(extra_args)
+        self.process = None
+        self.port = None
+
+    def start(self, port=0):
+        command = [sys.executable, SERVER_SCRIPT, "--ready-signal", "--state-file", "",
+                   "--control-socket", self.control_path, *self.extra_args]
+        if port:
+            command += ["--port", str(port), "--auto-port"]
+        else:
+            command += ["--port", "0"]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        line = self.process.stdout.readline()
+        if not line.startswith("SERVER_READY"):
+            self.stop()
+            raise RuntimeError("Server did not start")
+        self.port = int(line.split()[1])
+        return self
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Commander:
+    """Sends commands to the server over its control socket."""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    async def connect(self):
+        _, self.writer = await asyncio.open_unix_connection(self.path)
+
+    async def send(self, data):
+        self.writer.write(control_channel.encode_frame(json.dumps(data)))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class BenchClient:
+    """A WebSocket client that timestamps the nowPlaying titles it receives."""
+
+    def __init__(self, room):
+        self.room = room
+        self.websocket = None
+        self.received = {}  # title -> perf_counter() when it arrived
+        self._waiters = {}  # title -> Future resolved when it arrives
+        self._reader = None
+
+    async def connect(self, port):
+        path = "/" if self.room == "default" else f"/{self.room}"
+        self.websocket = await websockets.connect(f"ws://127.0.0.1:{port}{path}", max_size=None,
+                                                  open_timeout=60)
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for message in self.websocket:
+                data = json.loads(message)
+                if data.get("command") == "nowPlaying":
+                    self._arrived(data["params"]["title"])
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def _arrived(self, title):
+        arrived = self.received[title] = time.perf_counter()
+        waiter = self._waiters.pop(title, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(arrived)
+
+    async def wait_for(self, title, timeout=30):
+        """Return when a nowPlaying with this title arrived."""
+        if title in self.received:
+            return self.received[title]
+        waiter = self._waiters[title] = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{title!r} never arrived in room {self.room}") from None
+
+    async def close(self):
+        await self.websocket.close()
+        self._reader.cancel()
+
+
+def run_client_process(port, count, rounds, reports):
+    """Client process for bench_workers(): put arrival times of each round on the reports queue.
+
+    perf_counter() is CLOCK_MONOTONIC on Linux, so times compare across processes.
+    """
+    async def run():
+        clients = [BenchClient("default") for _ in range(count)]
+        for offset in range(0, count, 100):
+            await asyncio.gather(*[client.connect(port) for client in clients[offset:offset + 100]])
+        await asyncio.gather(*[client.wait_for("initial", 120) for client in clients])
+        reports.put(None)
+        for round_index in range(rounds):
+            reports.put(await asyncio.gather(*[client.wait_for(f"round {round_index}", 120) for client in clients]))
+        await asyncio.gather(*[client.close() for client in clients], return_exceptions=True)
+
+    asyncio.run(run())
+
+
+async def bench_workers(worker_counts, client_count, rounds, playlist_size, client_processes):
+    """The same broadcast load against a single process and worker pools of each size.
+
+    Every round is one nowPlaying with the whole playlist to every client,
+    so the server's cost is dominated by per-client fan-out (framing and
+    permessage-deflate). Clients are spread over several processes so the
+    client side isn't the bottleneck.
+    """
+    loop = asyncio.get_running_loop()
+    playlist = make_playlist(playlist_size)
+    print(f"clients={client_count} playlist={playlist_size} rounds={rounds} "
+          f"client processes={client_processes} cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'msg/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for workers in worker_counts:
+        extra_args = ["--workers", str(workers)] if workers else []
+        with ServerProcess(extra_args) as server:
+            commander = Commander(server.control_path)
+            await commander.connect()
+            await commander.send({"command": "nowPlaying", "params": {
+                "title": "initial", "author": "bench", "videoId": "", "playlist": playlist, "currentIndex": 0
+            }})
+
+            reports = multiprocessing.Queue()
+            shares = [client_count // client_processes + (i < client_count % client_processes)
+                      for i in range(client_processes)]
+            processes = [multiprocessing.Process(target=run_client_process,
+                                                 args=(server.port, share, rounds, reports))
+                         for share in shares if share]
+            for process in processes:
+                process.start()
+            for _ in processes:
+                await loop.run_in_executor(None, reports.get)
+
+            latencies = []
+            busy = 0.0
+            for round_index in range(rounds):
+                sent = time.perf_counter()
+                await commander.send({"command": "nowPlaying", "params": {
+                    "title": f"round {round_index}", "author": "bench", "videoId": "",
+                    "playlist": playlist, "currentIndex": round_index % max(1, playlist_size)
+                }})
+                arrivals = []
+                for _ in processes:
+                    arrivals.extend(await loop.run_in_executor(None, reports.get))
+                latencies.extend(arrived - sent for arrived in arrivals)
+                busy += max(arrivals) - sent
+
+            for process in processes:
+                process.join()
+            await commander.close()
+
+        print(f"{workers or 'none':>7} {client_count * rounds / busy:>8.0f} "
+              f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}")
+
+
+async def bench_rooms(room_count, client_count, rounds, playlist_size, connect_batch):
+    """Clients spread over rooms; every round changes the song in every room."""
+    room_names = ["default"] + [f"room{i}" for i in range(1, room_count)]
+
+    with ServerProcess() as server:
+        commander = Commander(server.control_path)
+        await commander.connect()
+
+        # Give every room a playlist, so connecting clients get a real snapshot
+        for index, name in enumerate(room_names):
+            await commander.send({"command": "nowPlaying", "room": name, "params": {
+                "title": "initial", "author": "bench", "videoId": "",
+                "playlist": make_playlist(playlist_size, index), "currentIndex": 0
+            }})
+
+        clients = [BenchClient(room_names[i % room_count]) for i in range(client_count)]
+        start = time.perf_counter()
+        for offset in range(0, client_count, connect_batch):
+            await asyncio.gather(*[client.connect(server.port) for client in clients[offset:offset + connect_batch]])
+        await asyncio.gather(*[client.wait_for("initial") for client in clients])
+        connect_seconds = time.perf_counter() - start
+
+        latencies = []
+        start = time.perf_counter()
+        for round_index in range(rounds):
+            sent = {}
+            for index, name in enumerate(room_names):
+                title = f"round {round_index}"
+                sent[name] = time.perf_counter()
+                await commander.send({"command": "nowPlaying", "room": name, "params": {
+                    "title": title, "author": "bench", "videoId": "",
+                    "playlist": [], "currentIndex": -1
+                }})
+            arrivals = await asyncio.gather(*[client.wait_for(f"round {round_index}") for client in clients])
+            latencies.extend(arrived - sent[client.room] for client, arrived in zip(clients, arrivals))
+        broadcast_seconds = time.perf_counter() - start
+
+        await commander.close()
+        await asyncio.gather(*[client.close() for client in clients], return_exceptions=True)
+
+    deliveries = client_count * rounds
+    print(f"rooms={room_count} clients={client_count} playlist={playlist_size} rounds={rounds}")
+    print(f"  connect + initial snapshot: {connect_seconds:.2f} s "
+          f"({client_count / connect_seconds:.0f} clients/s)")
+    print(f"  broadcasts: {deliveries} deliveries in {broadcast_seconds:.2f} s "
+          f"({deliveries / broadcast_seconds:.0f} msg/s)")
+    print(f"  latency ms: p50 {statistics.median(latencies) * 1000:.1f}  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}  max {max(latencies) * 1000:.1f}")
+
+
+def resident_bytes():
+    """Resident memory of this process (Linux /proc), or None elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def live_resident_bytes():
+    """resident_bytes() after returning freed heap memory to the OS.
+
+    glibc keeps memory freed by the server thread in its arena (zlib
+    buffers from permessage-deflate, mostly), so plain RSS creeps up during
+    churn without anything leaking. malloc_trim() drops that, leaving RSS
+    that only grows with memory still in use.
+    """
+    gc.collect()
+    library = ctypes.util.find_library("c")
+    if library:
+        libc = ctypes.CDLL(library)
+        if hasattr(libc, "malloc_trim"):
+            libc.malloc_trim(0)
+    return resident_bytes()
+
+
+class ErrorCounter(logging.Handler):
+    """Counts error log records, e.g. websockets' "connection handler failed"."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+        self.first = None
+
+    def emit(self, record):
+        self.count += 1
+        if self.first is None:
+            cause = record.exc_info[1] if record.exc_info else None
+            self.first = record.getMessage() + (f": {cause!r}" if cause is not None else "")
+
+
+# Commands the server must reject without dropping the sender (style 5 below)
+MALFORMED_COMMANDS = [
+    {"command": "volume", "value": "loud"},
+    {"command": "loadVideo", "index": None},
+    {"command": "getPlaylistRange", "offset": "x", "limit": 10},
+    {"command": "nowPlaying", "params": "x"},
+    {"command": "addVideo", "url": 5},
+    {"command": "subscribe", "topics": 5},
+    {"command": ["volume"]},
+    [1, 2],
+]
+
+
+def run_churn_clients(port, cycles, concurrency, reports, stall=0.2):
+    """Client process for bench_churn(): connect/disconnect cycles in six styles.
+
+    0: legacy client, reads the initial state, closes cleanly
+    1: MessagePack topic subscriber, reads the initial state, closes cleanly
+    2: topic subscriber, reads the initial state, drops the TCP connection
+    3: legacy client, drops the TCP connection right after the handshake
+    4: legacy client that stops reading, then drops the connection after
+       stall seconds, like a browser source hidden mid-load; with an initial
+       state larger than the socket buffers, the server is still sending it
+    5: volume subscriber that sends one of MALFORMED_COMMANDS, then a valid
+       volume change, and waits for the update to come back before closing;
+       a connection dropped in between counts as a failure
+
+    Puts (cycles done, registration latencies, failures) on reports every
+    100 cycles and None when finished.
+    """
+    async def cycle(index):
+        style = index % 6
+        path = {1: "/?topics=track,upNext,progress", 2: "/?topics=track,upNext,progress",
+                5: "/?topics=volume"}.get(style, "/")
+        subprotocols = ["ytmusic.msgpack", "ytmusic.json"] if style == 1 else None
+        started = time.perf_counter()
+        websocket = await websockets.connect(f"ws://127.0.0.1:{port}{path}", subprotocols=subprotocols,
+                                             max_size=None, open_timeout=30,
+                                             compression=None if style == 4 else "deflate")
+        if style == 3:
+            websocket.transport.abort()
+            return None
+        if style == 4:
+            websocket.transport.pause_reading()
+            await asyncio.sleep(stall)
+            websocket.transport.abort()
+            return None
+        await asyncio.wait_for(websocket.recv(), 30)
+        latency = time.perf_counter() - started
+        if style == 5:
+            volume = index % 101
+            await websocket.send(json.dumps(MALFORMED_COMMANDS[index // 6 % len(MALFORMED_COMMANDS)]))
+            await websocket.send(json.dumps({"command": "volume", "value": volume}))
+            deadline = time.perf_counter() + 30
+            while True:
+                message = json.loads(await asyncio.wait_for(websocket.recv(), deadline - time.perf_counter()))
+                if message.get("command") == "volumeUpdate" and message.get("value") == volume:
+                    break
+        if style == 2:
+            websocket.transport.abort()
+        else:
+            await websocket.close()
+        return latency
+
+    async def run():
+        counter = iter(range(cycles))
+        batch = {"done": 0, "latencies": [], "failures": 0}
+
+        async def worker():
+            for index in counter:
+                try:
+                    latency = await cycle(index)
+                    if latency is not None:
+                        batch["latencies"].append(latency)
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+                    batch["failures"] += 1
+                batch["done"] += 1
+                if batch["done"] >= 100:
+                    reports.put((batch["done"], batch["latencies"], batch["failures"]))
+                    batch.update(done=0, latencies=[], failures=0)
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        reports.put((batch["done"], batch["latencies"], batch["failures"]))
+        reports.put(None)
+
+    asyncio.run(run())
+
+
+def bench_churn(cycles, concurrency, client_processes, playlist_size, limits, workers=0, settle=2.0):
+    """Connection churn against an in-process server; returns True if every limit held.
+
+    Measured on the server: event loop lag (how late a 10 ms timer fires),
+    asyncio tasks and registered clients left once everyone is gone, RSS
+    growth after the first 10% of cycles (see live_resident_bytes()), and
+    errors logged. Measured on the clients: time from connecting to
+    receiving the initial state, which includes a playlist of
+    playlist_size entries.
+
+    With workers, this process is the owner and clients connect to worker
+    processes, so commands go over the worker bus. Loop lag, tasks, clients
+    and RSS are then the owner's; the workers are checked for errors in
+    their log and for having exited (and been restarted).
+    """
+    import youtube_music_server as server_module
+
+    # Keep per-connection INFO logging and the warnings for style 5's malformed
+    # commands out of the measurement, but count errors
+    logging.getLogger().setLevel(logging.ERROR)
+    server_module.logger.setLevel(logging.ERROR)
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    server = server_module.InProcessServer("127.0.0.1", 0, workers=workers)
+    # Workers inherit stderr; point it at a file while they start so their
+    # per-connection log stays off the terminal and can be checked for errors
+    worker_log = tempfile.TemporaryFile("w+") if workers else None
+    if worker_log:
+        sys.stderr.flush()
+        saved_stderr = os.dup(2)
+        os.dup2(worker_log.fileno(), 2)
+    try:
+        if not server.start(timeout=30):
+            raise RuntimeError(f"Server did not start: {server.error}")
+    finally:
+        if worker_log:
+            sys.stderr.flush()
+            os.dup2(saved_stderr, 2)
+            os.close(saved_stderr)
+    port = server.server.sockets[0].getsockname()[1]
+    worker_pids = [process.pid for process in server.server.processes] if workers else []
+
+    async def probe():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.sleep(0.01)
+        lag = loop.time() - started - 0.01
+        registered = sum(len(room.router) for room in server_module.rooms) + server_module.rooms.client_count()
+        return lag, len(asyncio.all_tasks()), registered
+
+    def sample():
+        return server.submit(probe()).result(10)
+
+    try:
+        server.submit(server_module.handle_message({"command": "nowPlaying", "params": {
+            "title": "churn", "author": "bench", "videoId": "", "playlist": make_playlist(playlist_size),
+            "currentIndex": 0
+        }})).result(30)
+        time.sleep(settle)  # Let the thumbnail fetch it starts finish
+        _, initial_tasks, _ = sample()
+        reports = multiprocessing.Queue()
+        shares = [cycles // client_processes + (i < cycles % client_processes) for i in range(client_processes)]
+        processes = [multiprocessing.Process(target=run_churn_clients, args=(port, share, concurrency, reports))
+                     for share in shares if share]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+
+        lags, latencies, failures, done, finished = [], [], 0, 0, 0
+        peak_tasks = initial_tasks
+        baseline_rss = None
+        while finished < len(processes):
+            lag, tasks, _ = sample()
+            lags.append(lag)
+            peak_tasks = max(peak_tasks, tasks)
+            try:
+                while True:
+                    report = reports.get_nowait()
+                    if report is None:
+                        finished += 1
+                        continue
+                    done += report[0]
+                    latencies.extend(report[1])
+                    failures += report[2]
+                    if baseline_rss is None and done >= cycles // 10:
+                        baseline_rss = live_resident_bytes()
+            except queue.Empty:
+                pass
+            time.sleep(0.04)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        # Let the server notice the last disconnects
+        time.sleep(settle)
+        _, final_tasks, registered = sample()
+        final_rss = live_resident_bytes()
+        restarts = len(set(process.pid for process in server.server.processes) - set(worker_pids)) if workers else 0
+    finally:
+        server.stop()
+        logging.getLogger().removeHandler(errors)
+
+    worker_errors = []
+    if worker_log:
+        worker_log.seek(0)
+        worker_errors = [line.rstrip() for line in worker_log if "[ERROR]" in line]
+        worker_log.close()
+
+    lags_ms = [lag * 1000 for lag in lags]
+    latencies_ms = [latency * 1000 for latency in latencies] or [0.0]
+    rss_growth_mb = (final_rss - baseline_rss) / 1e6 if final_rss and baseline_rss else 0.0
+    print(f"cycles={cycles} concurrency={concurrency} playlist={playlist_size} client processes={len(processes)} "
+          f"workers={workers} "
+          f"in {elapsed:.1f} s ({done / elapsed * 60:.0f} cycles/min), failed connections {failures}")
+    print(f"  registration ms: p50 {statistics.median(latencies_ms):.1f}  p99 {percentile(latencies_ms, 0.99):.1f}")
+    print(f"  loop lag ms: p50 {statistics.median(lags_ms):.1f}  p99 {percentile(lags_ms, 0.99):.1f}  "
+          f"max {max(lags_ms):.1f}")
+    print(f"  tasks: {initial_tasks} before, peak {peak_tasks}, {final_tasks} after")
+    if errors.first:
+        print(f"  first error: {errors.first}")
+    if worker_errors:
+        print(f"  first worker error: {worker_errors[0]}")
+
+    checks = [
+        ("p99 registration ms", percentile(latencies_ms, 0.99), limits["registration_ms"]),
+        ("p99 loop lag ms", percentile(lags_ms, 0.99), limits["lag_ms"]),
+        ("RSS growth MB", rss_growth_mb, limits["rss_growth_mb"]),
+        ("leaked tasks", final_tasks - initial_tasks, 0),
+        ("room clients + subscriptions left", registered, 0),
+        ("errors logged", errors.count, 0),
+        ("failed connections", failures, limits["failures"]),
+    ]
+    if workers:
+        checks += [
+            ("worker errors logged", len(worker_errors), 0),
+            ("worker restarts", restarts, 0),
+        ]
+    passed = True
+    for name, value, limit in checks:
+        ok = value <= limit
+        passed = passed and ok
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}: {value:.1f} (limit {limit})")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the YouTube Music WebSocket server")
+    commands = parser.add_subparsers(dest="benchmark", required=True)
+
+    rooms_parser = commands.add_parser("rooms", help="many rooms with clients spread over them")
+    rooms_parser.add_argument("--rooms", type=int, default=200)
+    rooms_parser.add_argument("--clients", type=int, default=2000)
+    rooms_parser.add_argument("--rounds", type=int, default=10)
+    rooms_parser.add_argument("--playlist", type=int, default=100, help="playlist entries per room")
+    rooms_parser.add_argument("--connect-batch", type=int, default=200,
+                              help="clients connecting at the same time")
+
+    workers_parser = commands.add_parser("workers", help="broadcast throughput with and without worker processes")
+    workers_parser.add_argument("--workers", default="0,1,2,4",
+                                help="comma-separated worker counts to compare (0 = single process)")
+    workers_parser.add_argument("--clients", type=int, default=2000)
+    workers_parser.add_argument("--rounds", type=int, default=10)
+    workers_parser.add_argument("--playlist", type=int, default=200, help="playlist entries per broadcast")
+    workers_parser.add_argument("--client-processes", type=int, default=os.cpu_count() or 1)
+
+    churn_parser = commands.add_parser("churn", help="connect/disconnect soak test with regression limits")
+    churn_parser.add_argument("--cycles", type=int, default=5000)
+    churn_parser.add_argument("--concurrency", type=int, default=20, help="connections in flight per client process")
+    churn_parser.add_argument("--client-processes", type=int, default=1)
+    churn_parser.add_argument("--playlist", type=int, default=1000,
+                              help="playlist entries in the initial state (~80 bytes each); stalled clients "
+                                   "only catch the server mid-send once it outgrows the socket buffers")
+    churn_parser.add_argument("--workers", type=int, default=0,
+                              help="worker processes (0 = single process); commands then go over the worker bus")
+    churn_parser.add_argument("--max-registration-ms", type=float, default=250.0, help="p99 limit")
+    churn_parser.add_argument("--max-lag-ms", type=float, default=100.0, help="p99 event loop lag limit")
+    churn_parser.add_argument("--max-rss-growth-mb", type=float, default=20.0)
+    churn_parser.add_argument("--max-failures", type=int, default=0, help="failed connection attempts allowed")
+
+    args = parser.parse_args()
+    raise_file_limit()
+    if args.benchmark == "rooms":
+        asyncio.run(bench_rooms(args.rooms, args.clients, args.rounds, args.playlist, args.connect_batch))
+    elif args.benchmark == "workers":
+        worker_counts = [int(count) for count in args.workers.split(",")]
+        asyncio.run(bench_workers(worker_counts, args.clients, args.rounds, args.playlist, args.client_processes))
+    elif args.benchmark == "churn":
+        limits = {"registration_ms": args.max_registration_ms, "lag_ms": args.max_lag_ms,
+                  "rss_growth_mb": args.max_rss_growth_mb, "failures": args.max_failures}
+        if not bench_churn(args.cycles, args.concurrency, args.client_processes, args.playlist, limits,
+                           args.workers):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Audio Spectrum Frames
+
+The overlay can't see the audio (it plays in VLC inside the UI), so the UI
+taps the decoded PCM and turns it into spectrum frames for the
+"visualizer" topic. SpectrumAnalyzer keeps the most recent samples and
+computes log-spaced band levels with one vectorized FFT per frame.
+SpectrumFeed calls it at a fixed frame rate on its own thread and backs
+off when the work (analysis plus publishing) would take more than
+max_cpu of one core.
+
+Frame layout (4 + bands bytes, sent as a binary WebSocket message):
+
+    byte 0      FRAME_MAGIC (0xC1, never the first byte of a MessagePack
+                or CBOR message from the server)
+    byte 1      number of bands
+    bytes 2-3   sequence number, little-endian, wrapping at 65536
+    bytes 4-    one level per band, 0 (silence) to 255 (full scale),
+                lowest frequency first
+
+NumPy is optional; check is_supported() before creating an analyzer.
+
+Run this module directly to measure CPU per frame and frame sizes:
+
+    python spectrum.py
+"""
+
+import struct
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FRAME_MAGIC = 0xC1
+FRAME_HEADER = struct.Struct("<BBH")
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+FFT_SIZE = 2048          # ~46 ms of audio at 44.1 kHz
+BANDS = 32
+MIN_FREQUENCY = 40.0     # Hz, lower edge of the first band
+MAX_FREQUENCY = 16000.0  # Hz, upper edge of the last band
+FLOOR_DB = -70.0         # Level 0
+DECAY = 0.85             # Per-frame fall-off, so bars drop smoothly instead of flickering
+
+FRAME_RATE = 30
+MAX_CPU = 0.05           # Fraction of one core the feed may use
+
+
+def is_supported():
+    """Return True if NumPy is available."""
+    return np is not None
+
+
+class SpectrumAnalyzer:
+    """Band levels of the most recent fft_size samples of interleaved 16-bit PCM.
+
+    feed() is called from the audio thread and frame() from the feed
+    thread; both are cheap and guarded by one lock.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, channels=CHANNELS, bands=BANDS, fft_size=FFT_SIZE):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bands = bands
+        self.fft_size = fft_size
+        self.samples_fed = 0     # Increases with every feed(); the feed skips frames without new audio
+        self._samples = np.zeros(fft_size, dtype=np.float32)
+        self._levels = np.zeros(bands, dtype=np.float32)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        # Hann window, scaled so a full-scale sine peaks at 0 dB
+        self._window = np.hanning(fft_size).astype(np.float32)
+        self._scale = 2.0 / self._window.sum()
+
+        # FFT bins of each band: log-spaced edges, at least one bin per band
+        nyquist = sample_rate / 2
+        edges = np.geomspace(MIN_FREQUENCY, min(MAX_FREQUENCY, nyquist), bands + 1)
+        bins = np.round(edges / nyquist * (fft_size // 2)).astype(np.int64)
+        bins[0] = max(bins[0], 1)
+        for index in range(1, bands + 1):
+            bins[index] = max(bins[index], bins[index - 1] + 1)
+        self._band_starts = bins[:-1]
+        self._band_widths = np.diff(bins).astype(np.float32)
+        self._last_bin = int(bins[-1])
+
+    def feed(self, pcm):
+        """Add interleaved signed 16-bit native-endian PCM (bytes or a buffer)."""
+        frames = np.frombuffer(pcm, dtype=np.int16)
+        frames = frames[:len(frames) - len(frames) % self.channels].reshape(-1, self.channels)
+        if not len(frames):
+            return
+        mono = frames.mean(axis=1, dtype=np.float32) * (1.0 / 32768.0)
+        with self._lock:
+            if len(mono) >= self.fft_size:
+                self._samples[:] = mono[-self.fft_size:]
+            else:
+                self._samples[:-len(mono)] = self._samples[len(mono):]
+                self._samples[-len(mono):] = mono
+            self.samples_fed += len(mono)
+
+    def clear(self):
+        """Forget buffered audio, e.g. after a seek or when playback stops."""
+        with self._lock:
+            self._samples[:] = 0
+            self._levels[:] = 0
+            self.samples_fed += 1
+
+    def levels(self):
+        """Return the current band levels as uint8 (0-255), with decay applied."""
+        with self._lock:
+            samples = self._samples * self._window
+        spectrum = np.abs(np.fft.rfft(samples)[:self._last_bin]) * self._scale
+        power = np.add.reduceat(spectrum * spectrum, self._band_starts) / self._band_widths
+        decibels = 10.0 * np.log10(power + 1e-12)
+        current = np.clip(1.0 - decibels / FLOOR_DB, 0.0, 1.0)
+        self._levels = np.maximum(current, self._levels * DECAY)
+        return np.round(self._levels * 255).astype(np.uint8)
+
+    def frame(self):
+        """Return the next binary spectrum frame."""
+        levels = self.levels()
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        return FRAME_HEADER.pack(FRAME_MAGIC, self.bands, self._sequence) + levels.tobytes()
+
+
+class SpectrumFeed:
+    """Publishes analyzer frames at a fixed rate on a background thread.
+
+    Each tick's CPU time (analysis plus publish(frame)) is measured with
+    thread_time(). If a tick cost more than max_cpu of the frame interval,
+    the next tick is postponed so the average stays within max_cpu of one
+    core; the skipped ticks are counted in stats().
+    """
+
+    def __init__(self, analyzer, publish, fps=FRAME_RATE, max_cpu=MAX_CPU):
+        self.analyzer = analyzer
+        self.publish = publish
+        self.interval = 1.0 / fps
+        self.max_cpu = max_cpu
+        self.frames = 0
+        self.skipped = 0
+        self.cpu_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spectrum-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def _run(self):
+        last_fed = self.analyzer.samples_fed
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return
+            next_tick += self.interval
+
+            # Nothing new while paused or buffering: leave the last frame up
+            if self.analyzer.samples_fed == last_fed:
+                continue
+            last_fed = self.analyzer.samples_fed
+
+            started = time.thread_time()
+            try:
+                self.publish(self.analyzer.frame())
+            except Exception as e:
+                print(f"Error publishing spectrum frame: {e}")
+            cost = time.thread_time() - started
+            self.frames += 1
+            self.cpu_seconds += cost
+
+            # Over budget: wait long enough that this tick's cost is max_cpu of the gap
+            budget = self.interval * self.max_cpu
+            if cost > budget:
+                postponed = cost / self.max_cpu - self.interval
+                self.skipped += int(postponed / self.interval)
+                next_tick += postponed
+            # Don't try to catch up after a stall
+            next_tick = max(next_tick, time.monotonic())
+
+    def stats(self):
+        """Return frames sent, ticks skipped for the CPU budget and mean CPU ms per frame."""
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "cpuMsPerFrame": self.cpu_seconds / self.frames * 1000 if self.frames else 0.0
+        }
+
+
+def benchmark_analyzer(configs=((16, 1024), (32, 2048), (64, 4096)), repeat=500):
+    """Print CPU per frame and per second of audio for a few band/FFT sizes."""
+    def make_pcm(seconds):
+        t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+        tone = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.random.default_rng(0).standard_normal(len(t))
+        samples = (np.clip(tone, -1, 1) * 32767).astype(np.int16)
+        return np.repeat(samples, CHANNELS).tobytes()
+
+    # VLC delivers audio in chunks of roughly 10-40 ms
+    chunk = make_pcm(0.02)
+    print(f"{'bands':>5} {'fft':>5} {'bytes':>5} {'feed us':>8} {'frame us':>9} "
+          f"{'cpu % @' + str(FRAME_RATE) + 'fps':>14}")
+    for bands, fft_size in configs:
+        analyzer = SpectrumAnalyzer(bands=bands, fft_size=fft_size)
+        start = time.thread_time()
+        for _ in range(repeat):
+            analyzer.feed(chunk)
+        feed_seconds = (time.thread_time() - start) / repeat
+        start = time.thread_time()
+        for _ in range(repeat):
+            frame = analyzer.frame()
+        frame_seconds = (time.thread_time() - start) / repeat
+        # 50 chunks of 20 ms and FRAME_RATE frames per second of audio
+        cpu = feed_seconds * 50 + frame_seconds * FRAME_RATE
+        print(f"{bands:>5} {fft_size:>5} {len(frame):>5} {feed_seconds * 1e6:>8.1f} "
+              f"{frame_seconds * 1e6:>9.1f} {cpu * 100:>14.2f}")
+
+
+if __name__ == "__main__":
+    if not is_supported():
+        raise SystemExit("NumPy is required: pip install numpy")
+    benchmark_analyzer()
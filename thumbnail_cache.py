@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Cache
+
+Fetches each track's YouTube thumbnail once, resizes it to the sizes the
+overlays use and keeps the results in a size-capped disk cache, so any
+number of browser sources can show album art without downloading it from
+i.ytimg.com themselves.
+
+Resizing uses Pillow when it's installed. Without it the original
+thumbnail is stored for every size and the browser scales it.
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from youtube_ids import VIDEO_ID_RE
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Size name -> (width, height); YouTube's mqdefault thumbnails are 320x180
+ART_SIZES = {
+    "small": (96, 54),
+    "medium": (320, 180),
+}
+
+THUMBNAIL_URL = "https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"
+FETCH_TIMEOUT = 10  # seconds
+JPEG_QUALITY = 85
+FAILURE_TTL = 300   # seconds a failed fetch is remembered, so bogus IDs aren't re-downloaded
+MAX_FAILURES = 10000
+
+
+def resize_thumbnail(data, size):
+    """Return JPEG bytes of the image cropped and scaled to size, or data unchanged without Pillow."""
+    if Image is None:
+        return data
+    with Image.open(io.BytesIO(data)) as image:
+        resized = ImageOps.fit(image.convert("RGB"), size, Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+class ThumbnailCache:
+    """Disk cache of resized thumbnails, evicting least recently used files over max_bytes."""
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = {}  # file name -> (size in bytes, last used)
+        self._total = 0
+        self._pending = {}  # video ID -> asyncio Future of an in-flight fetch
+        self._failures = {}  # video ID -> monotonic time of its last failed fetch, oldest first
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                self._files[entry.name] = (stat.st_size, stat.st_mtime)
+                self._total += stat.st_size
+
+    @staticmethod
+    def _file_name(video_id, size_name):
+        return f"{video_id}_{size_name}.jpg"
+
+    def _entry(self, name):
+        """Return (size, last used) for a cached file, or None. Call with the lock held.
+
+        Files stored by another process sharing the directory (e.g. the
+        owner of a worker pool) are picked up on first use.
+        """
+        entry = self._files.get(name)
+        if entry is None:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                return None
+            entry = self._files[name] = (stat.st_size, stat.st_mtime)
+            self._total += stat.st_size
+        return entry
+
+    def has(self, video_id):
+        """Return True if every size of a video's art is cached."""
+        with self._lock:
+            return all(self._entry(self._file_name(video_id, size_name)) is not None for size_name in ART_SIZES)
+
+    def get(self, video_id, size_name):
+        """Return cached JPEG bytes, or None."""
+        name = self._file_name(video_id, size_name)
+        with self._lock:
+            entry = self._entry(name)
+            if entry is None:
+                return None
+            self._files[name] = (entry[0], time.time())
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                if self._files.pop(name, None) is not None:
+                    self._total -= entry[0]
+            return None
+
+    def _store(self, name, data):
+        """Write a file atomically; returns False if it couldn't be written.
+
+        Each write goes to its own temporary file, since worker processes
+        sharing the directory may store the same video at once.
+        """
+        path = os.path.join(self.directory, name)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error storing thumbnail {name}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return False
+        with self._lock:
+            old = self._files.get(name)
+            if old is not None:
+                self._total -= old[0]
+            self._files[name] = (len(data), time.time())
+            self._total += len(data)
+            evict = []
+            if self._total > self.max_bytes:
+                for stale_name, (stale_size, _) in sorted(self._files.items(), key=lambda item: item[1][1]):
+                    if self._total <= self.max_bytes or stale_name == name:
+                        break
+                    evict.append(stale_name)
+                    self._total -= stale_size
+                    del self._files[stale_name]
+        for stale_name in evict:
+            try:
+                os.remove(os.path.join(self.directory, stale_name))
+            except OSError:
+                pass
+        return True
+
+    def fetch(self, video_id):
+        """Blocking: download a thumbnail and store every size. Returns True on success."""
+        url = THUMBNAIL_URL.format(video_id=video_id)
+        try:
+            with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+                data = response.read()
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Error fetching thumbnail for {video_id}: {e}")
+            return False
+
+        for size_name, size in ART_SIZES.items():
+            try:
+                resized = resize_thumbnail(data, size)
+            except Exception as e:
+                print(f"Error resizing thumbnail for {video_id}: {e}")
+                return False
+            if not self._store(self._file_name(video_id, size_name), resized):
+                return False
+        return True
+
+    def _failed_recently(self, video_id):
+        failed_at = self._failures.get(video_id)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < FAILURE_TTL:
+            return True
+        del self._failures[video_id]
+        return False
+
+    def _record_result(self, video_id, future):
+        self._pending.pop(video_id, None)
+        if future.cancelled() or future.exception() is not None or not future.result():
+            self._failures.pop(video_id, None)
+            self._failures[video_id] = time.monotonic()
+            while len(self._failures) > MAX_FAILURES:
+                del self._failures[next(iter(self._failures))]
+
+    async def ensure(self, video_id):
+        """Make sure a video's art is cached, fetching it off the event loop.
+
+        Concurrent calls for the same video share one download, and a
+        video whose fetch failed isn't tried again for FAILURE_TTL seconds.
+
+        Returns:
+            True if the art is available.
+        """
+        if not VIDEO_ID_RE.match(video_id or ""):
+            return False
+        if self.has(video_id):
+            return True
+        if self._failed_recently(video_id):
+            return False
+
+        pending = self._pending.get(video_id)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._pending[video_id] = loop.run_in_executor(None, self.fetch, video_id)
+            pending.add_done_callback(lambda future: self._record_result(video_id, future))
+        return await asyncio.shield(pending)
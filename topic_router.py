@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Topic Routing
+
+Clients can subscribe to the parts of the server state they render, so a
+"now playing" ticker doesn't receive the whole playlist on every track
+change. Topics:
+
+    track       - trackUpdate: title, author, videoId, currentIndex
+    playlist    - playlistUpdate (full playlist) and playlistPatch
+    upNext      - upNextUpdate: the next few entries after the current track
+    volume      - volumeUpdate
+    progress    - progressUpdate: playback position anchor to extrapolate from
+    visualizer  - audio spectrum frames
+
+A client picks topics when connecting (ws://localhost:8765/?topics=track,volume)
+or later with {"command": "subscribe", "topics": [...]} and
+{"command": "unsubscribe", "topics": [...]}. Clients that never choose
+topics are "legacy" clients and keep receiving the full nowPlaying
+payload as before.
+"""
+
+from urllib.parse import parse_qs, urlsplit
+
+TOPICS = ("track", "playlist", "upNext", "volume", "progress", "visualizer")
+
+
+def topics_from_path(path):
+    """Return the topics requested in a connection URL's query string, or None."""
+    query = parse_qs(urlsplit(path or "").query)
+    if "topics" not in query:
+        return None
+    return [topic for value in query["topics"] for topic in value.split(",") if topic]
+
+
+class TopicRouter:
+    """Tracks which clients receive which topics."""
+
+    def __init__(self):
+        self.legacy = set()                                 # clients that never subscribed
+        self.subscribers = {topic: set() for topic in TOPICS}
+        self._subscriptions = {}                            # client -> set of topics
+
+    def __len__(self):
+        return len(self.legacy) + len(self._subscriptions)
+
+    def add(self, client, topics=None):
+        """Add a client; without topics it's a legacy client."""
+        if topics is None:
+            self.legacy.add(client)
+            return []
+        return self.subscribe(client, topics)
+
+    def remove(self, client):
+        self.legacy.discard(client)
+        for topic in self._subscriptions.pop(client, ()):
+            self.subscribers[topic].discard(client)
+
+    def is_legacy(self, client):
+        return client in self.legacy
+
+    def topics(self, client):
+        """Return the topics a client is subscribed to."""
+        return self._subscriptions.get(client, set())
+
+    def subscribe(self, client, topics):
+        """Subscribe to topics (unknown names are ignored).
+
+        Returns:
+            The topics that were newly added, so the caller can send their
+            current state.
+        """
+        self.legacy.discard(client)
+        current = self._subscriptions.setdefault(client, set())
+        added = [topic for topic in dict.fromkeys(topics) if topic in self.subscribers and topic not in current]
+        for topic in added:
+            current.add(topic)
+            self.subscribers[topic].add(client)
+        return added
+
+    def unsubscribe(self, client, topics):
+        current = self._subscriptions.get(client)
+        if current is None:
+            return
+        for topic in topics:
+            if topic in current:
+                current.discard(topic)
+                self.subscribers[topic].discard(client)
+
+    def has_subscribers(self, topic):
+        return bool(self.subscribers[topic])
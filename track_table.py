@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Compact Track Storage
+
+Playlist entries used to be plain dicts with three string keys each. For
+playlists with tens of thousands of tracks that wastes a lot of memory, and
+author strings like "Tiësto - Topic" were duplicated for every entry.
+
+Track is a __slots__ record with interned title and author strings that
+still behaves like the old dict (track["title"], track.get("author"),
+"source" in track, dict(track), ...). TrackList is a list that converts
+any dict stored in it into a Track, so existing callers keep working.
+
+Run this module directly for a memory benchmark:
+
+    python track_table.py
+"""
+
+import sys
+
+# Fields every track has; anything else (e.g. "source") goes in the extras dict
+TRACK_FIELDS = ("id", "title", "author")
+
+
+def _intern(value):
+    """Share one copy of repeated title/author strings."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Track:
+    """Memory-efficient playlist entry with a dict-compatible interface."""
+
+    __slots__ = ("id", "title", "author", "extra")
+
+    def __init__(self, id, title, author, extra=None):
+        self.id = id
+        self.title = _intern(title)
+        self.author = _intern(author)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Track from a playlist entry dict (or return it if it's already a Track)."""
+        if isinstance(data, Track):
+            return data
+        video_id = data.get("id", "")
+        extra = {key: value for key, value in data.items() if key not in TRACK_FIELDS}
+        return cls(
+            video_id,
+            data.get("title", f"Video {video_id}"),
+            data.get("author", "Unknown Artist"),
+            extra
+        )
+
+    def to_dict(self):
+        """Return a plain dict, e.g. for JSON serialization."""
+        data = {"id": self.id, "title": self.title, "author": self.author}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # Dict-compatible interface
+
+    def __getitem__(self, key):
+        if key in TRACK_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in TRACK_FIELDS:
+            setattr(self, key, value if key == "id" else _intern(value))
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in TRACK_FIELDS or not self.extra or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __contains__(self, key):
+        return key in TRACK_FIELDS or bool(self.extra and key in self.extra)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(TRACK_FIELDS) + (len(self.extra) if self.extra else 0)
+
+    def __eq__(self, other):
+        if isinstance(other, (Track, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Track({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(TRACK_FIELDS) + (list(self.extra) if self.extra else [])
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def copy(self):
+        return Track(self.id, self.title, self.author, dict(self.extra) if self.extra else None)
+
+
+class TrackList(list):
+    """A list of Tracks that converts dict entries on the way in."""
+
+    def __init__(self, iterable=()):
+        super().__init__(Track.from_dict(item) for item in iterable)
+
+    def append(self, item):
+        super().append(Track.from_dict(item))
+
+    def insert(self, index, item):
+        super().insert(index, Track.from_dict(item))
+
+    def extend(self, iterable):
+        super().extend(Track.from_dict(item) for item in iterable)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            super().__setitem__(index, [Track.from_dict(item) for item in value])
+        else:
+            super().__setitem__(index, Track.from_dict(value))
+
+
+def track_to_json(obj):
+    """json.dumps default= hook that serializes Track objects."""
+    if isinstance(obj, Track):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def benchmark_memory(sizes=(1000, 10000, 100000), authors=200):
+    """Compare memory used by list-of-dicts and TrackList playlists.
+
+    Entries are built the way they arrive from JSON or the API, with a
+    fresh string object per field, and a realistic number of distinct
+    authors.
+    """
+    import gc
+    import json
+    import tracemalloc
+
+    def make_entries(count):
+        # Round-trip through JSON so strings aren't shared by accident
+        raw = [{
+            "id": f"{i:011d}",
+            "title": f"Track {i % (count // 2 or 1)}",
+            "author": f"Artist {i % authors} - Topic"
+        } for i in range(count)]
+        return json.loads(json.dumps(raw))
+
+    print(f"{'tracks':>8} {'dicts (MB)':>12} {'TrackList (MB)':>15} {'saving':>8}")
+    for count in sizes:
+        results = []
+        for build in (lambda entries: entries, TrackList):
+            gc.collect()
+            tracemalloc.start()
+            playlist = build(make_entries(count))
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append(current / (1024 * 1024))
+            del playlist
+        saving = 100 * (1 - results[1] / results[0]) if results[0] else 0
+        print(f"{count:>8} {results[0]:>12.2f} {results[1]:>15.2f} {saving:>7.0f}%")
+
+
+if __name__ == "__main__":
+    benchmark_memory()
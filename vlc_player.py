@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+VLC Player Resources
+
+libvlc objects (instances, media players, media) are reference-counted C
+objects. Python's garbage collector never frees them: a vlc.Media that
+isn't release()d keeps its demuxer, buffers and stream connection until
+the process exits. The UI used to create a Media for every track and
+release none of them, and detached and re-attached its event callbacks on
+every track change.
+
+PlayerEngine owns one instance and one media player for the life of the
+UI. Each track's Media is released as soon as the player holds it (the
+player keeps its own reference and drops it when it switches media), and
+VLC event callbacks are attached once per event type; start_playback
+only swaps the Python callbacks behind them. Every object created and
+released is counted in a ResourceLedger, so a leak shows up as a live
+count that keeps growing.
+
+Run this module directly for a soak test: thousands of track changes
+against a fake libvlc backend whose objects each hold a file descriptor
+and a buffer until released, checking that RSS and open file descriptors
+stay flat:
+
+    python vlc_player.py --tracks 5000
+    python vlc_player.py --tracks 2000 --legacy   # the old track change, for comparison
+"""
+
+import argparse
+import collections
+import os
+import sys
+import threading
+
+
+class ResourceLedger:
+    """Counts libvlc objects created and released, by kind."""
+
+    def __init__(self):
+        self.created = collections.Counter()
+        self.released = collections.Counter()
+        self._lock = threading.Lock()
+
+    def create(self, kind):
+        with self._lock:
+            self.created[kind] += 1
+
+    def release(self, kind):
+        with self._lock:
+            self.released[kind] += 1
+
+    def live(self):
+        """Return {kind: objects created and not yet released}."""
+        with self._lock:
+            return {kind: self.created[kind] - self.released[kind] for kind in self.created}
+
+    def format_stats(self):
+        with self._lock:
+            return ", ".join(f"{kind} {self.created[kind]} created/{self.released[kind]} released"
+                             for kind in sorted(self.created))
+
+
+class PlayerEngine:
+    """One libvlc instance and media player, reused for every track.
+
+    backend is the vlc module (or a stand-in with the same interface, see
+    fake_backend()). Objects are created on first use, so constructing an
+    engine never touches libvlc.
+    """
+
+    def __init__(self, backend, instance_args=(), ledger=None):
+        self.backend = backend
+        self.instance_args = list(instance_args)
+        self.ledger = ledger or ResourceLedger()
+        self.instance = None
+        self.player = None
+        self._callbacks = {}   # event type -> Python callback, called with the VLC event
+        self._attached = set()
+
+    def _ensure_instance(self):
+        if self.instance is None:
+            instance = self.backend.Instance(*self.instance_args)
+            if instance is None:
+                raise RuntimeError("vlc.Instance() returned None. VLC may not be installed or configured correctly.")
+            self.instance = instance
+            self.ledger.create("instance")
+        return self.instance
+
+    def ensure_player(self):
+        """Return the media player, creating it (and attaching event handlers) once."""
+        if self.player is None:
+            self.player = self.new_player()
+            for event_type in self._callbacks:
+                self._attach(event_type)
+        return self.player
+
+    def new_player(self):
+        """Create an additional media player on the shared instance (e.g. the visualizer tap)."""
+        player = self._ensure_instance().media_player_new()
+        self.ledger.create("player")
+        return player
+
+    def release_player(self, player):
+        player.stop()
+        player.release()
+        self.ledger.release("player")
+
+    def on(self, event_type, callback):
+        """Call callback(event) on a VLC thread for event_type; replaces any earlier callback."""
+        self._callbacks[event_type] = callback
+        if self.player is not None:
+            self._attach(event_type)
+
+    def _attach(self, event_type):
+        if event_type in self._attached:
+            return
+        try:
+            self.player.event_manager().event_attach(event_type, self._dispatch, event_type)
+        except Exception as e:
+            print(f"Error attaching VLC event {event_type}: {e}")
+            return
+        self._attached.add(event_type)
+        self.ledger.create("event handler")
+
+    def _dispatch(self, event, event_type):
+        callback = self._callbacks.get(event_type)
+        if callback is not None:
+            callback(event)
+
+    def set_media(self, url, player=None):
+        """Load url into player (the main player by default), releasing our reference right away."""
+        player = player or self.ensure_player()
+        media = self._ensure_instance().media_new(url)
+        self.ledger.create("media")
+        try:
+            player.set_media(media)
+        finally:
+            media.release()
+            self.ledger.release("media")
+
+    def close(self):
+        """Stop playback and release the player and instance."""
+        if self.player is not None:
+            event_manager = self.player.event_manager()
+            for event_type in self._attached:
+                try:
+                    event_manager.event_detach(event_type)
+                except Exception:
+                    pass
+                self.ledger.release("event handler")
+            self._attached.clear()
+            self.release_player(self.player)
+            self.player = None
+        if self.instance is not None:
+            self.instance.release()
+            self.ledger.release("instance")
+            self.instance = None
+
+
+def fake_backend(buffer_size=64 * 1024):
+    """A stand-in for the vlc module for soak tests.
+
+    Objects are reference counted like libvlc's, and each one holds a file
+    descriptor and a buffer of buffer_size bytes until its count drops to
+    zero, so leaked objects show up in RSS and the open descriptor count.
+    Events fire synchronously from play(), pause() and stop().
+    """
+    # Like libvlc's heap: objects stay allocated until released, Python references or not
+    allocated = set()
+
+    class FakeObject:
+        def __init__(self):
+            self._refs = 1
+            self._fd = os.open(os.devnull, os.O_RDONLY)
+            self._buffer = bytearray(os.urandom(16)) * (buffer_size // 16)
+            allocated.add(self)
+
+        def retain(self):
+            self._refs += 1
+
+        def release(self):
+            self._refs -= 1
+            if self._refs == 0:
+                os.close(self._fd)
+                self._buffer = None
+                allocated.discard(self)
+
+    class EventManager:
+        def __init__(self):
+            self.handlers = {}
+
+        def event_attach(self, event_type, callback, *args):
+            self.handlers[event_type] = (callback, args)
+
+        def event_detach(self, event_type):
+            self.handlers.pop(event_type, None)
+
+        def fire(self, event_type):
+            handler = self.handlers.get(event_type)
+            if handler is not None:
+                handler[0](event_type, *handler[1])
+
+    class Media(FakeObject):
+        def __init__(self, url):
+            super().__init__()
+            self.url = url
+
+    class MediaPlayer(FakeObject):
+        def __init__(self):
+            super().__init__()
+            self.media = None
+            self.volume = 100
+            self._events = EventManager()
+
+        def event_manager(self):
+            return self._events
+
+        def set_media(self, media):
+            media.retain()
+            if self.media is not None:
+                self.media.release()
+            self.media = media
+
+        def release(self):
+            if self._refs == 1 and self.media is not None:
+                self.media.release()
+                self.media = None
+            super().release()
+
+        def play(self):
+            self._events.fire(EventType.MediaPlayerPlaying)
+
+        def pause(self):
+            self._events.fire(EventType.MediaPlayerPaused)
+
+        def stop(self):
+            self._events.fire(EventType.MediaPlayerStopped)
+
+        def end(self):
+            self._events.fire(EventType.MediaPlayerEndReached)
+
+        def audio_set_volume(self, volume):
+            self.volume = volume
+
+    class Instance(FakeObject):
+        def __init__(self, *args):
+            super().__init__()
+
+        def media_player_new(self):
+            return MediaPlayer()
+
+        def media_new(self, url):
+            return Media(url)
+
+    class EventType:
+        MediaPlayerPlaying = 260
+        MediaPlayerPaused = 261
+        MediaPlayerStopped = 262
+        MediaPlayerEndReached = 265
+
+    return argparse.Namespace(Instance=Instance, Media=Media, EventType=EventType, allocated=allocated)
+
+
+def process_usage():
+    """Return (resident bytes, open file descriptors) of this process (Linux /proc)."""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE"), len(os.listdir("/proc/self/fd"))
+
+
+def soak(tracks, legacy=False, report_every=500, max_rss_growth=8 * 1024 * 1024):
+    """Change tracks the way start_playback() does and check that resources stay flat.
+
+    Returns True if RSS grew by less than max_rss_growth and no file
+    descriptors or libvlc objects were left behind.
+    """
+    backend = fake_backend()
+    events = backend.EventType
+    ended = []
+    engine = PlayerEngine(backend)
+    media = None
+
+    def on_song_end(event):
+        ended.append(event)
+
+    # Measured from the first report after the first track, when the
+    # instance and player that live for the whole run already exist
+    baseline = None
+    print(f"{'tracks':>7} {'rss MB':>8} {'fds':>5}  live objects")
+    for index in range(tracks + 1):
+        if index % report_every == 0 and index:
+            rss, fds = process_usage()
+            if baseline is None:
+                baseline = (rss, fds)
+            print(f"{index:>7} {rss / 1e6:>8.1f} {fds:>5}  {engine.ledger.live()}")
+        if index == tracks:
+            break
+        url = f"https://example.invalid/audio/{index}"
+        if legacy:
+            # The old start_playback: a new Media per track, never released,
+            # and event callbacks detached and attached again every time
+            player = engine.ensure_player()
+            player.stop()
+            media = backend.Media(url)
+            engine.ledger.create("media")
+            player.set_media(media)
+            event_manager = player.event_manager()
+            event_manager.event_detach(events.MediaPlayerEndReached)
+            event_manager.event_attach(events.MediaPlayerEndReached, lambda event: on_song_end(event))
+            engine.ledger.create("event handler")
+        else:
+            engine.on(events.MediaPlayerEndReached, on_song_end)
+            engine.ensure_player().stop()
+            engine.set_media(url)
+        engine.player.audio_set_volume(80)
+        engine.player.play()
+        engine.player.end()
+
+    rss, fds = process_usage()
+    live = engine.ledger.live()
+    print(f"ledger: {engine.ledger.format_stats()}")
+    engine.close()
+    if media is not None:
+        media.release()
+    rss_growth, fd_growth = rss - baseline[0], fds - baseline[1]
+    passed = (rss_growth < max_rss_growth and fd_growth <= 0 and len(ended) == tracks
+              and live.get("media", 0) == 0 and not backend.allocated)
+    print(f"RSS growth {rss_growth / 1e6:.1f} MB, fd growth {fd_growth}, "
+          f"end-of-song callbacks {len(ended)}/{tracks}, "
+          f"objects left after close {len(backend.allocated)}: {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test VLC resource handling with a fake backend")
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--legacy", action="store_true", help="use the old per-track code path")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=8.0)
+    args = parser.parse_args()
+    if not os.path.isdir("/proc/self/fd"):
+        raise SystemExit("The soak test reads /proc and needs Linux")
+    passed = soak(args.tracks, args.legacy, max(1, args.tracks // 10),
+                  int(args.max_rss_growth_mb * 1024 * 1024))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+WebSocket Wire Formats
+
+Clients pick a message encoding through the WebSocket subprotocol:
+
+    ytmusic.msgpack  - MessagePack in binary frames (needs the msgpack package)
+    ytmusic.cbor     - CBOR in binary frames (needs the cbor2 package)
+    ytmusic.json     - JSON in text frames
+
+Clients that don't ask for a subprotocol (older overlays) get JSON text
+frames as before. Broadcasts are encoded once per format in use, not once
+per client.
+
+Run this module directly to measure bytes and CPU per broadcast for each
+encoding, with and without permessage-deflate:
+
+    python wire_format.py
+"""
+
+import json
+
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+JSON = "ytmusic.json"
+MSGPACK = "ytmusic.msgpack"
+CBOR = "ytmusic.cbor"
+
+# Most compact first; the server picks the first one the client also offers
+SUBPROTOCOLS = [name for name, available in (
+    (MSGPACK, msgpack is not None),
+    (CBOR, cbor2 is not None),
+    (JSON, True),
+) if available]
+
+# permessage-deflate tuned for large playlist snapshots: a full 32 KB window
+# lets repeated author/title text deep in a playlist be back-referenced.
+# websockets defaults to a 4 KB window (12 bits) and memLevel 5.
+DEFLATE_WINDOW_BITS = 15
+DEFLATE_MEM_LEVEL = 8
+
+
+def select_subprotocol(connection, subprotocols):
+    """websockets select_subprotocol hook: pick the best format the client offers.
+
+    Unlike the default, a client that offers no known subprotocol is still
+    accepted (and gets JSON), so older overlays keep working.
+    """
+    for subprotocol in SUBPROTOCOLS:
+        if subprotocol in subprotocols:
+            return subprotocol
+    return None
+
+
+def deflate_extension():
+    """Return the permessage-deflate extension factory to pass to websockets.serve()."""
+    return ServerPerMessageDeflateFactory(
+        server_max_window_bits=DEFLATE_WINDOW_BITS,
+        client_max_window_bits=DEFLATE_WINDOW_BITS,
+        compress_settings={"memLevel": DEFLATE_MEM_LEVEL},
+    )
+
+
+def encode(payload, subprotocol=None):
+    """Encode a message for a connection: bytes for binary formats, str for JSON."""
+    if subprotocol == MSGPACK:
+        return msgpack.packb(payload)
+    if subprotocol == CBOR:
+        return cbor2.dumps(payload)
+    return json.dumps(payload)
+
+
+def decode(message, subprotocol=None):
+    """Decode a command message from a connection. Text frames are always JSON.
+
+    Raises ValueError for undecodable messages and for anything but a map,
+    since every command is one.
+    """
+    if isinstance(message, str):
+        data = json.loads(message)
+    elif subprotocol == MSGPACK:
+        data = msgpack.unpackb(message)
+    elif subprotocol == CBOR:
+        data = cbor2.loads(message)
+    else:
+        data = json.loads(message)
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a command object, got {type(data).__name__}")
+    return data
+
+
+class EncodedMessage:
+    """A payload encoded lazily, at most once per subprotocol."""
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._encoded = {}
+
+    def for_client(self, websocket):
+        # JSON subprotocol and no subprotocol share the same text frame
+        subprotocol = getattr(websocket, "subprotocol", None)
+        if subprotocol not in (MSGPACK, CBOR):
+            subprotocol = JSON
+        encoded = self._encoded.get(subprotocol)
+        if encoded is None:
+            encoded = self._encoded[subprotocol] = encode(self.payload, subprotocol)
+        return encoded
+
+
+def benchmark_encodings(sizes=(10, 1000, 10000), repeat=20):
+    """Print bytes and CPU per nowPlaying broadcast for each encoding and deflate setting."""
+    import time
+    import zlib
+
+    def make_payload(count):
+        entries = [{
+            "id": f"{i:011d}",
+            "title": f"Track {i} (Official Audio)",
+            "author": f"Artist {i % 200} - Topic"
+        } for i in range(count)]
+        return {"command": "nowPlaying", "params": {
+            "title": "Track 0 (Official Audio)", "author": "Artist 0 - Topic",
+            "videoId": "00000000000", "playlist": entries, "currentIndex": 0
+        }}
+
+    def timed(func, *args):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func(*args)
+        return result, (time.perf_counter() - start) / repeat * 1000
+
+    def deflate(data, wbits, mem_level):
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -wbits, mem_level)
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    deflate_settings = (("default 12/5", 12, 5), (f"tuned {DEFLATE_WINDOW_BITS}/{DEFLATE_MEM_LEVEL}",
+                                                  DEFLATE_WINDOW_BITS, DEFLATE_MEM_LEVEL))
+    print(f"{'entries':>7} {'encoding':<16} {'bytes':>9} {'enc ms':>7}"
+          + "".join(f" {name + ' bytes':>18} {'ms':>6}" for name, _, _ in deflate_settings))
+    for count in sizes:
+        payload = make_payload(count)
+        for subprotocol in SUBPROTOCOLS:
+            encoded, encode_ms = timed(encode, payload, subprotocol)
+            data = encoded.encode("utf-8") if isinstance(encoded, str) else encoded
+            row = f"{count:>7} {subprotocol:<16} {len(data):>9} {encode_ms:>7.2f}"
+            for _, wbits, mem_level in deflate_settings:
+                compressed, deflate_ms = timed(deflate, data, wbits, mem_level)
+                row += f" {len(compressed):>18} {deflate_ms:>6.2f}"
+            print(row)
+
+
+if __name__ == "__main__":
+    benchmark_encodings()
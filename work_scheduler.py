@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Priority Work Scheduler
+
+A small shared thread pool for the music player UI's background jobs.
+Jobs run in priority order, so resolving the stream the user just asked
+for never waits behind a 2,000-track playlist import.
+
+Long-running jobs should call checkpoint() between units of work. A
+checkpoint raises JobCancelled if the job was cancelled, and runs any more
+urgent queued jobs inline when no worker is free to take them.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# Priority classes (lower runs first)
+PRIORITY_INTERACTIVE = 0  # Work the user is waiting on right now (e.g. play_current)
+PRIORITY_PREFETCH = 1     # Work the user will probably need soon (e.g. next track)
+PRIORITY_BULK = 2         # Imports and metadata backfill
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PREFETCH: "prefetch",
+    PRIORITY_BULK: "bulk",
+}
+
+# Thread-local holder for the job running on the current worker thread
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+class Job:
+    """A unit of work submitted to the scheduler."""
+
+    def __init__(self, scheduler, func, args, kwargs, priority, key, name):
+        self.scheduler = scheduler
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.key = key
+        self.name = name or getattr(func, "__name__", "job")
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Cancel the job. Queued jobs are skipped; running jobs stop at their next checkpoint."""
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish. Returns True if it finished."""
+        return self.done.wait(timeout)
+
+
+def current_job():
+    """Return the job running on this thread, or None outside a scheduler worker."""
+    return getattr(_current, "job", None)
+
+
+def checkpoint():
+    """Yield point for long-running jobs.
+
+    Raises JobCancelled if the current job was cancelled and lets more
+    urgent work run first. Does nothing when called outside a job.
+    """
+    job = current_job()
+    if job is not None:
+        job.scheduler._checkpoint(job)
+
+
+class WorkScheduler:
+    """Thread pool that runs jobs by priority class.
+
+    One worker is reserved for interactive and prefetch work so that bulk
+    jobs without checkpoints can never occupy every thread.
+    """
+
+    def __init__(self, num_workers=3):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._keyed = {}
+        self._running = set()
+        self._idle = 0
+        self._shutdown = False
+        self._stats = {
+            priority: {
+                "submitted": 0,
+                "completed": 0,
+                "cancelled": 0,
+                "failed": 0,
+                "total_wait": 0.0,
+                "max_wait": 0.0,
+                "started": 0,
+            }
+            for priority in PRIORITY_NAMES
+        }
+
+        self._workers = []
+        for i in range(max(2, num_workers)):
+            # Worker 0 never takes bulk jobs
+            max_priority = PRIORITY_BULK if i == 0 else None
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(max_priority,),
+                name=f"scheduler-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func, *args, priority=PRIORITY_BULK, key=None, name=None, **kwargs):
+        """Queue func(*args, **kwargs) at the given priority.
+
+        If key is given, any earlier unfinished job with the same key is
+        cancelled, so only the latest request for e.g. "play" survives.
+        """
+        job = Job(self, func, args, kwargs, priority, key, name)
+        with self._cond:
+            if self._shutdown:
+                job.cancel()
+                job.done.set()
+                return job
+
+            if key is not None:
+                previous = self._keyed.get(key)
+                if previous is not None and not previous.done.is_set():
+                    previous.cancel()
+                self._keyed[key] = job
+
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._stats[priority]["submitted"] += 1
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, key):
+        """Cancel the unfinished job registered under key, if any."""
+        with self._cond:
+            job = self._keyed.get(key)
+        if job is not None and not job.done.is_set():
+            job.cancel()
+            return True
+        return False
+
+    def cancel_priority(self, priority):
+        """Cancel every queued and running job of a priority class."""
+        with self._cond:
+            jobs = [entry[2] for entry in self._heap if entry[0] == priority]
+            jobs.extend(job for job in self._running if job.priority == priority)
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def stats(self):
+        """Return queue depth, running count and wait times per priority class."""
+        now = time.monotonic()
+        with self._cond:
+            result = {}
+            for priority, name in PRIORITY_NAMES.items():
+                queued = [entry[2] for entry in self._heap
+                          if entry[0] == priority and not entry[2].cancelled]
+                stats = self._stats[priority]
+                result[name] = {
+                    "queued": len(queued),
+                    "running": sum(1 for job in self._running if job.priority == priority),
+                    "oldest_wait": max((now - job.submitted_at for job in queued), default=0.0),
+                    "avg_wait": stats["total_wait"] / stats["started"] if stats["started"] else 0.0,
+                    "max_wait": stats["max_wait"],
+                    "submitted": stats["submitted"],
+                    "completed": stats["completed"],
+                    "cancelled": stats["cancelled"],
+                    "failed": stats["failed"],
+                }
+            return result
+
+    def format_stats(self):
+        """Return stats() as a short human-readable string."""
+        parts = []
+        for name, stats in self.stats().items():
+            parts.append(
+                f"{name}: {stats['queued']} queued, {stats['running']} running, "
+                f"avg wait {stats['avg_wait'] * 1000:.0f} ms, max wait {stats['max_wait'] * 1000:.0f} ms"
+            )
+        return "; ".join(parts)
+
+    def shutdown(self, wait=False):
+        """Stop accepting work and cancel everything still queued or running."""
+        with self._cond:
+            self._shutdown = True
+            pending = [entry[2] for entry in self._heap]
+            pending.extend(self._running)
+            self._cond.notify_all()
+        for job in pending:
+            job.cancel()
+        if wait:
+            for worker in self._workers:
+                worker.join(timeout=2)
+
+    def _pop_job(self, max_priority=None):
+        """Pop the most urgent runnable job. Caller must hold self._cond."""
+        while self._heap:
+            priority, _, job = self._heap[0]
+            if max_priority is not None and priority >= max_priority:
+                return None
+            heapq.heappop(self._heap)
+            if job.cancelled:
+                self._finish_cancelled(job)
+                continue
+            return job
+        return None
+
+    def _finish_cancelled(self, job):
+        """Mark a job that never started as cancelled. Caller must hold self._cond."""
+        self._stats[job.priority]["cancelled"] += 1
+        if self._keyed.get(job.key) is job:
+            del self._keyed[job.key]
+        job.done.set()
+
+    def _worker_loop(self, max_priority):
+        while True:
+            with self._cond:
+                job = self._pop_job(max_priority)
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    job = self._pop_job(max_priority)
+            self._run(job)
+
+    def _run(self, job):
+        previous = current_job()
+        _current.job = job
+        job.started_at = time.monotonic()
+        wait = job.started_at - job.submitted_at
+
+        with self._cond:
+            stats = self._stats[job.priority]
+            stats["started"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+            self._running.add(job)
+
+        outcome = "completed"
+        try:
+            if job.cancelled:
+                raise JobCancelled()
+            job.result = job.func(*job.args, **job.kwargs)
+        except JobCancelled:
+            outcome = "cancelled"
+        except Exception as e:
+            outcome = "failed"
+            job.error = e
+            print(f"Background job '{job.name}' failed: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.monotonic()
+            _current.job = previous
+            with self._cond:
+                self._stats[job.priority][outcome] += 1
+                self._running.discard(job)
+                if self._keyed.get(job.key) is job:
+                    del self._keyed[job.key]
+            job.done.set()
+
+    def _checkpoint(self, job):
+        if job.cancelled:
+            raise JobCancelled()
+
+        # Run more urgent queued work inline when no worker is free to take it
+        while True:
+            with self._cond:
+                if self._idle > 0:
+                    break
+                urgent = self._pop_job(job.priority)
+            if urgent is None:
+                break
+            self._run(urgent)
+
+        if job.cancelled:
+            raise JobCancelled()
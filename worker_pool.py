@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Worker Processes
+
+With --workers N the server runs as one state owner plus N worker
+processes. Workers listen on the same port (SO_REUSEPORT, so the kernel
+spreads new connections across them) and do the per-client work: the
+WebSocket handshakes, encoding, compression and fan-out. The owner keeps
+the authoritative room state, the control socket and the state snapshot.
+
+Owner and workers talk over the worker bus, a Unix socket using the
+control channel's framing:
+
+    owner -> worker   {"type": "state", "room", "state"}     room state changed (playlist only if replaced)
+                      {"type": "songInfo", "room"}           broadcast song info
+                      {"type": "publish", "room", "topic", "payload", "legacy"}
+                      {"type": "upNext", "room"}             up-next window may have changed
+                      {"type": "playlistChange", "room", "change"}  appended or patched entries
+                      {"type": "progress", "room", "progress"}  new playback anchor
+                      {"type": "visualizer", "room", "frame"}   base64 spectrum frame
+                      {"type": "synced"}                     initial state sent
+                      {"type": "shutdown", "code", "reason"}
+    worker -> owner   {"type": "ready"}                      worker is listening
+                      client commands, with a "room" key
+
+Each event is serialized once and written to every worker. A worker that
+stops reading is disconnected once MAX_BUS_BUFFER bytes are queued for it;
+it exits, and the supervisor starts a fresh one that syncs from scratch.
+
+SO_REUSEPORT is available on Linux and the BSDs; check is_supported().
+"""
+
+import asyncio
+import errno
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import control_channel
+
+WORKER_START_TIMEOUT = 10   # Seconds for all workers to report ready
+SUPERVISE_INTERVAL = 1.0    # Seconds between checks for crashed workers
+STOP_GRACE = 1.0            # Seconds between terminating and killing a worker
+MAX_BUS_BUFFER = 64 * 1024 * 1024  # Bytes queued for one worker before it's disconnected
+
+
+def is_supported():
+    """Return True if worker processes can share a port on this platform."""
+    return hasattr(socket, "SO_REUSEPORT") and control_channel.is_supported()
+
+
+def reserve_port(host, port, auto_port=False, max_attempts=10):
+    """Bind (without listening) a SO_REUSEPORT socket, trying the following ports if auto_port is set.
+
+    The owner holds this socket so the port stays taken while workers come
+    and go. It never listens, so the kernel only hands connections to the
+    workers.
+    """
+    address = socket.gethostbyname(host)
+    attempts = max_attempts if auto_port else 1
+    for candidate in range(port, port + attempts):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            sock.bind((address, candidate))
+        except OSError as e:
+            sock.close()
+            if e.errno != errno.EADDRINUSE:
+                raise
+            continue
+        return sock
+    raise OSError(errno.EADDRINUSE, f"No available port in {port}-{port + attempts - 1}")
+
+
+class BusServer(control_channel.ControlServer):
+    """Owner side of the worker bus.
+
+    Frames from workers are client commands, passed on to handle_message(data).
+    Workers that connect are sent initial_events() first, then every event
+    passed to publish().
+    """
+
+    def __init__(self, path, handle_message, initial_events, logger):
+        super().__init__(path, self._dispatch, logger)
+        self.forward = handle_message
+        self.initial_events = initial_events
+        self.ready_count = 0
+
+    async def _dispatch(self, data):
+        if data.get("type") == "ready":
+            self.ready_count += 1
+            return
+        await self.forward(data)
+
+    async def _handle_connection(self, reader, writer):
+        # Written before the connection joins the publish set, with no await
+        # in between, so a worker never sees an event before its initial state
+        for event in self.initial_events():
+            writer.write(self._frame(event))
+        writer.write(self._frame({"type": "synced"}))
+        await super()._handle_connection(reader, writer)
+
+    @staticmethod
+    def _frame(event):
+        return control_channel.encode_frame(json.dumps(event, separators=(",", ":")))
+
+    def publish(self, event):
+        """Send an event to every connected worker."""
+        if not self._writers:
+            return
+        frame = self._frame(event)
+        for writer in list(self._writers):
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() + len(frame) > MAX_BUS_BUFFER:
+                # Stalled; better a restart than unbounded memory here
+                self.logger.warning("Worker is not reading bus events, disconnecting it")
+                writer.transport.abort()
+                continue
+            writer.write(frame)
+
+
+class BusClient:
+    """Worker side of the worker bus."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+
+    async def send(self, data):
+        """Send a client command (or a "ready" notice) to the owner."""
+        self.writer.write(control_channel.encode_frame(json.dumps(data)))
+        await self.writer.drain()
+
+    async def events(self):
+        """Yield events from the owner until it closes the bus."""
+        while True:
+            try:
+                event = await control_channel.read_frame(self.reader)
+            except ConnectionError:
+                return
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class WorkerPool:
+    """Worker processes serving one port, started and supervised by the owner.
+
+    Quacks enough like a websockets server (sockets, close(), wait_closed())
+    for the owner's startup and shutdown code.
+    """
+
+    def __init__(self, command, count, handle_message, initial_events, logger):
+        self.command = command  # worker command line, without --port and --worker-bus
+        self.count = count
+        self.logger = logger
+        self.directory = tempfile.mkdtemp(prefix="ytmusic-workers-")
+        self.bus = BusServer(os.path.join(self.directory, "bus.sock"), handle_message, initial_events, logger)
+        self.sock = None
+        self.processes = []
+        self._closing = False
+        self._supervisor = None
+
+    @property
+    def sockets(self):
+        return [self.sock] if self.sock is not None else []
+
+    @property
+    def port(self):
+        return self.sock.getsockname()[1]
+
+    def _spawn(self):
+        command = [*self.command, "--port", str(self.port), "--worker-bus", self.bus.path]
+        return subprocess.Popen(command)
+
+    async def start(self, host, port, auto_port=False):
+        """Reserve the port, start the bus and the workers, and wait until they all listen."""
+        self.sock = reserve_port(host, port, auto_port)
+        await self.bus.start()
+        self.processes = [self._spawn() for _ in range(self.count)]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WORKER_START_TIMEOUT
+        while self.bus.ready_count < self.count:
+            if loop.time() > deadline or any(process.poll() is not None for process in self.processes):
+                await self._stop_processes()
+                self._cleanup()
+                raise RuntimeError(f"{self.count - self.bus.ready_count} of {self.count} workers failed to start")
+            await asyncio.sleep(0.05)
+
+        self._supervisor = asyncio.create_task(self._supervise())
+        self.logger.info(f"{self.count} workers serving port {self.port}")
+
+    async def _supervise(self):
+        """Restart workers that exit unexpectedly; their clients reconnect to the others."""
+        while not self._closing:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process.poll() is not None and not self._closing:
+                    self.logger.warning(f"Worker {process.pid} exited with {process.returncode}, restarting")
+                    self.processes[index] = self._spawn()
+
+    def close(self, code=1001, reason=""):
+        """Tell the workers to close their connections with code and exit."""
+        self._closing = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        self.bus.publish({"type": "shutdown", "code": int(code), "reason": reason})
+        self.bus.server.close()
+
+    async def _stop_processes(self):
+        """Terminate the workers, killing any still draining after STOP_GRACE seconds."""
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STOP_GRACE
+        while any(process.poll() is None for process in self.processes):
+            if loop.time() > deadline:
+                for process in self.processes:
+                    if process.poll() is None:
+                        process.kill()
+            await asyncio.sleep(0.05)
+
+    async def wait_closed(self):
+        """Wait for the workers to exit. If cancelled (e.g. by a timeout), terminate them."""
+        try:
+            while any(process.poll() is None for process in self.processes):
+                await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._stop_processes())
+            raise
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        self.bus.close()
+        if self.sock is not None:
+            self.sock.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
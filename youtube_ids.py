@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+YouTube URL and ID Parsing
+
+Shared by the UI and the WebSocket server. All patterns are compiled once
+at import time. Besides single-URL helpers, this module can pull every
+video and playlist ID out of a large block of text (chat logs, pasted
+lists, JSON Lines files) in a single pass, streaming line by line so
+memory stays bounded by the number of unique IDs rather than the input size.
+"""
+
+import re
+
+# A bare video ID or playlist ID (whole string)
+VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+PLAYLIST_ID_RE = re.compile(r'^(PL|UU|LL|FL|RD|OL)[A-Za-z0-9_-]{16,32}$')
+
+# Video ID inside a YouTube URL, tried in order
+VIDEO_URL_PATTERNS = [
+    re.compile(r'(?:youtube\.com/watch\?v=|youtu\.be/)([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtube\.com/embed/([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtube\.com/v/([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtube\.com/shorts/([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtube\.com/(?:.*?)#(?:.*?)v=([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtube\.com/watch\?(?:.*?)v=([A-Za-z0-9_-]{11})')
+]
+
+# Playlist ID inside a YouTube URL, tried in order
+PLAYLIST_URL_PATTERNS = [
+    re.compile(r'youtube\.com/playlist\?list=([A-Za-z0-9_-]{16,})'),  # Standard playlist URL
+    re.compile(r'youtube\.com/watch\?.*?list=([A-Za-z0-9_-]{16,})'),  # Video within playlist
+    re.compile(r'youtu\.be/.*?[\?\&]list=([A-Za-z0-9_-]{16,})')       # Shortened URL with playlist
+]
+
+# Scanner for free text: any YouTube URL, or a line holding nothing but an ID
+TEXT_TOKEN_RE = re.compile(
+    r'(?P<url>(?:youtube\.com|youtu\.be)/[^\s"\'<>\\]+)'
+    r'|^[ \t]*(?P<video>[A-Za-z0-9_-]{11})[ \t]*,?$'
+    r'|^[ \t]*(?P<playlist>(?:PL|UU|LL|FL|RD|OL)[A-Za-z0-9_-]{16,32})[ \t]*,?$',
+    re.MULTILINE
+)
+
+VIDEO = "video"
+PLAYLIST = "playlist"
+
+
+def extract_video_id(url):
+    """Extract YouTube video ID from various URL formats."""
+    if not url:
+        return None
+
+    # Check if it's already just an ID (11 characters)
+    if len(url) == 11 and VIDEO_ID_RE.match(url):
+        return url
+
+    # Extract from YouTube URL
+    for pattern in VIDEO_URL_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def extract_playlist_id(url):
+    """Extract YouTube playlist ID from various URL formats."""
+    if not url:
+        return None
+
+    # Check if it's already just an ID (starts with PL, UU, LL, etc.)
+    if PLAYLIST_ID_RE.match(url):
+        return url
+
+    # Extract from YouTube URL
+    for pattern in PLAYLIST_URL_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def iter_youtube_ids(text):
+    """Yield (kind, id) for every YouTube reference in text, in order.
+
+    kind is VIDEO or PLAYLIST. A URL that names both a video and a playlist
+    yields both. Duplicates are not removed here; see iter_unique_ids().
+    """
+    for match in TEXT_TOKEN_RE.finditer(text):
+        url = match.group("url")
+        if url:
+            video_id = extract_video_id(url)
+            if video_id:
+                yield VIDEO, video_id
+            playlist_id = extract_playlist_id(url)
+            if playlist_id:
+                yield PLAYLIST, playlist_id
+        elif match.group("video"):
+            yield VIDEO, match.group("video")
+        else:
+            yield PLAYLIST, match.group("playlist")
+
+
+def iter_youtube_ids_from_lines(lines):
+    """Yield (kind, id) from an iterable of text lines without joining them."""
+    for line in lines:
+        yield from iter_youtube_ids(line)
+
+
+def iter_youtube_ids_from_file(path):
+    """Stream (kind, id) pairs from a text, log or JSON Lines file."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from iter_youtube_ids_from_lines(f)
+
+
+def iter_unique_ids(pairs, seen=None):
+    """Drop (kind, id) pairs that were already yielded (or are in seen)."""
+    if seen is None:
+        seen = set()
+    for kind, item_id in pairs:
+        key = (kind, item_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield kind, item_id
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
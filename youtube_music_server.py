@@ -14,8 +14,25 @@ import logging
 import signal
 import sys
 import socket
+import errno
+import re
 import argparse
 import os
+import subprocess
+import threading
+import urllib.request
+import urllib.parse
+import urllib.error
+import base64
+from youtube_ids import extract_video_id
+import control_channel
+import wire_format
+import worker_pool
+from topic_router import topics_from_path
+from rooms import RoomRegistry, room_from_path
+from overlay_assets import OverlayAssets, http_response
+from thumbnail_cache import ThumbnailCache, ART_SIZES
+from spectrum import FRAME_MAGIC, FRAME_HEADER
 
 # Configure logging
 logging.basicConfig(
@@ -26,85 +43,694 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global variables
-connected_clients = set()
-current_song_info = {
-    "title": "No song playing",
-    "author": "",
-    "videoId": "",
-    "playlist": [],
-    "currentIndex": -1
-}
-
-# Default volume setting
-current_volume = 100
-
-# Real playlist (empty by default)
-playlist = []
-
-async def register(websocket):
-    """Register a new client connection."""
-    global current_volume
-    
-    connected_clients.add(websocket)
-    logger.info(f"New client connected. Total clients: {len(connected_clients)}")
-    
-    # Send current song info to the new client with proper format
-    await websocket.send(json.dumps({
-        "command": "nowPlaying",
-        "params": current_song_info
-    }))
-    
-    # Send current volume setting
-    await websocket.send(json.dumps({
-        "command": "volumeUpdate",
-        "value": current_volume
-    }))
-
-async def unregister(websocket):
-    """Unregister a disconnected client."""
-    connected_clients.remove(websocket)
-    logger.info(f"Client disconnected. Remaining clients: {len(connected_clients)}")
-
-def extract_video_id(url):
-    """Extract YouTube video ID from various URL formats."""
-    import re
-    
-    if not url:
-        return None
-        
-    # Check if it's already just an ID (11 characters)
-    if len(url) == 11 and re.match(r'^[A-Za-z0-9_-]{11}$', url):
-        return url
-        
-    # Extract from YouTube URL
-    patterns = [
-        r'(?:youtube\.com/watch\?v=|youtu\.be/)([A-Za-z0-9_-]{11})',
-        r'youtube\.com/embed/([A-Za-z0-9_-]{11})',
-        r'youtube\.com/v/([A-Za-z0-9_-]{11})',
-        r'youtube\.com/(?:.*?)#(?:.*?)v=([A-Za-z0-9_-]{11})',
-        r'youtube\.com/watch\?(?:.*?)v=([A-Za-z0-9_-]{11})'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
+MAX_ROOMS = 1000  # Rooms are created on first use; see rooms.py
+rooms = RoomRegistry(MAX_ROOMS)
+
+# Metadata resolution settings
+METADATA_WORKERS = 4          # Max concurrent lookups running in the executor
+METADATA_BATCH_SIZE = 50      # YouTube Data API accepts up to 50 IDs per videos.list call
+METADATA_BATCH_WINDOW = 0.05  # Seconds to wait for more IDs before resolving a batch
+
+# Resolved metadata by video ID, and IDs already queued for resolution
+metadata_cache = {}
+metadata_pending = set()
+metadata_queue = None  # Created in main() once the event loop is running
+
+# Warm restart: server state is snapshotted to this file (throttled) and
+# restored on startup before the server accepts connections
+STATE_SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.server_state.json')
+STATE_SNAPSHOT_INTERVAL = 1.0  # Seconds to coalesce changes before writing
+STATE_SNAPSHOT_VERSION = 2    # 2: one entry per room; 1: the default room's state only
+state_changed = None  # asyncio.Event, created in start_server() when snapshots are enabled
+
+# Multi-process mode (--workers N, see worker_pool.py): this process owns the
+# state and publishes changes and broadcasts to the workers, which serve the
+# WebSocket clients and forward their commands here
+worker_bus = None   # BusServer in the owner
+owner_bus = None    # BusClient in a worker
+# Commands a worker answers itself; everything else changes state and goes to the owner
+WORKER_LOCAL_COMMANDS = {"requestCurrentSongInfo", "getPlaylistRange", "subscribe", "unsubscribe", "ping"}
+
+def load_api_key():
+    """Load the YouTube Data API key from api_key.txt if one is present."""
+    try:
+        api_key_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_key.txt")
+        if os.path.exists(api_key_path):
+            with open(api_key_path, 'r') as f:
+                key = f.read().strip()
+                return key or None
+    except Exception as e:
+        logger.warning(f"Error loading API key: {e}")
     return None
 
-async def get_video_info(video_id):
-    """Get video information from YouTube Video ID.
+youtube_api_key = load_api_key()
+
+def mark_state_changed(room, playlist_change=True):
+    """Invalidate a room's cached messages and schedule a state snapshot.
+
+    Workers get the changed state. playlist_change says what happened to
+    the playlist, so a 50k-track playlist isn't sent to them on every
+    volume or index change:
+        True   replaced or changed in some other way: send it whole
+        False  untouched
+        dict   {"append": [entries]} and/or {"updates": [{"index", "title",
+               "author"}]}, applied by the workers in place
+    """
+    room.changed()
+    if state_changed is not None:
+        state_changed.set()
+    if worker_bus is not None:
+        if isinstance(playlist_change, dict):
+            worker_bus.publish({"type": "playlistChange", "room": room.name, "change": playlist_change})
+        worker_bus.publish({"type": "state", "room": room.name,
+                            "state": room.to_snapshot(include_playlist=playlist_change is True)})
+
+def build_state_snapshot():
+    """Return the state of every room as a JSON string."""
+    return json.dumps({
+        "version": STATE_SNAPSHOT_VERSION,
+        "savedAt": time.time(),
+        "rooms": {room.name: room.to_snapshot() for room in rooms}
+    }, separators=(",", ":"))
+
+def write_state_snapshot(path, data):
+    """Atomically write a snapshot produced by build_state_snapshot()."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def load_state_snapshot(path):
+    """Restore each room's playlist, song info and volume from a snapshot file.
+
+    Returns:
+        True if state was restored.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable state snapshot {path}: {e}")
+        return False
+    
+    version = snapshot.get("version")
+    if version == 1:
+        saved_rooms = {rooms.default.name: snapshot}
+    elif version == STATE_SNAPSHOT_VERSION:
+        saved_rooms = snapshot.get("rooms", {})
+    else:
+        logger.warning(f"Ignoring state snapshot with unknown version {version}")
+        return False
+    
+    entries = 0
+    for name, saved in saved_rooms.items():
+        room = rooms.get(name)
+        if room is None:
+            logger.warning(f"Skipping room '{name}' from state snapshot")
+            continue
+        room.restore(saved)
+        entries += len(room.playlist)
+        
+        # Resolved entries seed the metadata cache so re-adding them costs nothing
+        for entry in room.playlist:
+            video_id = entry.get("id")
+            if video_id and entry != placeholder_video_info(video_id):
+                metadata_cache.setdefault(video_id, dict(entry))
     
-    This is a simplified version that doesn't actually fetch from YouTube API.
-    In a real implementation, you would call the YouTube API to get actual metadata.
+    age = time.time() - snapshot.get("savedAt", time.time())
+    logger.info(f"Restored state snapshot: {len(saved_rooms)} rooms, {entries} playlist entries, "
+                f"saved {age:.0f} s ago")
+    return True
+
+async def state_snapshot_writer(path):
+    """Write a snapshot at most every STATE_SNAPSHOT_INTERVAL seconds while state changes."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await state_changed.wait()
+        await asyncio.sleep(STATE_SNAPSHOT_INTERVAL)
+        state_changed.clear()
+        # Serialize on the loop so the snapshot is consistent; write off it
+        data = build_state_snapshot()
+        try:
+            await loop.run_in_executor(None, write_state_snapshot, path, data)
+        except OSError as e:
+            logger.warning(f"Failed to write state snapshot: {e}")
+
+def save_state_snapshot(path):
+    """Write a snapshot immediately, e.g. on shutdown."""
+    try:
+        write_state_snapshot(path, build_state_snapshot())
+    except OSError as e:
+        logger.warning(f"Failed to write state snapshot: {e}")
+
+def track_payload(song_info):
+    """trackUpdate message: the current track without the playlist."""
+    return {
+        "command": "trackUpdate",
+        "params": {
+            "title": song_info.get("title", ""),
+            "author": song_info.get("author", ""),
+            "videoId": song_info.get("videoId", ""),
+            "currentIndex": song_info.get("currentIndex", -1)
+        }
+    }
+
+def playlist_payload(song_info):
+    return {
+        "command": "playlistUpdate",
+        "params": {
+            "playlist": song_info.get("playlist", []),
+            "currentIndex": song_info.get("currentIndex", -1)
+        }
+    }
+
+# Playlist windows: "upNext" subscribers get the entries after the current
+# track; getPlaylistRange pages through the rest. Either way message size
+# doesn't grow with the playlist.
+UP_NEXT_SIZE = 5
+MAX_PLAYLIST_RANGE = 200
+
+def indexed_entry(song_playlist, index):
+    entry = song_playlist[index]
+    return {"index": index, "title": entry.get("title", ""), "author": entry.get("author", ""), "id": entry.get("id", "")}
+
+def up_next_payload(song_info, size=UP_NEXT_SIZE):
+    """upNextUpdate message: the entries after the current track, wrapping around like "next" does."""
+    song_playlist = song_info.get("playlist") or []
+    current_index = song_info.get("currentIndex", -1)
+    total = len(song_playlist)
+    if 0 <= current_index < total:
+        indexes = [(current_index + offset) % total for offset in range(1, min(size, total - 1) + 1)]
+    else:
+        indexes = range(min(size, total))
+    return {
+        "command": "upNextUpdate",
+        "params": {
+            "currentIndex": current_index,
+            "total": total,
+            "entries": [indexed_entry(song_playlist, index) for index in indexes]
+        }
+    }
+
+def playlist_range_payload(song_info, offset, limit):
+    """playlistRange message: up to limit entries starting at offset."""
+    song_playlist = song_info.get("playlist") or []
+    end = min(offset + limit, len(song_playlist))
+    return {
+        "command": "playlistRange",
+        "params": {
+            "offset": offset,
+            "total": len(song_playlist),
+            "currentIndex": song_info.get("currentIndex", -1),
+            "entries": [indexed_entry(song_playlist, index) for index in range(offset, end)]
+        }
+    }
+
+def volume_payload(volume):
+    return {"command": "volumeUpdate", "value": volume}
+
+# Playback progress: the UI sends an anchor (position, duration, playing)
+# when playback starts, pauses or seeks, and when it drifts noticeably.
+# Clients extrapolate from the latest anchor themselves, so nothing is sent
+# while a track simply plays on.
+def progress_payload(progress):
+    """progressUpdate message: the anchor brought forward to now, for clients to extrapolate from."""
+    position = progress["positionMs"]
+    if progress["playing"]:
+        position += int((time.time() - progress["anchoredAt"]) * 1000)
+        if progress["durationMs"] > 0:
+            position = min(position, progress["durationMs"])
+    return {
+        "command": "progressUpdate",
+        "params": {
+            "videoId": progress["videoId"],
+            "positionMs": position,
+            "durationMs": progress["durationMs"],
+            "playing": progress["playing"]
+        }
+    }
+
+# Visualizer frames: small binary spectrum frames at up to 30 fps. The UI
+# sends them base64-encoded in a "visualizer" command; subscribers get the
+# raw bytes as a binary WebSocket message. They are never stored or
+# replayed, and a client that can't keep up misses frames instead of
+# queueing them.
+QUIET_COMMANDS = {"ping", "visualizer"}   # Logged at debug level only
+MAX_VISUALIZER_FRAME = 4 + 255
+VISUALIZER_MAX_BUFFER = 16 * 1024         # Bytes queued for a client before its frames are dropped
+
+def parse_visualizer_frame(params):
+    """Decode and check a visualizer command's frame; returns the bytes, or None if invalid."""
+    try:
+        frame = base64.b64decode(params.get("frame", ""), validate=True)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not FRAME_HEADER.size < len(frame) <= MAX_VISUALIZER_FRAME or frame[0] != FRAME_MAGIC:
+        return None
+    if len(frame) != FRAME_HEADER.size + frame[1]:
+        return None
+    return frame
+
+def parse_progress(params):
+    """Validate a progress command's params; returns the anchor, or None if invalid."""
+    try:
+        position = max(0, int(params.get("positionMs", 0)))
+        duration = max(0, int(params.get("durationMs", 0)))
+    except (TypeError, ValueError, AttributeError, OverflowError):
+        return None
+    return {
+        "videoId": str(params.get("videoId", "")),
+        "positionMs": position,
+        "durationMs": duration,
+        "playing": bool(params.get("playing", False)),
+        "anchoredAt": time.time()
+    }
+
+def now_playing_message(room):
+    """The room's full nowPlaying message, encoded at most once per state change."""
+    return room.cached_message("nowPlaying", lambda: {"command": "nowPlaying", "params": room.song_info})
+
+def topic_message(room, topic):
+    """A topic's current state as a cached message, or None for topics without one."""
+    builders = {
+        "track": lambda: track_payload(room.song_info),
+        "playlist": lambda: playlist_payload(room.song_info),
+        "upNext": lambda: up_next_payload(room.song_info),
+        "volume": lambda: volume_payload(room.volume)
+    }
+    if topic not in builders:
+        return None
+    return room.cached_message(topic, builders[topic])
+
+async def send_topic_snapshots(websocket, room, topics):
+    """Send a client the current state of each topic it just subscribed to."""
+    for topic in topics:
+        if topic == "progress":
+            # Extrapolated at send time, so never cached
+            if room.progress is not None:
+                await websocket.send(wire_format.encode(progress_payload(room.progress), websocket.subprotocol))
+            continue
+        message = topic_message(room, topic)
+        if message is not None:
+            await websocket.send(message.for_client(websocket))
+
+async def register(websocket, room):
+    """Register a new client connection in a room.
+
+    Clients that ask for topics in the connection URL get those topics'
+    current state; others get the full nowPlaying payload and volume.
     """
-    # Return placeholder data - in a real implementation, you'd get this from YouTube API
+    room.clients.add(websocket)
+    logger.info(f"New client connected to room '{room.name}'. Room clients: {len(room.clients)}")
+    
+    request = getattr(websocket, "request", None)
+    topics = topics_from_path(request.path if request is not None else "")
+    added = room.router.add(websocket, topics)
+    if topics is not None:
+        await send_topic_snapshots(websocket, room, added)
+        return
+    
+    # Send current song info and volume, encoded once for the whole room
+    await websocket.send(now_playing_message(room).for_client(websocket))
+    await websocket.send(topic_message(room, "volume").for_client(websocket))
+
+async def unregister(websocket, room):
+    """Unregister a disconnected client (safe to call for one that never finished registering)."""
+    room.clients.discard(websocket)
+    room.router.remove(websocket)
+    logger.info(f"Client disconnected from room '{room.name}'. Room clients: {len(room.clients)}")
+
+def placeholder_video_info(video_id):
+    """Return the placeholder entry used until real metadata is resolved."""
     return {
         "title": f"Video {video_id}",
         "author": "Unknown Artist",
         "id": video_id
     }
 
+def fetch_video_metadata(video_ids):
+    """Resolve titles and authors for a batch of video IDs.
+
+    This blocks on network I/O, so it must run in an executor. The YouTube
+    Data API is used when a key is available (one request per batch), with
+    the keyless oEmbed endpoint as a per-video fallback.
+
+    Returns:
+        dict mapping video ID to {"title", "author", "id"} for every ID that
+        could be resolved.
+    """
+    resolved = {}
+
+    if youtube_api_key:
+        try:
+            query = urllib.parse.urlencode({
+                "part": "snippet",
+                "id": ",".join(video_ids),
+                "key": youtube_api_key
+            })
+            url = f"https://www.googleapis.com/youtube/v3/videos?{query}"
+            with urllib.request.urlopen(url, timeout=10) as response:
+                data = json.loads(response.read().decode("utf-8"))
+            for item in data.get("items", []):
+                snippet = item.get("snippet", {})
+                resolved[item["id"]] = {
+                    "title": snippet.get("title", f"Video {item['id']}"),
+                    "author": snippet.get("channelTitle", "Unknown Artist"),
+                    "id": item["id"]
+                }
+        except Exception as e:
+            logger.warning(f"YouTube API metadata lookup failed: {e}")
+
+    for video_id in video_ids:
+        if video_id in resolved:
+            continue
+        try:
+            query = urllib.parse.urlencode({
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "format": "json"
+            })
+            url = f"https://www.youtube.com/oembed?{query}"
+            with urllib.request.urlopen(url, timeout=10) as response:
+                data = json.loads(response.read().decode("utf-8"))
+            resolved[video_id] = {
+                "title": data.get("title", f"Video {video_id}"),
+                "author": data.get("author_name", "Unknown Artist"),
+                "id": video_id
+            }
+        except Exception as e:
+            logger.warning(f"oEmbed metadata lookup failed for {video_id}: {e}")
+
+    return resolved
+
+async def get_video_info(video_id):
+    """Get video information from YouTube Video ID.
+
+    Returns cached metadata when available. Otherwise the ID is queued for
+    background resolution and a placeholder is returned immediately, so a
+    slow lookup never blocks the event loop for other clients.
+    """
+    if video_id in metadata_cache:
+        return dict(metadata_cache[video_id])
+
+    queue_metadata_lookup(video_id)
+    return placeholder_video_info(video_id)
+
+def queue_metadata_lookup(video_id):
+    """Queue a video ID for background metadata resolution (deduplicated)."""
+    if metadata_queue is None or video_id in metadata_cache or video_id in metadata_pending:
+        return
+    metadata_pending.add(video_id)
+    metadata_queue.put_nowait(video_id)
+
+async def metadata_worker():
+    """Resolve queued video IDs in batches and patch the playlist."""
+    loop = asyncio.get_running_loop()
+
+    while True:
+        batch = [await metadata_queue.get()]
+
+        # Give rapid-fire addVideo commands a moment to join this batch
+        deadline = loop.time() + METADATA_BATCH_WINDOW
+        while len(batch) < METADATA_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(metadata_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            resolved = await loop.run_in_executor(None, fetch_video_metadata, batch)
+        except Exception as e:
+            logger.error(f"Metadata batch failed: {e}")
+            resolved = {}
+        finally:
+            for video_id in batch:
+                metadata_pending.discard(video_id)
+                metadata_queue.task_done()
+
+        if resolved:
+            metadata_cache.update(resolved)
+            await apply_metadata_patch(resolved)
+
+async def apply_metadata_patch(resolved):
+    """Update every room's playlist entries with resolved metadata."""
+    await asyncio.gather(*[apply_room_metadata_patch(room, resolved) for room in rooms])
+
+async def apply_room_metadata_patch(room, resolved):
+    """Update a room's playlist entries with resolved metadata and broadcast a patch.
+
+    Only the changed fields of the affected entries are sent, rather than
+    the whole playlist.
+    """
+    updates = []
+    for index, entry in enumerate(room.playlist):
+        info = resolved.get(entry.get("id"))
+        if info and (entry.get("title") != info["title"] or entry.get("author") != info["author"]):
+            entry["title"] = info["title"]
+            entry["author"] = info["author"]
+            updates.append({"index": index, "title": info["title"], "author": info["author"]})
+
+    if not updates:
+        return
+
+    # Keep the now-playing info in sync if the current track was patched
+    current_id = room.song_info.get("videoId")
+    if current_id in resolved:
+        room.song_info["title"] = resolved[current_id]["title"]
+        room.song_info["author"] = resolved[current_id]["author"]
+    mark_state_changed(room, {"updates": updates})
+
+    await asyncio.gather(broadcast_message(room, {
+        "command": "playlistPatch",
+        "params": {
+            "updates": updates,
+            "currentIndex": room.song_info.get("currentIndex", -1)
+        }
+    }), publish_up_next(room))
+    logger.info(f"Patched metadata for {len(updates)} playlist entries in room '{room.name}'")
+
+async def handle_message(data, websocket=None, room=None):
+    """Apply one command message to a room's state.
+
+    Args:
+        data: The decoded command message
+        websocket: The client that sent it, or None for in-process callers
+        room: The sender's room; in-process and control socket callers pick
+            one with a "room" key in the message (default room otherwise)
+    """
+    if room is None:
+        room = rooms.get(data.get("room"))
+        if room is None:
+            logger.warning(f"Ignoring command for unknown room {data.get('room')!r}")
+            return
+    
+    command = data.get("command")
+    if command is not None and not isinstance(command, str):
+        logger.warning(f"Ignoring invalid command: {command!r}")
+        return
+
+    if command:
+        if command in QUIET_COMMANDS:
+            logger.debug(f"Received command: {command}")
+        else:
+            logger.info(f"Received command: {command}")
+
+        # Handle song info - special handling for nowPlaying command
+        if command == "nowPlaying" and "params" in data:
+            song_params = data["params"]
+            try:
+                playlist = song_params.get("playlist", [])
+                current_index = int(song_params.get("currentIndex", -1))
+                if not isinstance(playlist, list):
+                    raise TypeError("playlist is not a list")
+            except (AttributeError, TypeError, ValueError, OverflowError) as e:
+                logger.warning(f"Invalid nowPlaying params: {e}")
+                return
+            if "title" in song_params and "author" in song_params:
+                # Update the current song info
+                room.song_info = {
+                    "title": song_params["title"],
+                    "author": song_params["author"],
+                    "videoId": song_params.get("videoId", ""),
+                    "playlist": playlist,
+                    "currentIndex": current_index
+                }
+                mark_state_changed(room)
+                # Broadcast updated song info to all clients
+                await broadcast_song_info(room)
+                logger.info(f"Updated song info: {song_params['title']} by {song_params['author']}")
+
+        # Handle playback controls
+        elif command == "play":
+            # Logic for play would go here
+            logger.info("Play command received")
+        elif command == "pause":
+            # Logic for pause would go here
+            logger.info("Pause command received")
+        elif command == "next":
+            # Move to next song
+            if room.playlist and len(room.playlist) > 0:
+                current_index = room.song_info.get("currentIndex", -1)
+                current_index = (current_index + 1) % len(room.playlist)
+                room.song_info = {
+                    "title": room.playlist[current_index]["title"],
+                    "author": room.playlist[current_index]["author"],
+                    "videoId": room.playlist[current_index]["id"],
+                    "playlist": room.playlist,
+                    "currentIndex": current_index
+                }
+                mark_state_changed(room, playlist_change=False)
+                await broadcast_song_info(room)
+        elif command == "previous":
+            # Move to previous song
+            if room.playlist and len(room.playlist) > 0:
+                current_index = room.song_info.get("currentIndex", -1)
+                current_index = (current_index - 1) % len(room.playlist)
+                room.song_info = {
+                    "title": room.playlist[current_index]["title"],
+                    "author": room.playlist[current_index]["author"],
+                    "videoId": room.playlist[current_index]["id"],
+                    "playlist": room.playlist,
+                    "currentIndex": current_index
+                }
+                mark_state_changed(room, playlist_change=False)
+                await broadcast_song_info(room)
+
+        # Handle adding videos to playlist
+        elif command == "addVideo" and "url" in data:
+            video_id = extract_video_id(data["url"]) if isinstance(data["url"], str) else None
+            if video_id:
+                # If video info is provided directly, use it
+                if isinstance(data.get("info"), dict):
+                    video_info = {"title": f"Video {video_id}", "author": "Unknown Artist",
+                                  **data["info"], "id": video_id}
+                    metadata_cache.setdefault(video_id, {
+                        "title": video_info.get("title", f"Video {video_id}"),
+                        "author": video_info.get("author", "Unknown Artist"),
+                        "id": video_id
+                    })
+                else:
+                    # Otherwise use cached info, or a placeholder that the
+                    # metadata workers will patch once resolved
+                    video_info = await get_video_info(video_id)
+
+                # Add to playlist
+                room.playlist.append(video_info)
+
+                # If this is the first song, start playing it
+                if len(room.playlist) == 1:
+                    room.song_info = {
+                        "title": video_info["title"],
+                        "author": video_info["author"],
+                        "videoId": video_info["id"],
+                        "playlist": room.playlist,
+                        "currentIndex": 0
+                    }
+                else:
+                    # Otherwise just update the playlist in the current info
+                    room.song_info["playlist"] = room.playlist
+                mark_state_changed(room, {"append": [video_info]})
+
+                # Broadcast the updated playlist to all clients
+                await broadcast_song_info(room)
+                logger.info(f"Added video {video_id} to playlist")
+            else:
+                logger.warning(f"Invalid YouTube URL: {data['url']}")
+
+        # Handle loading a specific video from playlist
+        elif command == "loadVideo" and "index" in data:
+            try:
+                index = int(data["index"])
+            except (TypeError, ValueError, OverflowError):
+                logger.warning(f"Invalid playlist index: {data['index']!r}")
+                return
+            if 0 <= index < len(room.playlist):
+                room.song_info = {
+                    "title": room.playlist[index]["title"],
+                    "author": room.playlist[index]["author"],
+                    "videoId": room.playlist[index]["id"],
+                    "playlist": room.playlist,
+                    "currentIndex": index
+                }
+                mark_state_changed(room, playlist_change=False)
+                await broadcast_song_info(room)
+                logger.info(f"Loaded video at index {index}")
+
+        # Handle volume control
+        elif command == "volume" and "value" in data:
+            try:
+                volume = int(data["value"])
+            except (TypeError, ValueError, OverflowError):
+                logger.warning(f"Invalid volume: {data['value']!r}")
+                return
+            if 0 <= volume <= 100:
+                room.volume = volume
+                mark_state_changed(room, playlist_change=False)
+                # In a real implementation, you might control actual system volume
+                logger.info(f"Volume set to {volume}")
+                await publish(room, "volume", volume_payload(room.volume))
+
+        # Handle a playback progress anchor from the player
+        elif command == "progress" and "params" in data:
+            progress = parse_progress(data["params"])
+            if progress is None:
+                logger.warning(f"Invalid progress: {data['params']!r}")
+                return
+            room.progress = progress
+            await publish_progress(room)
+
+        # Relay an audio spectrum frame from the player (see spectrum.py)
+        elif command == "visualizer" and "params" in data:
+            frame = parse_visualizer_frame(data["params"])
+            if frame is None:
+                logger.debug("Ignoring invalid visualizer frame")
+                return
+            publish_visualizer(room, frame)
+
+        # Handle request for current song info
+        elif command == "requestCurrentSongInfo":
+            logger.info("Client requested current song info")
+            # Send the current song info with proper command formatting,
+            # or just the subscribed topics to clients that chose topics
+            if websocket is not None and not room.router.is_legacy(websocket):
+                await send_topic_snapshots(websocket, room, room.router.topics(websocket))
+            elif websocket is not None:
+                await websocket.send(now_playing_message(room).for_client(websocket))
+            logger.info(f"Sent current song info to client: {room.song_info.get('title', 'No title')}")
+
+        # Handle a page of the playlist, e.g. for a remote controller's list view
+        elif command == "getPlaylistRange" and websocket is not None:
+            try:
+                offset = max(0, int(data.get("offset", 0)))
+                limit = min(MAX_PLAYLIST_RANGE, max(0, int(data.get("limit", UP_NEXT_SIZE))))
+            except (TypeError, ValueError, OverflowError):
+                logger.warning(f"Invalid playlist range: {data.get('offset')!r}, {data.get('limit')!r}")
+                return
+            await websocket.send(wire_format.encode(playlist_range_payload(room.song_info, offset, limit),
+                                                    websocket.subprotocol))
+
+        # Handle topic subscriptions
+        elif command in ("subscribe", "unsubscribe") and websocket is not None:
+            topics = data.get("topics", [])
+            if not isinstance(topics, list):
+                logger.warning(f"Invalid topics: {topics!r}")
+                return
+            topics = [topic for topic in topics if isinstance(topic, str)]
+            if command == "subscribe":
+                added = room.router.subscribe(websocket, topics)
+                await send_topic_snapshots(websocket, room, added)
+            else:
+                room.router.unsubscribe(websocket, topics)
+
+        # Handle ping command to keep connections alive
+        elif command == "ping":
+            # Just log the ping and don't need to send a response
+            logger.debug("Received ping from client")
+
 async def ws_handler(websocket, path=""):
     """Handle WebSocket connections.
     
@@ -112,291 +738,754 @@ async def ws_handler(websocket, path=""):
         websocket: The WebSocket connection
         path: The request path (required by websockets library)
     """
-    global current_song_info, playlist, current_volume
-    
-    # Register new client
-    await register(websocket)
+    # The room was validated in process_request before the handshake
+    room = rooms.get(room_from_path(websocket.request.path))
+    if room is None:
+        await websocket.close(websockets.CloseCode.TRY_AGAIN_LATER, "Room unavailable")
+        return
     
     try:
+        # Register inside the try: a client that drops while its initial
+        # state is being sent must still be unregistered
+        await register(websocket, room)
+        
         # Process incoming messages
         async for message in websocket:
             try:
-                data = json.loads(message)
-                command = data.get("command")
-                
-                if command:
-                    logger.info(f"Received command: {command}")
-                    
-                    # Handle song info - special handling for nowPlaying command
-                    if command == "nowPlaying" and "params" in data:
-                        song_params = data["params"]
-                        if "title" in song_params and "author" in song_params:
-                            # Update the current song info
-                            current_song_info = {
-                                "title": song_params["title"],
-                                "author": song_params["author"],
-                                "videoId": song_params.get("videoId", ""),
-                                "playlist": song_params.get("playlist", []),
-                                "currentIndex": song_params.get("currentIndex", -1)
-                            }
-                            # Broadcast updated song info to all clients
-                            await broadcast_song_info(current_song_info)
-                            logger.info(f"Updated song info: {song_params['title']} by {song_params['author']}")
-                    
-                    # Handle playback controls
-                    elif command == "play":
-                        # Logic for play would go here
-                        logger.info("Play command received")
-                    elif command == "pause":
-                        # Logic for pause would go here
-                        logger.info("Pause command received")
-                    elif command == "next":
-                        # Move to next song
-                        if playlist and len(playlist) > 0:
-                            current_index = current_song_info.get("currentIndex", -1)
-                            current_index = (current_index + 1) % len(playlist)
-                            current_song_info = {
-                                "title": playlist[current_index]["title"],
-                                "author": playlist[current_index]["author"],
-                                "videoId": playlist[current_index]["id"],
-                                "playlist": playlist,
-                                "currentIndex": current_index
-                            }
-                            await broadcast_song_info(current_song_info)
-                    elif command == "previous":
-                        # Move to previous song
-                        if playlist and len(playlist) > 0:
-                            current_index = current_song_info.get("currentIndex", -1)
-                            current_index = (current_index - 1) % len(playlist)
-                            current_song_info = {
-                                "title": playlist[current_index]["title"],
-                                "author": playlist[current_index]["author"],
-                                "videoId": playlist[current_index]["id"],
-                                "playlist": playlist,
-                                "currentIndex": current_index
-                            }
-                            await broadcast_song_info(current_song_info)
-                    
-                    # Handle adding videos to playlist
-                    elif command == "addVideo" and "url" in data:
-                        video_id = extract_video_id(data["url"])
-                        if video_id:
-                            # If video info is provided directly, use it
-                            if "info" in data:
-                                video_info = data["info"]
-                            else:
-                                # Otherwise get video info (title, author)
-                                video_info = await get_video_info(video_id)
-                            
-                            # Add to playlist
-                            playlist.append(video_info)
-                            
-                            # If this is the first song, start playing it
-                            if len(playlist) == 1:
-                                current_song_info = {
-                                    "title": video_info["title"],
-                                    "author": video_info["author"],
-                                    "videoId": video_info["id"],
-                                    "playlist": playlist,
-                                    "currentIndex": 0
-                                }
-                            else:
-                                # Otherwise just update the playlist in the current info
-                                current_song_info["playlist"] = playlist
-                            
-                            # Broadcast the updated playlist to all clients
-                            await broadcast_song_info(current_song_info)
-                            logger.info(f"Added video {video_id} to playlist")
-                        else:
-                            logger.warning(f"Invalid YouTube URL: {data['url']}")
-                    
-                    # Handle loading a specific video from playlist
-                    elif command == "loadVideo" and "index" in data:
-                        index = int(data["index"])
-                        if 0 <= index < len(playlist):
-                            current_song_info = {
-                                "title": playlist[index]["title"],
-                                "author": playlist[index]["author"],
-                                "videoId": playlist[index]["id"],
-                                "playlist": playlist,
-                                "currentIndex": index
-                            }
-                            await broadcast_song_info(current_song_info)
-                            logger.info(f"Loaded video at index {index}")
-                    
-                    # Handle volume control
-                    elif command == "volume" and "value" in data:
-                        volume = int(data["value"])
-                        if 0 <= volume <= 100:
-                            current_volume = volume
-                            # In a real implementation, you might control actual system volume
-                            logger.info(f"Volume set to {volume}")
-                            # You could broadcast this to all clients if needed
-                    
-                    # Handle request for current song info
-                    elif command == "requestCurrentSongInfo":
-                        logger.info("Client requested current song info")
-                        # Send the current song info with proper command formatting
-                        await websocket.send(json.dumps({
-                            "command": "nowPlaying",
-                            "params": current_song_info
-                        }))
-                        logger.info(f"Sent current song info to client: {current_song_info.get('title', 'No title')}")
-                        
-                    # Handle ping command to keep connections alive
-                    elif command == "ping":
-                        # Just log the ping and don't need to send a response
-                        logger.debug("Received ping from client")
-                            
-            except json.JSONDecodeError:
-                logger.warning(f"Received invalid JSON message: {message}")
+                data = wire_format.decode(message, websocket.subprotocol)
+            except ValueError:
+                logger.warning(f"Received invalid message: {message[:200]!r}")
+                continue
+            command = data.get("command")
+            try:
+                if owner_bus is not None and not (isinstance(command, str) and command in WORKER_LOCAL_COMMANDS):
+                    # JSON on the bus: MessagePack/CBOR values it can't hold raise TypeError here
+                    await owner_bus.send({**data, "room": room.name})
+                else:
+                    await handle_message(data, websocket, room)
+            except websockets.exceptions.ConnectionClosed:
+                raise
+            except Exception:
+                # One bad command mustn't cost the client its connection
+                logger.exception(f"Error handling command {command!r}")
                 
     except websockets.exceptions.ConnectionClosed:
         logger.info("Connection closed")
     finally:
         # Unregister client on disconnect
-        await unregister(websocket)
+        await unregister(websocket, room)
+
+async def send_to_clients(payload, clients):
+    """Send a payload to clients, encoding it once per wire format in use."""
+    await send_message(wire_format.EncodedMessage(payload), clients)
 
-async def broadcast_song_info(song_info):
-    """Send song info to all connected clients."""
-    if not connected_clients:
+async def send_message(message, clients):
+    """Send an already built EncodedMessage to clients."""
+    if not clients:
         return
-    
-    # Format message in the expected structure
-    formatted_message = {
-        "command": "nowPlaying",
-        "params": song_info
-    }
-    
-    message = json.dumps(formatted_message)
-    logger.info(f"Broadcasting: {message}")
-    
     await asyncio.gather(
-        *[client.send(message) for client in connected_clients]
+        *[client.send(message.for_client(client)) for client in list(clients)],
+        return_exceptions=True
     )
-    logger.info(f"Sent song info to {len(connected_clients)} clients")
 
-async def initialize_player():
-    """Initialize the music player state.
+async def publish(room, topic, payload, include_legacy=False):
+    """Send a payload to a topic's subscribers in a room (and legacy clients if asked)."""
+    if worker_bus is not None:
+        worker_bus.publish({"type": "publish", "room": room.name, "topic": topic,
+                            "payload": payload, "legacy": include_legacy})
+    clients = room.router.subscribers[topic]
+    if include_legacy:
+        clients = clients | room.router.legacy
+    await send_to_clients(payload, clients)
+
+async def broadcast_song_info(room):
+    """Send a room's song info to legacy clients and the track/playlist subscribers.
+
+    Subscribers only get the playlist when it actually changed. The messages
+    are the room's cached ones, so clients connecting afterwards reuse them.
+    """
+    song_info = room.song_info
+    prefetch_album_art(song_info)
+    if worker_bus is not None:
+        worker_bus.publish({"type": "songInfo", "room": room.name})
+    if not room.clients:
+        return
+    
+    # Logging the whole payload would mean serializing it again just for the log
+    logger.info(f"Broadcasting to room '{room.name}': {song_info.get('title')} by {song_info.get('author')} "
+                f"({len(song_info.get('playlist') or [])} playlist entries)")
+    
+    # Each message is encoded once per wire format, not once per client
+    router = room.router
+    sends = [send_message(now_playing_message(room), router.legacy),
+             send_message(topic_message(room, "track"), router.subscribers["track"])]
+    song_playlist = song_info.get("playlist", [])
+    if router.has_subscribers("playlist") and song_playlist != room.last_published_playlist:
+        room.last_published_playlist = list(song_playlist)
+        sends.append(send_message(topic_message(room, "playlist"), router.subscribers["playlist"]))
+    sends.append(send_up_next(room))
+    await asyncio.gather(*sends)
+    logger.info(f"Sent song info to {len(room.clients)} clients")
+
+async def send_up_next(room):
+    """Send the up-next window to its subscribers if it changed since it was last sent."""
+    if not room.router.has_subscribers("upNext"):
+        return
+    message = topic_message(room, "upNext")
+    if message.payload["params"] == room.last_published_up_next:
+        return
+    room.last_published_up_next = message.payload["params"]
+    await send_message(message, room.router.subscribers["upNext"])
+
+async def publish_up_next(room):
+    """send_up_next() here and in every worker, e.g. after entries were patched."""
+    if worker_bus is not None:
+        worker_bus.publish({"type": "upNext", "room": room.name})
+    await send_up_next(room)
+
+async def send_progress(room):
+    if room.progress is not None:
+        await send_to_clients(progress_payload(room.progress), room.router.subscribers["progress"])
+
+async def publish_progress(room):
+    """Send the room's progress anchor to its subscribers, here and in every worker."""
+    if worker_bus is not None:
+        worker_bus.publish({"type": "progress", "room": room.name, "progress": room.progress})
+    await send_progress(room)
+
+def send_visualizer_frame(room, frame):
+    """Queue a frame for each visualizer subscriber that isn't already behind."""
+    for client in list(room.router.subscribers["visualizer"]):
+        transport = getattr(client, "transport", None)
+        if transport is None or transport.get_write_buffer_size() > VISUALIZER_MAX_BUFFER:
+            continue
+        # Frames are far below the write limit, so send() doesn't wait on the client
+        asyncio.ensure_future(client.send(frame)).add_done_callback(ignore_send_result)
+
+def ignore_send_result(future):
+    if not future.cancelled():
+        future.exception()
+
+def publish_visualizer(room, frame):
+    """send_visualizer_frame() here and in every worker."""
+    if worker_bus is not None:
+        worker_bus.publish({"type": "visualizer", "room": room.name,
+                            "frame": base64.b64encode(frame).decode("ascii")})
+    send_visualizer_frame(room, frame)
+
+async def broadcast_message(room, payload, topic="playlist"):
+    """Send a command payload to a room's legacy clients and a topic's subscribers."""
+    await publish(room, topic, payload, include_legacy=True)
+
+async def initialize_player(room):
+    """Initialize a room's music player state.
     
     This function replaces the demo_player function and just sets up
     the initial state without continuously cycling through demo songs.
     """
-    global current_song_info, playlist
+    # Keep the song restored from a state snapshot
+    if room.song_info.get("videoId"):
+        logger.info(f"Resuming room '{room.name}' with song: "
+                    f"{room.song_info['title']} by {room.song_info['author']}")
     
     # If we have songs in the playlist, set the current song to the first one
-    if playlist:
-        current_song_info = {
-            "title": playlist[0]["title"],
-            "author": playlist[0]["author"],
-            "videoId": playlist[0]["id"],
-            "playlist": playlist,
+    elif room.playlist:
+        room.song_info = {
+            "title": room.playlist[0]["title"],
+            "author": room.playlist[0]["author"],
+            "videoId": room.playlist[0]["id"],
+            "playlist": room.playlist,
             "currentIndex": 0
         }
-        logger.info(f"Initialized with song: {playlist[0]['title']} by {playlist[0]['author']}")
+        room.changed()
+        logger.info(f"Initialized room '{room.name}' with song: "
+                    f"{room.playlist[0]['title']} by {room.playlist[0]['author']}")
     
     # Otherwise just keep the default "No song playing" state
     else:
-        logger.info("Initialized with empty playlist")
+        logger.info(f"Initialized room '{room.name}' with empty playlist")
     
     # Initial broadcast to all clients
-    await broadcast_song_info(current_song_info)
+    await broadcast_song_info(room)
+
+# Line printed to stdout (with --ready-signal) once the server accepts connections
+READY_SIGNAL = "SERVER_READY"
+
+# Unix socket server for the UI's command stream (None if not enabled)
+control_server = None
+
+# Overlay pages, scripts and styles served over HTTP on the WebSocket port
+overlay_assets = None
+
+# Resized album art, served at /art/<video id>/<size>.jpg
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thumbnail_cache')
+THUMBNAIL_CACHE_MAX_BYTES = 50 * 1024 * 1024
+ART_PATH_RE = re.compile(r'^/art/([A-Za-z0-9_-]{11})/(\w+)\.jpg$')
+ART_CACHE_CONTROL = "public, max-age=86400"
+thumbnail_cache = None
+art_prefetch_tasks = set()
+
+async def serve_album_art(connection, request, video_id, size_name):
+    """Serve a track's art, fetching it first if no overlay has asked for it yet."""
+    if size_name not in ART_SIZES:
+        return connection.respond(404, "Not found\n")
+    if not await thumbnail_cache.ensure(video_id):
+        return connection.respond(404, "Not found\n")
+    body = thumbnail_cache.get(video_id, size_name)
+    if body is None:
+        return connection.respond(404, "Not found\n")
+    return http_response(request, body, "image/jpeg", ART_CACHE_CONTROL, f'"{video_id}-{size_name}"')
+
+async def serve_overlay_asset(connection, request):
+    """process_request hook: answer plain HTTP requests with overlay assets and art.
+
+    WebSocket upgrades go through if their path names a room that exists or
+    can still be created.
+    """
+    if request.headers.get("Upgrade", "").lower() == "websocket":
+        name = room_from_path(request.path)
+        if name is None:
+            return connection.respond(404, "Unknown room\n")
+        if not rooms.can_open(name):
+            return connection.respond(503, "Too many rooms\n")
+        return None
+    match = ART_PATH_RE.match(request.path.split("?", 1)[0])
+    if match and thumbnail_cache is not None:
+        return await serve_album_art(connection, request, *match.groups())
+    if overlay_assets is None:
+        return None
+    return overlay_assets.respond(connection, request)
+
+def prefetch_album_art(song_info):
+    """Cache art for the current and next track in the background."""
+    # Workers share the cache directory and leave prefetching to the owner
+    if thumbnail_cache is None or owner_bus is not None:
+        return
+    video_ids = [song_info.get("videoId")]
+    song_playlist = song_info.get("playlist") or []
+    next_index = song_info.get("currentIndex", -1) + 1
+    if song_playlist and 0 < next_index <= len(song_playlist):
+        video_ids.append(song_playlist[next_index % len(song_playlist)].get("id"))
+    for video_id in video_ids:
+        if video_id and not thumbnail_cache.has(video_id):
+            task = asyncio.create_task(thumbnail_cache.ensure(video_id))
+            art_prefetch_tasks.add(task)
+            task.add_done_callback(art_prefetch_tasks.discard)
+
+# Reload (SIGHUP): a successor process inherits the listening sockets, then
+# this process closes its connections with 1012 so overlays reconnect at once
+RELOAD_READY_TIMEOUT = 10  # Seconds to wait for the successor to accept connections
+DRAIN_TIMEOUT = 5          # Seconds to wait for existing connections to close
+
+# Extra WebSocket servers for inherited sockets beyond the first (e.g. 127.0.0.1 and ::1)
+extra_listeners = []
+
+# Set once a successor owns the listening sockets and files
+handed_off = False
+
+# Set once this process wrote the port file (worker processes never do)
+owns_port_file = False
+
+# Options shared by every listener: overlay assets over plain HTTP, negotiated
+# wire format and permessage-deflate tuned for large playlist snapshots
+SERVE_OPTIONS = dict(
+    process_request=serve_overlay_asset,
+    select_subprotocol=wire_format.select_subprotocol,
+    compression=None,
+    extensions=[wire_format.deflate_extension()],
+)
+
+async def bind_server(host="localhost", port=8765, auto_port=False, max_attempts=10):
+    """Start the WebSocket listener, trying the following ports if auto_port is set.
+
+    Binding directly (rather than probing a port first and binding later)
+    means another process can't grab the port in between.
+
+    Returns:
+        (server, port) - the websockets server and the port it listens on.
+    """
+    attempts = max_attempts if auto_port else 1
+    for candidate in range(port, port + attempts):
+        try:
+            server = await websockets.serve(ws_handler, host, candidate, **SERVE_OPTIONS)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE:
+                raise
+            logger.warning(f"Port {candidate} is in use")
+            continue
+        return server, candidate
+    raise OSError(errno.EADDRINUSE, f"No available port in {port}-{port + attempts - 1}")
+
+async def adopt_server(fds):
+    """Serve WebSockets on listening sockets inherited from a previous server process.
+
+    Returns:
+        (server, port) - the server for the first socket and the port it listens on.
+    """
+    servers = []
+    for fd in fds:
+        sock = socket.socket(fileno=fd)
+        servers.append(await websockets.serve(ws_handler, sock=sock, **SERVE_OPTIONS))
+    extra_listeners.extend(servers[1:])
+    return servers[0], servers[0].sockets[0].getsockname()[1]
+
+def room_state_events():
+    """Worker bus events that bring a newly connected worker up to date."""
+    events = [{"type": "state", "room": room.name, "state": room.to_snapshot()} for room in rooms]
+    events.extend({"type": "progress", "room": room.name, "progress": room.progress}
+                  for room in rooms if room.progress is not None)
+    return events
+
+async def start_worker_pool(host, port, auto_port, count):
+    """Start worker processes serving WebSockets on a shared port.
+
+    Returns:
+        (pool, port) - the WorkerPool, standing in for the websockets
+        server, and the port the workers listen on.
+    """
+    global worker_bus
+    
+    command = [sys.executable, os.path.abspath(__file__)]
+    pool = worker_pool.WorkerPool(command, count, handle_message, room_state_events, logger)
+    worker_bus = pool.bus
+    try:
+        await pool.start(host, port, auto_port)
+    except Exception:
+        worker_bus = None
+        raise
+    return pool, pool.port
+
+async def apply_bus_event(event):
+    """Worker: apply a state change or broadcast published by the owner."""
+    room = rooms.get(event.get("room"))
+    if room is None:
+        return
+    kind = event.get("type")
+    if kind == "state":
+        room.restore(event["state"])
+    elif kind == "playlistChange":
+        room.apply_playlist_change(event["change"])
+    elif kind == "songInfo":
+        await broadcast_song_info(room)
+    elif kind == "publish":
+        await publish(room, event["topic"], event["payload"], event.get("legacy", False))
+    elif kind == "upNext":
+        await send_up_next(room)
+    elif kind == "progress":
+        room.progress = event["progress"]
+        await send_progress(room)
+    elif kind == "visualizer":
+        send_visualizer_frame(room, base64.b64decode(event["frame"]))
+
+async def follow_owner(synced):
+    """Worker: apply bus events until the owner closes the bus or asks us to shut down.
+
+    Returns:
+        (code, reason) to close client connections with.
+    """
+    async for event in owner_bus.events():
+        kind = event.get("type")
+        if kind == "synced":
+            synced.set()
+        elif kind == "shutdown":
+            return event.get("code", websockets.CloseCode.GOING_AWAY), event.get("reason", "")
+        else:
+            await apply_bus_event(event)
+    return websockets.CloseCode.GOING_AWAY, "Server shutting down"
+
+async def run_worker(port, bus_path):
+    """Worker process: serve WebSocket clients on a shared port until the owner stops us."""
+    global owner_bus, overlay_assets, thumbnail_cache
+    
+    overlay_assets = OverlayAssets(os.path.dirname(os.path.abspath(__file__)))
+    thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+    
+    # Get the current state before accepting clients
+    owner_bus = worker_pool.BusClient(bus_path)
+    await owner_bus.connect()
+    synced = asyncio.Event()
+    follower = asyncio.create_task(follow_owner(synced))
+    synced_wait = asyncio.create_task(synced.wait())
+    await asyncio.wait([follower, synced_wait], return_when=asyncio.FIRST_COMPLETED)
+    synced_wait.cancel()
+    if follower.done():
+        return
+    
+    server = await websockets.serve(ws_handler, "localhost", port, reuse_port=True, **SERVE_OPTIONS)
+    await owner_bus.send({"type": "ready"})
+    logger.info(f"Worker {os.getpid()} serving ws://localhost:{port}")
+    
+    # Ctrl+C in a terminal reaches the whole process group; let the owner decide
+    loop = asyncio.get_running_loop()
+    stop_requested = asyncio.Event()
+    install_signal_handlers(loop, {signal.SIGINT: lambda: None, signal.SIGTERM: stop_requested.set})
+    stop_wait = asyncio.create_task(stop_requested.wait())
+    await asyncio.wait([follower, stop_wait], return_when=asyncio.FIRST_COMPLETED)
+    stop_wait.cancel()
+    if follower.done():
+        code, reason = follower.result()
+    else:
+        follower.cancel()
+        code, reason = websockets.CloseCode.GOING_AWAY, "Server shutting down"
+    
+    server.close(code=code, reason=reason)
+    try:
+        await asyncio.wait_for(server.wait_closed(), DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+    owner_bus.close()
+
+async def start_server(host="localhost", port=8765, auto_port=False, control_socket=None,
+                       state_file=None, inherit_fds=None, workers=0):
+    """Start the WebSocket server, the optional control socket and background tasks.
+
+    If state_file is given, state is restored from it before the server
+    accepts connections, and snapshotted back to it as it changes. If
+    inherit_fds is given, the server takes over those listening sockets
+    instead of binding host and port. If workers is given, that many
+    worker processes serve the clients instead of this process.
+
+    Returns:
+        (server, tasks) - the websockets server (or WorkerPool) and the
+        background tasks to cancel on shutdown.
+    """
+    global metadata_queue, control_server, state_changed, overlay_assets, thumbnail_cache
+    
+    if state_file:
+        load_state_snapshot(state_file)
+    overlay_assets = OverlayAssets(os.path.dirname(os.path.abspath(__file__)))
+    thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+    
+    if workers:
+        server, port = await start_worker_pool(host, port, auto_port, workers)
+    elif inherit_fds:
+        server, port = await adopt_server(inherit_fds)
+    else:
+        server, port = await bind_server(host, port, auto_port)
+    logger.info(f"WebSocket server started on ws://{host}:{port}")
+    
+    if control_socket:
+        control_server = await control_channel.start_control_server(control_socket, handle_message, logger)
+        logger.info(f"Control channel listening on {control_socket}")
+    
+    # Initialize the players (replaces demo_player)
+    tasks = [asyncio.create_task(initialize_player(room)) for room in rooms]
+    
+    # Start the background metadata resolvers
+    metadata_queue = asyncio.Queue()
+    tasks.extend(asyncio.create_task(metadata_worker()) for _ in range(METADATA_WORKERS))
+    
+    # Resume resolving placeholders that were pending when the snapshot was taken
+    for room in rooms:
+        for entry in room.playlist:
+            video_id = entry.get("id")
+            if video_id and entry == placeholder_video_info(video_id):
+                queue_metadata_lookup(video_id)
+    
+    if state_file:
+        state_changed = asyncio.Event()
+        tasks.append(asyncio.create_task(state_snapshot_writer(state_file)))
+    
+    return server, tasks
+
+class InProcessServer:
+    """Run the server on a background asyncio loop inside another process.
 
-def is_port_in_use(port):
-    """Check if a port is already in use."""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    Used by the UI to avoid a separate server process: commands are applied
+    directly with handle_message() instead of going over a loopback
+    WebSocket connection. Overlays still connect over WebSocket as usual.
+    With workers, this process is the owner of a worker pool (used by the
+    benchmarks).
+    """
+    
+    def __init__(self, host="localhost", port=8765, workers=0):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.loop = None
+        self.server = None
+        self.tasks = []
+        self.error = None
+        self._ready = threading.Event()
+        self._thread = None
+    
+    def start(self, timeout=5):
+        """Start the server thread and wait until it accepts connections.
+
+        Returns:
+            True once the server is listening, False if it failed to start.
+        """
+        self._thread = threading.Thread(target=self._run, name="websocket-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self.server is not None
+    
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
         try:
-            s.bind(('0.0.0.0', port))
+            self.server, self.tasks = self.loop.run_until_complete(start_server(self.host, self.port, workers=self.workers))
+        except Exception as e:
+            logger.error(f"Failed to start in-process WebSocket server: {e}")
+            self.error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+    
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self.server is not None
+    
+    def submit(self, coro):
+        """Run a coroutine on the server loop from another thread. Returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def send_command(self, data, timeout=None):
+        """Apply a command message as if a client had sent it.
+
+        Returns immediately unless timeout is given, in which case it waits
+        for the command to be applied.
+        """
+        if not self.is_running():
             return False
-        except socket.error:
-            return True
-
-def find_available_port(start_port=8765, max_attempts=10):
-    """Find an available port starting from start_port."""
-    port = start_port
-    for _ in range(max_attempts):
-        if not is_port_in_use(port):
-            return port
-        port += 1
-    raise RuntimeError(f"Could not find an available port after {max_attempts} attempts")
+        future = self.submit(handle_message(data))
+        if timeout is not None:
+            future.result(timeout)
+        return True
+    
+    def stop(self, timeout=5):
+        """Close the server and stop its loop."""
+        if not self.is_running():
+            return
+        
+        async def shutdown():
+            for task in self.tasks:
+                task.cancel()
+            self.server.close()
+            await self.server.wait_closed()
+        
+        try:
+            self.submit(shutdown()).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error stopping in-process server: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.server = None
+
+def listening_sockets(server):
+    """Return every listening socket of the server and any extra listeners."""
+    return [sock for listener in [server, *extra_listeners] for sock in listener.sockets]
+
+def read_ready_line(fd):
+    """Blocking: read the successor's ready line from a pipe ('' if it exited)."""
+    with os.fdopen(fd, 'r') as f:
+        return f.readline()
+
+async def spawn_successor(server, args):
+    """Start a new server process on our listening sockets and wait until it's ready.
+
+    Returns:
+        True if the successor is accepting connections.
+    """
+    if args.state_file:
+        save_state_snapshot(args.state_file)
+    
+    ready_read, ready_write = os.pipe()
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        '--ready-fd', str(ready_write),
+        '--control-socket', args.control_socket,
+        '--state-file', args.state_file
+    ]
+    if isinstance(server, worker_pool.WorkerPool):
+        # The successor's workers join the port next to ours (SO_REUSEPORT)
+        fds = []
+        command += ['--workers', str(server.count), '--port', str(server.port)]
+    else:
+        fds = [sock.fileno() for sock in listening_sockets(server)]
+        command += ['--inherit-fds', ','.join(map(str, fds))]
+    try:
+        process = subprocess.Popen(command, pass_fds=[*fds, ready_write])
+    except OSError as e:
+        logger.error(f"Failed to start successor server: {e}")
+        os.close(ready_read)
+        return False
+    finally:
+        os.close(ready_write)
+    
+    loop = asyncio.get_running_loop()
+    reader = loop.run_in_executor(None, read_ready_line, ready_read)
+    try:
+        line = await asyncio.wait_for(asyncio.shield(reader), RELOAD_READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        line = ""
+    
+    if not line.startswith(READY_SIGNAL):
+        logger.error("Successor server did not become ready, keeping this one")
+        process.kill()
+        await reader
+        return False
+    
+    logger.info(f"Successor server (PID {process.pid}) is ready, draining connections")
+    return True
+
+async def shutdown(server, tasks, args):
+    """Stop accepting connections, drain existing ones and clean up.
+
+    After a hand-off the successor owns the port file, control socket and
+    state snapshot, so they're left alone and clients are closed with 1012
+    (service restart) to make overlays reconnect immediately.
+    """
+    for task in tasks:
+        task.cancel()
+    if control_server is not None:
+        control_server.close()
+    if args.state_file and not handed_off:
+        save_state_snapshot(args.state_file)
+    
+    if handed_off:
+        code, reason = websockets.CloseCode.SERVICE_RESTART, "Server reloading"
+    else:
+        code, reason = websockets.CloseCode.GOING_AWAY, "Server shutting down"
+    listeners = [server, *extra_listeners]
+    for listener in listeners:
+        listener.close(code=code, reason=reason)
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*[listener.wait_closed() for listener in listeners]),
+            DRAIN_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Connections still open after {DRAIN_TIMEOUT} s, exiting anyway")
+    
+    if not handed_off:
+        try:
+            if control_server is not None and os.path.exists(control_server.path):
+                os.remove(control_server.path)
+        except OSError:
+            pass
+
+def install_signal_handlers(loop, handlers):
+    """Run handlers on the event loop when signals arrive.
+
+    Handlers installed with signal.signal() only run once the loop wakes up
+    for some other reason, so a plain signal handler can't stop an idle
+    server. add_signal_handler() wakes the loop; Windows doesn't support it,
+    so fall back to signal.signal() and hand over to the loop thread-safely.
+    """
+    for sig, handler in handlers.items():
+        try:
+            loop.add_signal_handler(sig, handler)
+        except NotImplementedError:
+            signal.signal(sig, lambda signum, frame, handler=handler: loop.call_soon_threadsafe(handler))
 
 async def main():
     """Main server function."""
+    global handed_off, owns_port_file
+    
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='YouTube Music WebSocket Server')
     parser.add_argument('--port', type=int, default=8765, help='Port to bind the WebSocket server to')
     parser.add_argument('--auto-port', action='store_true', help='Automatically find an available port if default is in use')
+    parser.add_argument('--ready-signal', action='store_true',
+                        help=f'Print "{READY_SIGNAL} <port> [<control socket>]" to stdout once the server accepts connections')
+    parser.add_argument('--control-socket', default=control_channel.default_socket_path(),
+                        help='Unix socket path for UI commands (empty to disable)')
+    parser.add_argument('--state-file', default=STATE_SNAPSHOT_FILE,
+                        help='State snapshot for warm restarts (empty to disable)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Serve clients from this many worker processes sharing the port (0 for none)')
+    # Used internally when reloading: the listening sockets and a pipe to report readiness on
+    parser.add_argument('--inherit-fds', help=argparse.SUPPRESS)
+    parser.add_argument('--ready-fd', type=int, help=argparse.SUPPRESS)
+    # Used internally by worker processes: the owner's worker bus
+    parser.add_argument('--worker-bus', help=argparse.SUPPRESS)
     args = parser.parse_args()
     
-    port = args.port
-    
-    # Check if port is in use
-    if is_port_in_use(port):
-        if args.auto_port:
-            old_port = port
-            port = find_available_port(port)
-            logger.warning(f"Port {old_port} is in use, using port {port} instead")
-        else:
-            logger.error(f"Port {port} is already in use! Try:")
-            logger.error(f"  1. Run './stop-server.sh' to stop existing servers")
-            logger.error(f"  2. Run with --auto-port to automatically find an available port")
-            logger.error(f"  3. Specify a different port with --port PORT")
-            sys.exit(1)
+    if args.worker_bus:
+        await run_worker(args.port, args.worker_bus)
+        return
     
-    # Create a port file that UI can read
-    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.server_port'), 'w') as f:
-        f.write(str(port))
+    control_socket = args.control_socket if control_channel.is_supported() else None
+    inherit_fds = [int(fd) for fd in args.inherit_fds.split(',')] if args.inherit_fds else None
+    workers = args.workers
+    if workers and not worker_pool.is_supported():
+        logger.warning("Worker processes need SO_REUSEPORT and Unix sockets; running single-process")
+        workers = 0
     
     # Start WebSocket server
     try:
-        server = await websockets.serve(ws_handler, "localhost", port)
-        logger.info(f"WebSocket server started on ws://localhost:{port}")
+        server, tasks = await start_server("localhost", args.port, args.auto_port, control_socket,
+                                           args.state_file, inherit_fds, workers)
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE:
+            logger.error(f"Failed to start WebSocket server: {e}")
+            sys.exit(1)
+        logger.error(f"Port {args.port} is already in use! Try:")
+        logger.error(f"  1. Run './stop-server.sh' to stop existing servers")
+        logger.error(f"  2. Run with --auto-port to automatically find an available port")
+        logger.error(f"  3. Specify a different port with --port PORT")
+        sys.exit(1)
     except Exception as e:
         logger.error(f"Failed to start WebSocket server: {e}")
         sys.exit(1)
     
-    # Initialize the player (replaces demo_player)
-    init_task = asyncio.create_task(initialize_player())
+    port = server.sockets[0].getsockname()[1]
     
-    # Set up graceful shutdown
-    loop = asyncio.get_event_loop()
+    # Create a port file that UI can read
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.server_port'), 'w') as f:
+        f.write(str(port))
+    owns_port_file = True
     
-    def shutdown_handler(sig, frame):
-        logger.info("Shutting down server...")
-        if not init_task.done():
-            init_task.cancel()
-        server.close()
-        loop.stop()
-        
-        # Clean up port file on shutdown
-        try:
-            port_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.server_port')
-            if os.path.exists(port_file):
-                os.remove(port_file)
-        except:
-            pass
+    # Set up graceful shutdown (SIGINT/SIGTERM) and reload (SIGHUP)
+    loop = asyncio.get_running_loop()
+    stop_requested = asyncio.Event()
+    reload_requested = asyncio.Event()
+    handlers = {signal.SIGINT: stop_requested.set, signal.SIGTERM: stop_requested.set}
+    if hasattr(signal, "SIGHUP"):
+        handlers[signal.SIGHUP] = reload_requested.set
+    install_signal_handlers(loop, handlers)
     
-    # Register shutdown handlers
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        signal.signal(sig, shutdown_handler)
+    # Tell a parent process (e.g. the UI) that we're accepting connections
+    ready_line = f"{READY_SIGNAL} {port}"
+    if control_server is not None:
+        ready_line += f" {control_socket}"
+    if args.ready_signal:
+        print(ready_line, flush=True)
+    if args.ready_fd is not None:
+        os.write(args.ready_fd, f"{ready_line}\n".encode())
+        os.close(args.ready_fd)
     
     logger.info("Press Ctrl+C to exit")
     
-    # Keep the server running
-    await server.wait_closed()
+    # Keep the server running until asked to stop, or a reload succeeds
+    while not stop_requested.is_set():
+        stop_wait = asyncio.create_task(stop_requested.wait())
+        reload_wait = asyncio.create_task(reload_requested.wait())
+        await asyncio.wait([stop_wait, reload_wait], return_when=asyncio.FIRST_COMPLETED)
+        stop_wait.cancel()
+        reload_wait.cancel()
+        
+        if reload_requested.is_set() and not stop_requested.is_set():
+            reload_requested.clear()
+            logger.info("Reloading server...")
+            if await spawn_successor(server, args):
+                handed_off = True
+                break
+    
+    logger.info("Shutting down server...")
+    await shutdown(server, tasks, args)
 
 if __name__ == "__main__":
     # Define port_file outside the try block so it's available in finally
     port_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.server_port')
     
     try:
-        # Ensure clean exit by removing port file on shutdown
-        try:
-            if os.path.exists(port_file):
-                os.remove(port_file)
-        except:
-            pass
-            
         # Run the main async function
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -405,9 +1494,9 @@ if __name__ == "__main__":
         logger.error(f"Error: {e}")
         sys.exit(1)
     finally:
-        # Clean up port file on exit
+        # Clean up port file on exit, unless a successor took it over
         try:
-            if os.path.exists(port_file):
+            if owns_port_file and not handed_off and os.path.exists(port_file):
                 os.remove(port_file)
         except:
             pass
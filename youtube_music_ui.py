@@ -7,11 +7,15 @@ and play YouTube videos directly in the Python application.
 """
 
 import asyncio
+import base64
+import collections
+import ctypes
+import difflib
+import itertools
 import json
 import websockets
-import re
 import tkinter as tk
-from tkinter import ttk, messagebox, Scale
+from tkinter import ttk, messagebox, filedialog, Scale
 import threading
 import time
 import subprocess
@@ -27,19 +31,68 @@ import traceback
 from googleapiclient.errors import HttpError
 from googleapiclient.discovery import build
 from tkinter import TclError
+from youtube_ids import (
+    extract_video_id, extract_playlist_id, iter_youtube_ids,
+    iter_youtube_ids_from_file, iter_unique_ids, batched, VIDEO
+)
+from music_library import MusicLibrary
+from track_table import TrackList, track_to_json
+from playlist_search import PlaylistSearchIndex
+from disk_cache import TTLDiskCache
+from control_channel import ControlClient
+import spectrum
+import loudness
+from vlc_player import PlayerEngine
+from work_scheduler import (
+    WorkScheduler, JobCancelled, checkpoint,
+    PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, PRIORITY_BULK
+)
 
 # Global variables
 websocket_client = None
-current_playlist = []
+current_playlist = TrackList()  # Compact Track records with a dict-compatible interface
 current_index = -1
 ws_server_process = None
 
-# Audio player variables
+# WebSocket server: "process" runs youtube_music_server.py as a child process,
+# "inprocess" runs it on a background asyncio loop inside the UI.
+# Select with the YTMUSIC_SERVER_MODE environment variable.
+server_mode = os.environ.get("YTMUSIC_SERVER_MODE", "process").lower()
+in_process_server = None
+server_ready = False
+
+# YTMUSIC_DEBUG_COMMANDS=1 logs every command sent to the server (truncated;
+# playlists and progress anchors would otherwise flood stdout)
+debug_commands = os.environ.get("YTMUSIC_DEBUG_COMMANDS", "0") == "1"
+DEBUG_COMMAND_CHARS = 300
+server_port = 8765  # Updated from the server's ready signal
+control_client = None  # Unix socket command channel, when the server offers one
+SERVER_READY_TIMEOUT = 10  # seconds
+
+# Audio player variables: one VLC instance and media player for the whole
+# session (see vlc_player.py); player is player_engine.player once created
+player_engine = PlayerEngine(vlc, ['--no-xlib'])
 player = None  # type: ignore
-media = None
 is_playing = False
 current_volume = 80  # Default volume (0-100)
 
+# Playback progress: an anchor (position, duration, playing) is sent when
+# playback starts, pauses or stops, and overlays extrapolate from it. The
+# drift check resends it only if the player strayed from the extrapolation
+# (seeks, buffering stalls).
+progress_anchor = None     # (video_id, position_ms, playing, time.monotonic()) last sent
+PROGRESS_CHECK_MS = 5000   # Drift check interval
+PROGRESS_DRIFT_MS = 750    # Resend the anchor when the player is this far off
+
+# Audio visualizer: VLC's audio callbacks replace its audio output, so the
+# player you hear can't hand over PCM. Instead a silent second player
+# decodes the same stream, kept in step with the real one, and feeds
+# spectrum.SpectrumAnalyzer; frames go to the server's "visualizer" topic.
+# Enable with YTMUSIC_VISUALIZER=1 (needs NumPy; downloads the stream twice).
+visualizer_enabled = os.environ.get("YTMUSIC_VISUALIZER", "0") == "1" and spectrum.is_supported()
+visualizer_tap = None
+VISUALIZER_SYNC_MS = 150   # Re-seek the tap when it's this far from the player
+
 # YouTube API variables
 youtube_api_key = None
 use_api = False
@@ -47,6 +100,72 @@ use_api = False
 # Shutdown state
 is_shutting_down = False  # Flag to track application shutdown state
 
+# Shared background scheduler: interactive play > next-track prefetch > bulk import/backfill
+scheduler = WorkScheduler()
+
+# Resolved audio stream URLs by video ID: {video_id: (url, resolved_at)}
+# YouTube stream URLs expire after a few hours, so entries are only reused briefly
+stream_url_cache = {}
+stream_url_cache_lock = threading.Lock()
+STREAM_URL_TTL = 60 * 60  # seconds
+
+# Library storage backend: "json" (saved_playlist.json) or "sqlite" (music_library.db,
+# for very large libraries). Select with the YTMUSIC_LIBRARY environment variable.
+library_backend = os.environ.get("YTMUSIC_LIBRARY", "json").lower()
+library = None  # MusicLibrary instance when using the sqlite backend
+
+# Synced YouTube playlists: {playlist_id: {"etag": str|None, "itemIds": [...], "syncedAt": float}}
+# Entries added by a sync carry "source": playlist_id so later syncs only touch their own entries
+synced_playlists = {}
+
+# Playlist search: incremental index, debounce timer, and the playlist index
+# shown on each listbox row while a filter is active (None = unfiltered)
+search_index = PlaylistSearchIndex()
+search_after_id = None
+displayed_indexes = None
+SEARCH_DEBOUNCE_MS = 150
+
+# Persistent caches: video metadata by ID, and YouTube search results by normalized
+# query. search.list costs 100 quota units per call, so results are reused for a day.
+metadata_cache = TTLDiskCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadata_cache.json"),
+    ttl=30 * 24 * 60 * 60, max_entries=100000)
+search_cache = TTLDiskCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.json"),
+    ttl=24 * 60 * 60, max_entries=500)
+
+# Loudness normalization: each track's loudness and peak ({"loudness": LUFS,
+# "peak": dBFS}) is measured by a bulk-priority background job and cached
+# for good; tracks then play with a gain towards loudness.TARGET_LOUDNESS.
+# Needs NumPy and ffmpeg; disable with YTMUSIC_NORMALIZE=0.
+loudness_cache = TTLDiskCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "loudness_cache.json"),
+    ttl=10 * 365 * 24 * 60 * 60, max_entries=100000)
+normalize_loudness = os.environ.get("YTMUSIC_NORMALIZE", "1") != "0" and loudness.is_supported()
+loudness_pending = set()  # Video IDs queued or being analyzed
+loudness_pending_lock = threading.Lock()
+
+# YouTube search panel: queries go out only after typing pauses
+YT_SEARCH_DEBOUNCE_MS = 600
+YT_SEARCH_MIN_CHARS = 3
+YT_SEARCH_MAX_RESULTS = 15
+yt_search_after_id = None
+yt_search_results = []
+
+# Bulk ingestion: IDs are resolved in batches of this size
+# (YouTube Data API videos.list accepts up to 50 IDs per call)
+INGEST_BATCH_SIZE = 50
+
+# Main-thread UI dispatch queue. Worker threads never touch Tk directly; they
+# post callbacks here and the Tk loop drains them once per frame. Callbacks
+# posted with a key replace any pending callback with the same key, so e.g.
+# only the latest status text and one playlist re-render run per frame.
+ui_pending = collections.OrderedDict()
+ui_pending_lock = threading.Lock()
+ui_pending_ids = itertools.count()
+UI_FRAME_MS = 16          # Drain interval (~60 fps)
+UI_FRAME_BUDGET = 0.008   # Max seconds of queued callbacks run per frame
+
 # Try to load YouTube API key if available
 try:
     api_key_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_key.txt")
@@ -81,8 +200,52 @@ def safe_get_global(var_name):
     except:
         return None
 
+def is_main_thread():
+    """Return True when running on the Tk main thread."""
+    return threading.current_thread() is threading.main_thread()
+
+def dispatch_ui(func, key=None):
+    """Run func on the Tk main thread at the next UI frame.
+
+    Safe to call from any thread. If key is given, a pending callback with
+    the same key is replaced, so redundant updates collapse into one.
+    """
+    with ui_pending_lock:
+        if key is None:
+            key = ("call", next(ui_pending_ids))
+        else:
+            ui_pending.pop(key, None)
+        ui_pending[key] = func
+
+def drain_ui_queue():
+    """Run queued UI callbacks within the frame budget, then reschedule."""
+    deadline = time.monotonic() + UI_FRAME_BUDGET
+    while time.monotonic() < deadline:
+        with ui_pending_lock:
+            if not ui_pending:
+                break
+            _, func = ui_pending.popitem(last=False)
+        try:
+            func()
+        except Exception as e:
+            print(f"Error in UI callback: {e}")
+            traceback.print_exc()
+
+    if is_shutting_down:
+        return
+    root = safe_get_global('root')
+    if root:
+        try:
+            root.after(UI_FRAME_MS, drain_ui_queue)
+        except TclError:
+            pass
+
 def safe_set_status(message):
     """Safely set the status message, handling the case where the status_var isn't defined yet"""
+    if not is_main_thread():
+        # Only the most recent status text matters
+        dispatch_ui(lambda: safe_set_status(message), key="status")
+        return
     try:
         status_var = safe_get_global('status_var')
         if status_var:
@@ -103,6 +266,13 @@ def safe_update_ui():
 
 def safe_after(delay, func):
     """Safely schedule a function to run after a delay, handling the case where root isn't defined yet"""
+    if not is_main_thread():
+        # Tk must only be touched from the main thread; hand off via the dispatch queue
+        if delay:
+            dispatch_ui(lambda: safe_after(delay, func))
+        else:
+            dispatch_ui(func)
+        return None
     try:
         root = safe_get_global('root')
         if root:
@@ -114,54 +284,6 @@ def safe_after(delay, func):
         # Just run the function directly if there's an error
         func()
 
-def extract_video_id(url):
-    """Extract YouTube video ID from various URL formats."""
-    if not url:
-        return None
-        
-    # Check if it's already just an ID (11 characters)
-    if len(url) == 11 and re.match(r'^[A-Za-z0-9_-]{11}$', url):
-        return url
-        
-    # Extract from YouTube URL
-    patterns = [
-        r'(?:youtube\.com/watch\?v=|youtu\.be/)([A-Za-z0-9_-]{11})',
-        r'youtube\.com/embed/([A-Za-z0-9_-]{11})',
-        r'youtube\.com/v/([A-Za-z0-9_-]{11})',
-        r'youtube\.com/(?:.*?)#(?:.*?)v=([A-Za-z0-9_-]{11})',
-        r'youtube\.com/watch\?(?:.*?)v=([A-Za-z0-9_-]{11})'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    return None
-
-def extract_playlist_id(url):
-    """Extract YouTube playlist ID from various URL formats."""
-    if not url:
-        return None
-        
-    # Check if it's already just an ID (starts with PL, UU, LL, etc.)
-    if re.match(r'^(PL|UU|LL|FL|RD|OL)[A-Za-z0-9_-]{16,32}$', url):
-        return url
-        
-    # Extract from YouTube URL
-    patterns = [
-        r'youtube\.com/playlist\?list=([A-Za-z0-9_-]{16,})',  # Standard playlist URL
-        r'youtube\.com/watch\?.*?list=([A-Za-z0-9_-]{16,})',  # Video within playlist
-        r'youtu\.be/.*?[\?\&]list=([A-Za-z0-9_-]{16,})'       # Shortened URL with playlist
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    return None
-
 def get_audio_stream_url(video_id):
     """Get the best audio stream URL from YouTube using yt-dlp."""
     if not video_id:
@@ -213,6 +335,82 @@ def get_audio_stream_url(video_id):
         print(f"Error getting audio stream URL: {e}")
         return None
 
+def get_cached_audio_stream_url(video_id):
+    """Get an audio stream URL, reusing a recently resolved one if available."""
+    with stream_url_cache_lock:
+        cached = stream_url_cache.get(video_id)
+        if cached and time.time() - cached[1] < STREAM_URL_TTL:
+            return cached[0]
+
+    audio_url = get_audio_stream_url(video_id)
+    if audio_url:
+        with stream_url_cache_lock:
+            stream_url_cache[video_id] = (audio_url, time.time())
+    return audio_url
+
+def prefetch_stream_url(video_id):
+    """Background job: resolve a stream URL ahead of time so playback starts instantly."""
+    with stream_url_cache_lock:
+        cached = stream_url_cache.get(video_id)
+        if cached and time.time() - cached[1] < STREAM_URL_TTL:
+            return
+    print(f"Prefetching audio stream for {video_id}")
+    get_cached_audio_stream_url(video_id)
+
+def prefetch_next_track():
+    """Queue a prefetch of the next track's stream URL, and its loudness analysis."""
+    next_index = current_index + 1
+    if 0 <= next_index < len(current_playlist):
+        video_id = current_playlist[next_index].get("id")
+        if video_id:
+            scheduler.submit(prefetch_stream_url, video_id, priority=PRIORITY_PREFETCH,
+                             key="prefetch", name=f"prefetch {video_id}")
+            queue_loudness_analysis(video_id)
+
+def track_volume(track):
+    """VLC volume for a track: current_volume with the track's loudness gain applied.
+
+    VLC volume is a linear amplitude percentage (100 = unchanged, up to 200).
+    Tracks that haven't been analyzed yet play at current_volume.
+    """
+    if not normalize_loudness or track is None:
+        return current_volume
+    gain = loudness.track_gain(loudness_cache.get(track.get("id")))
+    return max(0, min(200, round(current_volume * 10 ** (gain / 20))))
+
+def queue_loudness_analysis(video_id):
+    """Queue a loudness measurement for a track that hasn't been analyzed yet."""
+    if not normalize_loudness or not video_id or video_id in loudness_cache:
+        return
+    with loudness_pending_lock:
+        if video_id in loudness_pending:
+            return
+        loudness_pending.add(video_id)
+    scheduler.submit(analyze_track_loudness, video_id, priority=PRIORITY_BULK,
+                     name=f"loudness {video_id}")
+
+def analyze_track_loudness(video_id):
+    """Background job: decode a track's stream and cache its loudness.
+
+    Runs on a scheduler thread with the decoder at low CPU priority. The
+    gain takes effect the next time the track starts, never mid-track.
+    """
+    try:
+        audio_url = get_cached_audio_stream_url(video_id)
+        checkpoint()
+        if not audio_url:
+            return
+        result = loudness.analyze(audio_url, checkpoint=checkpoint)
+        if result is None:
+            print(f"Loudness analysis failed for {video_id}")
+            return
+        loudness_cache.set(video_id, result)
+        loudness_cache.flush()
+        print(f"Loudness of {video_id}: {result['loudness']} LUFS, gain {loudness.track_gain(result):+.1f} dB")
+    finally:
+        with loudness_pending_lock:
+            loudness_pending.discard(video_id)
+
 def get_video_info_from_youtube(video_id):
     """Get video information from YouTube Video ID."""
     if not video_id:
@@ -302,6 +500,40 @@ def get_video_info_from_api(video_id):
         print(f"Error using YouTube API: {e}")
         return None
 
+def get_videos_info_from_api(video_ids):
+    """Get video information for up to 50 video IDs with one YouTube Data API call.
+
+    Returns a dict mapping video ID to info for every ID the API returned.
+    """
+    if not youtube_api_key or not video_ids:
+        return {}
+    
+    try:
+        youtube = build('youtube', 'v3', developerKey=youtube_api_key)
+        response = youtube.videos().list(
+            part='snippet',
+            id=",".join(video_ids),
+            maxResults=len(video_ids)
+        ).execute()
+        
+        videos = {}
+        for item in response.get('items', []):
+            snippet = item['snippet']
+            videos[item['id']] = {
+                "title": snippet['title'],
+                "author": snippet['channelTitle'],
+                "id": item['id']
+            }
+        return videos
+    except HttpError as e:
+        print(f"YouTube API error: {e}")
+        if "quota" in str(e).lower():
+            print("YouTube API quota exceeded. Try again later or use yt-dlp method.")
+        return {}
+    except Exception as e:
+        print(f"Error using YouTube API: {e}")
+        return {}
+
 def get_playlist_videos_from_youtube(playlist_id):
     """Get video IDs from a YouTube playlist using yt-dlp."""
     if not playlist_id:
@@ -403,10 +635,15 @@ def get_playlist_videos_from_api(playlist_id):
             next_page_token = response.get('nextPageToken')
             if not next_page_token:
                 break
+            
+            # Let interactive work run between pages, and stop if cancelled
+            checkpoint()
         
         print(f"API: Found {len(videos)} videos in playlist {playlist_id}")
         return videos
             
+    except JobCancelled:
+        raise
     except ImportError:
         print("Google API client not installed. Run 'pip install google-api-python-client'")
         return []
@@ -469,8 +706,9 @@ def add_playlist_videos():
         safe_set_status("Fetching playlist info...")
         safe_update_ui()
         
-        # Start a thread to fetch playlist info and add to playlist
-        threading.Thread(target=fetch_and_add_playlist_thread, args=(playlist_id,), daemon=True).start()
+        # Queue the playlist fetch as bulk work so it never delays playback
+        scheduler.submit(fetch_and_add_playlist_thread, playlist_id, priority=PRIORITY_BULK,
+                         name=f"import playlist {playlist_id}")
     except Exception as e:
         print(f"Error in add_playlist_videos: {e}")
         traceback.print_exc()
@@ -484,8 +722,10 @@ def fetch_and_add_playlist_thread(playlist_id):
         
         if use_api and youtube_api_key:
             try:
-                safe_after(0, lambda: safe_set_status("Fetching playlist info from YouTube API..."))
+                safe_set_status("Fetching playlist info from YouTube API...")
                 videos = get_playlist_videos_from_api(playlist_id)
+            except JobCancelled:
+                raise
             except Exception as api_e:
                 api_error = str(api_e)
                 print(f"API error for playlist: {api_e}")
@@ -493,59 +733,260 @@ def fetch_and_add_playlist_thread(playlist_id):
         # Fall back to yt-dlp if API didn't work or isn't available
         if not videos:
             if api_error:
-                safe_after(0, lambda: safe_set_status("API failed, trying fallback method..."))
+                safe_set_status("API failed, trying fallback method...")
             else:
-                safe_after(0, lambda: safe_set_status("Fetching playlist info..."))
+                safe_set_status("Fetching playlist info...")
                 
             videos = get_playlist_videos_from_youtube(playlist_id)
         
+        checkpoint()
+        
         if videos:
-            # Add to local playlist
-            global current_playlist, current_index
-            initial_playlist_length = len(current_playlist)
-            
-            # Add each video to the playlist
-            for video in videos:
-                current_playlist.append(video)
-            
-            # If this is the first song, set it as current
-            if initial_playlist_length == 0 and videos:
-                current_index = 0
+            # Append, move the index and broadcast together on the UI thread,
+            # so the playlist never changes under the Tk thread's feet
+            def append_videos():
+                global current_index
+                was_empty = not current_playlist
+                current_playlist.extend(videos)
+                if was_empty:
+                    current_index = 0
+                request_playlist_display()
                 
-            # Update UI in the main thread
-            safe_after(0, update_playlist_display)
-            safe_after(0, lambda: safe_set_status(f"Added {len(videos)} videos from playlist"))
-            
-            # Clear the URL entry if it exists
-            def clear_url_entry():
                 entry = safe_get_global('url_entry')
                 if entry:
                     try:
                         entry.delete(0, tk.END)
                     except Exception:
                         pass
-            safe_after(0, clear_url_entry)
-            
-            # Send to websocket clients
-            if 'send_command' in globals():
+                
                 try:
                     send_command("updatePlaylist", {"playlist": current_playlist, "currentIndex": current_index})
                 except Exception as e:
                     print(f"Error sending command: {e}")
             
+            dispatch_ui(append_videos)
+            safe_set_status(f"Added {len(videos)} videos from playlist")
             
             # Show completion message
-            safe_after(0, lambda: messagebox.showinfo(
+            dispatch_ui(lambda: messagebox.showinfo(
                 "Playlist Added", 
                 f"Successfully added {len(videos)} videos from the playlist."
             ))
         else:
-            safe_after(0, lambda: messagebox.showerror("Error", "Failed to fetch playlist information."))
-            safe_after(0, lambda: safe_set_status("Failed to add playlist"))
+            dispatch_ui(lambda: messagebox.showerror("Error", "Failed to fetch playlist information."))
+            safe_set_status("Failed to add playlist")
+    except JobCancelled:
+        print(f"Playlist import cancelled: {playlist_id}")
+        safe_set_status("Playlist import cancelled")
     except Exception as e:
         print(f"Error in fetch_and_add_playlist_thread: {e}")
-        safe_after(0, lambda: messagebox.showerror("Error", f"Failed to add playlist: {e}"))
-        safe_after(0, lambda: safe_set_status("Error"))
+        error_message = f"Failed to add playlist: {e}"
+        dispatch_ui(lambda: messagebox.showerror("Error", error_message))
+        safe_set_status("Error")
+
+def fetch_playlist_items_conditional(playlist_id, etag=None):
+    """Fetch a playlist's items from the YouTube Data API, skipping the download if unchanged.
+
+    The first page is requested with If-None-Match, so an unchanged playlist
+    costs a single 304 response. The first page's ETag covers the item
+    count, so it changes whenever items are added or removed.
+
+    Returns:
+        (videos, etag) where videos is None if the playlist is unchanged.
+    """
+    videos = []
+    first_etag = None
+    page_token = ""
+    
+    while True:
+        query = urllib.parse.urlencode({
+            "part": "snippet,contentDetails",
+            "maxResults": 50,
+            "playlistId": playlist_id,
+            "pageToken": page_token,
+            "key": youtube_api_key
+        })
+        request = urllib.request.Request(f"https://www.googleapis.com/youtube/v3/playlistItems?{query}")
+        if not page_token and etag:
+            request.add_header("If-None-Match", etag)
+        
+        try:
+            with urllib.request.urlopen(request, timeout=15) as response:
+                data = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, etag
+            raise
+        
+        if not page_token:
+            first_etag = data.get("etag")
+        
+        for item in data.get("items", []):
+            snippet = item.get("snippet", {})
+            video_id = item.get("contentDetails", {}).get("videoId")
+            if video_id:
+                videos.append({
+                    "id": video_id,
+                    "title": snippet.get("title", f"Video {video_id}"),
+                    "author": snippet.get("videoOwnerChannelTitle", "Unknown Artist")
+                })
+        
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            break
+        checkpoint()
+    
+    return videos, first_etag
+
+def diff_synced_playlist(playlist_id, videos):
+    """Apply the minimal set of adds, removes and moves so current_playlist matches a source playlist.
+
+    Only entries tagged with this playlist as their source are touched, and
+    they keep their slots. Must run on the UI thread.
+
+    Returns:
+        (added, removed, moved) counts.
+    """
+    global current_index
+    
+    current_entry = current_playlist[current_index] if 0 <= current_index < len(current_playlist) else None
+    new_ids = [video["id"] for video in videos]
+    
+    # First sync of a playlist that was added before sync existed: adopt matching untagged entries
+    if playlist_id not in synced_playlists:
+        wanted = collections.Counter(new_ids)
+        for item in current_playlist:
+            if "source" not in item and wanted.get(item.get("id"), 0) > 0:
+                item["source"] = playlist_id
+                wanted[item["id"]] -= 1
+    
+    slots = [i for i, item in enumerate(current_playlist) if item.get("source") == playlist_id]
+    old_ids = [current_playlist[i].get("id") for i in slots]
+    info_by_id = {video["id"]: video for video in videos}
+    
+    # Entries removed from one place may reappear elsewhere (a move); reuse them
+    removed_pool = collections.defaultdict(list)
+    opcodes = difflib.SequenceMatcher(None, old_ids, new_ids, autojunk=False).get_opcodes()
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag in ("delete", "replace"):
+            for i in range(i1, i2):
+                removed_pool[old_ids[i]].append(current_playlist[slots[i]])
+    
+    added = removed = moved = 0
+    # Apply from the end so earlier slot indexes stay valid
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag == "equal":
+            continue
+        insert_at = slots[i1] if i1 < len(slots) else (slots[-1] + 1 if slots else len(current_playlist))
+        if tag in ("delete", "replace"):
+            for i in reversed(range(i1, i2)):
+                current_playlist.pop(slots[i])
+            insert_at = slots[i1]
+        if tag in ("insert", "replace"):
+            new_entries = []
+            for j in range(j1, j2):
+                video_id = new_ids[j]
+                if removed_pool.get(video_id):
+                    new_entries.append(removed_pool[video_id].pop())
+                    moved += 1
+                else:
+                    entry = dict(info_by_id[video_id])
+                    entry["source"] = playlist_id
+                    new_entries.append(entry)
+                    added += 1
+            current_playlist[insert_at:insert_at] = new_entries
+    removed = sum(len(entries) for entries in removed_pool.values())
+    
+    # Keep pointing at the same track if it survived
+    if current_entry is not None:
+        for i, item in enumerate(current_playlist):
+            if item is current_entry:
+                current_index = i
+                break
+        else:
+            current_index = min(current_index, len(current_playlist) - 1)
+    elif current_playlist and current_index < 0:
+        current_index = 0
+    
+    return added, removed, moved
+
+def sync_playlist_thread(playlist_id):
+    """Background job: incrementally re-import a YouTube playlist."""
+    try:
+        state = synced_playlists.get(playlist_id, {})
+        etag = None
+        videos = None
+        
+        safe_set_status(f"Checking playlist {playlist_id} for changes...")
+        if use_api and youtube_api_key:
+            try:
+                videos, etag = fetch_playlist_items_conditional(playlist_id, state.get("etag"))
+                if videos is None:
+                    safe_set_status("Playlist is up to date")
+                    return
+            except JobCancelled:
+                raise
+            except Exception as api_e:
+                print(f"API error syncing playlist: {api_e}")
+                videos = None
+        
+        if videos is None:
+            # No conditional requests without the API, but identical lists are still skipped cheaply
+            videos = get_playlist_videos_from_youtube(playlist_id)
+            if not videos:
+                safe_set_status("Failed to sync playlist")
+                return
+        
+        checkpoint()
+        
+        new_ids = [video["id"] for video in videos]
+        if state and state.get("itemIds") == new_ids:
+            synced_playlists[playlist_id] = {"etag": etag, "itemIds": new_ids, "syncedAt": time.time()}
+            safe_set_status("Playlist is up to date")
+            return
+        
+        def apply_sync():
+            added, removed, moved = diff_synced_playlist(playlist_id, videos)
+            synced_playlists[playlist_id] = {"etag": etag, "itemIds": new_ids, "syncedAt": time.time()}
+            request_playlist_display()
+            safe_set_status(f"Synced playlist: +{added} added, -{removed} removed, {moved} moved")
+            if added or removed or moved:
+                send_command("updatePlaylist", {"playlist": current_playlist, "currentIndex": current_index})
+        
+        dispatch_ui(apply_sync)
+    except JobCancelled:
+        print(f"Playlist sync cancelled: {playlist_id}")
+        safe_set_status("Playlist sync cancelled")
+    except Exception as e:
+        print(f"Error syncing playlist: {e}")
+        traceback.print_exc()
+        safe_set_status(f"Error syncing playlist: {e}")
+
+def sync_playlist():
+    """Sync the playlist in the URL box, or every previously synced playlist if it's empty."""
+    url = ""
+    url_entry = safe_get_global('url_entry')
+    if url_entry:
+        try:
+            url = url_entry.get().strip()
+        except Exception:
+            pass
+    
+    if url:
+        playlist_id = extract_playlist_id(url)
+        if not playlist_id:
+            messagebox.showerror("Error", "Could not extract valid YouTube playlist ID.")
+            return
+        playlist_ids = [playlist_id]
+    else:
+        playlist_ids = list(synced_playlists)
+        if not playlist_ids:
+            messagebox.showerror("Error", "Enter a YouTube playlist URL or ID to sync.")
+            return
+    
+    for playlist_id in playlist_ids:
+        scheduler.submit(sync_playlist_thread, playlist_id, priority=PRIORITY_BULK,
+                         key=f"sync {playlist_id}", name=f"sync playlist {playlist_id}")
 
 def add_url_to_playlist():
     """Add a URL to the playlist - simplified function to handle missing reference"""
@@ -566,21 +1007,17 @@ def add_url_to_playlist():
             messagebox.showerror("Error", "Could not extract YouTube video ID.")
             return
             
-        # Get video info - first try API, then fallback to yt-dlp
-        video_info = None
-        if use_api and youtube_api_key:
-            video_info = get_video_info_from_api(video_id)
-            
+        # Use cached metadata if we have it; otherwise add a placeholder entry now
+        # and backfill the real title/author in the background
+        video_info = metadata_cache.get(video_id)
         if not video_info:
-            video_info = get_video_info_from_youtube(video_id)
-            
-        if not video_info:
-            # Create a minimal entry if all else fails
             video_info = {
                 "id": video_id,
                 "title": f"Video {video_id}",
                 "author": "Unknown"
             }
+            scheduler.submit(backfill_video_metadata, video_id, priority=PRIORITY_BULK,
+                             name=f"metadata {video_id}")
             
         # Add to playlist
         global current_playlist, current_index
@@ -617,6 +1054,321 @@ def add_url_to_playlist():
         traceback.print_exc()
         return False
 
+def backfill_video_metadata(video_id):
+    """Background job: resolve title/author for a video and patch matching playlist entries."""
+    # Check the metadata cache, then try API, then fallback to yt-dlp
+    video_info = metadata_cache.get(video_id)
+    if not video_info and use_api and youtube_api_key:
+        video_info = get_video_info_from_api(video_id)
+        
+    if not video_info:
+        video_info = get_video_info_from_youtube(video_id)
+        
+    if not video_info:
+        return
+    
+    # Don't cache the placeholder yt-dlp returns on failure
+    if video_info["title"] != f"Video {video_id}":
+        metadata_cache.set(video_id, video_info)
+    
+    def apply_metadata():
+        updated = False
+        for item in current_playlist:
+            if item.get("id") == video_id:
+                item["title"] = video_info["title"]
+                item["author"] = video_info["author"]
+                updated = True
+        if updated:
+            request_playlist_display()
+            update_now_playing_display()
+            send_command("updatePlaylist", {"playlist": current_playlist, "currentIndex": current_index})
+    
+    dispatch_ui(apply_metadata)
+
+def ingest_youtube_ids(pairs, source_name):
+    """Background job: add every video/playlist from a stream of (kind, id) pairs.
+
+    The pairs are consumed lazily and deduplicated (including against the
+    current playlist), video IDs are resolved in batches, and each batch is
+    appended on the UI thread, so memory stays bounded for very large inputs.
+    """
+    # Snapshot the IDs already queued so re-imports don't add duplicates
+    seen = {(VIDEO, item.get("id")) for item in list(current_playlist)}
+    added = 0
+    skipped_playlists = 0
+    
+    def append_videos(videos):
+        global current_index
+        was_empty = not current_playlist
+        current_playlist.extend(videos)
+        if was_empty and current_playlist:
+            current_index = 0
+        request_playlist_display()
+    
+    try:
+        safe_set_status(f"Importing from {source_name}...")
+        video_ids = []
+        
+        def flush_videos():
+            nonlocal added
+            if not video_ids:
+                return
+            # One API call per batch when available, placeholders otherwise
+            info = {video_id: metadata_cache.get(video_id) for video_id in video_ids}
+            info = {video_id: value for video_id, value in info.items() if value}
+            missing = [video_id for video_id in video_ids if video_id not in info]
+            if missing and use_api and youtube_api_key:
+                fetched = get_videos_info_from_api(missing)
+                metadata_cache.update(fetched)
+                info.update(fetched)
+            videos = [info.get(video_id) or {
+                "id": video_id,
+                "title": f"Video {video_id}",
+                "author": "Unknown"
+            } for video_id in video_ids]
+            for video_id in video_ids:
+                if video_id not in info:
+                    scheduler.submit(backfill_video_metadata, video_id, priority=PRIORITY_BULK,
+                                     name=f"metadata {video_id}")
+            dispatch_ui(lambda: append_videos(videos))
+            added += len(videos)
+            video_ids.clear()
+            safe_set_status(f"Importing from {source_name}: {added} videos added...")
+            checkpoint()
+        
+        for kind, item_id in iter_unique_ids(pairs, seen):
+            if kind == VIDEO:
+                video_ids.append(item_id)
+                if len(video_ids) >= INGEST_BATCH_SIZE:
+                    flush_videos()
+            else:
+                flush_videos()
+                videos = []
+                if use_api and youtube_api_key:
+                    videos = get_playlist_videos_from_api(item_id)
+                if not videos:
+                    videos = get_playlist_videos_from_youtube(item_id)
+                if not videos:
+                    skipped_playlists += 1
+                    continue
+                videos = [video for video in videos if (VIDEO, video["id"]) not in seen]
+                seen.update((VIDEO, video["id"]) for video in videos)
+                for batch in batched(videos, INGEST_BATCH_SIZE):
+                    dispatch_ui(lambda batch=batch: append_videos(batch))
+                    added += len(batch)
+                safe_set_status(f"Importing from {source_name}: {added} videos added...")
+                checkpoint()
+        flush_videos()
+        
+        message = f"Imported {added} videos from {source_name}"
+        if skipped_playlists:
+            message += f" ({skipped_playlists} playlists could not be fetched)"
+        safe_set_status(message)
+        
+        if added:
+            dispatch_ui(lambda: send_command("updatePlaylist", {"playlist": current_playlist, "currentIndex": current_index}))
+    except JobCancelled:
+        print(f"Import from {source_name} cancelled after {added} videos")
+        safe_set_status(f"Import cancelled ({added} videos added)")
+    except Exception as e:
+        print(f"Error importing from {source_name}: {e}")
+        traceback.print_exc()
+        safe_set_status(f"Import failed: {e}")
+
+def import_from_text(text):
+    """Queue a bulk import of every YouTube link or ID in a block of text."""
+    scheduler.submit(ingest_youtube_ids, iter_youtube_ids(text), "pasted text",
+                     priority=PRIORITY_BULK, name="import pasted text")
+
+def import_from_file():
+    """Ask for a text/log/JSON Lines file and queue a bulk import of its YouTube links."""
+    path = filedialog.askopenfilename(
+        title="Import YouTube links",
+        filetypes=[("Text, logs and JSON Lines", "*.txt *.log *.jsonl *.json"), ("All files", "*.*")]
+    )
+    if not path:
+        return
+    scheduler.submit(ingest_youtube_ids, iter_youtube_ids_from_file(path), os.path.basename(path),
+                     priority=PRIORITY_BULK, name=f"import {path}")
+
+def open_bulk_import_dialog():
+    """Show a dialog for pasting many YouTube links at once."""
+    root = safe_get_global('root')
+    dialog = tk.Toplevel(root)
+    dialog.title("Add Many")
+    dialog.geometry("600x400")
+    
+    ttk.Label(dialog, text="Paste YouTube links, video IDs or playlist IDs (any text works):").pack(
+        anchor=tk.W, padx=10, pady=(10, 5))
+    
+    text_frame = ttk.Frame(dialog)
+    text_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+    text_scroll = ttk.Scrollbar(text_frame)
+    text_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+    text_box = tk.Text(text_frame, wrap=tk.WORD, yscrollcommand=text_scroll.set)
+    text_box.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    text_scroll.config(command=text_box.yview)
+    
+    def on_add():
+        text = text_box.get("1.0", tk.END)
+        dialog.destroy()
+        import_from_text(text)
+    
+    def on_file():
+        dialog.destroy()
+        import_from_file()
+    
+    buttons = ttk.Frame(dialog)
+    buttons.pack(fill=tk.X, padx=10, pady=10)
+    ttk.Button(buttons, text="Add All", command=on_add).pack(side=tk.LEFT, padx=5)
+    ttk.Button(buttons, text="Import File...", command=on_file).pack(side=tk.LEFT, padx=5)
+    ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+    text_box.focus_set()
+
+def normalize_search_query(query):
+    """Normalize a search query for caching (case and whitespace insensitive)."""
+    return " ".join(query.casefold().split())
+
+def search_youtube_api(query):
+    """Search YouTube videos with the Data API (costs 100 quota units per call)."""
+    youtube = build('youtube', 'v3', developerKey=youtube_api_key)
+    response = youtube.search().list(
+        part='snippet',
+        q=query,
+        type='video',
+        maxResults=YT_SEARCH_MAX_RESULTS
+    ).execute()
+    
+    results = []
+    for item in response.get('items', []):
+        video_id = item.get('id', {}).get('videoId')
+        if video_id:
+            results.append({
+                "id": video_id,
+                "title": item['snippet']['title'],
+                "author": item['snippet']['channelTitle']
+            })
+    return results
+
+def search_youtube_ytdlp(query):
+    """Search YouTube videos with yt-dlp (no API quota needed)."""
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True,
+        'skip_download': True,
+        'ignoreerrors': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(f"ytsearch{YT_SEARCH_MAX_RESULTS}:{query}", download=False)
+    
+    results = []
+    for entry in (info or {}).get('entries') or []:
+        if entry and entry.get('id'):
+            results.append({
+                "id": entry['id'],
+                "title": entry.get('title', f"Video {entry['id']}"),
+                "author": entry.get('uploader') or entry.get('channel') or "Unknown Artist"
+            })
+    return results
+
+def youtube_search_job(query):
+    """Background job: search YouTube, using the on-disk cache when possible."""
+    key = normalize_search_query(query)
+    results = search_cache.get(key)
+    
+    if results is None:
+        checkpoint()
+        try:
+            if use_api and youtube_api_key:
+                results = search_youtube_api(query)
+            else:
+                results = search_youtube_ytdlp(query)
+        except HttpError as e:
+            print(f"YouTube API search error: {e}")
+            if "quota" in str(e).lower():
+                safe_set_status("YouTube API quota exceeded, search unavailable")
+            else:
+                safe_set_status("Search failed")
+            return
+        except Exception as e:
+            print(f"Error searching YouTube: {e}")
+            safe_set_status("Search failed")
+            return
+        
+        search_cache.set(key, results)
+        search_cache.flush()
+        
+        # Pre-warm the metadata cache so adding a result needs no further lookup
+        metadata_cache.update({result["id"]: result for result in results})
+        metadata_cache.flush()
+    
+    checkpoint()
+    dispatch_ui(lambda: show_youtube_search_results(query, results))
+
+def show_youtube_search_results(query, results):
+    """Fill the search results list, unless the query has changed meanwhile."""
+    global yt_search_results
+    yt_search_var = safe_get_global('yt_search_var')
+    yt_results_listbox = safe_get_global('yt_results_listbox')
+    if not yt_search_var or not yt_results_listbox:
+        return
+    if normalize_search_query(yt_search_var.get()) != normalize_search_query(query):
+        return
+    
+    yt_search_results = results
+    yt_results_listbox.delete(0, tk.END)
+    for result in results:
+        yt_results_listbox.insert(tk.END, f"{result['title']} - {result['author']}")
+    safe_set_status(f"{len(results)} search results for '{query}'")
+
+def on_youtube_search_changed(*args):
+    """Debounce the YouTube search box; only search after typing pauses."""
+    global yt_search_after_id
+    root = safe_get_global('root')
+    yt_search_var = safe_get_global('yt_search_var')
+    if not root or not yt_search_var:
+        return
+    if yt_search_after_id is not None:
+        try:
+            root.after_cancel(yt_search_after_id)
+        except Exception:
+            pass
+        yt_search_after_id = None
+    
+    query = yt_search_var.get().strip()
+    if len(query) < YT_SEARCH_MIN_CHARS:
+        # Drop any in-flight search for an older query
+        scheduler.cancel("youtube search")
+        return
+    yt_search_after_id = root.after(YT_SEARCH_DEBOUNCE_MS, lambda: start_youtube_search(query))
+
+def start_youtube_search(query):
+    """Queue a YouTube search; a newer search supersedes an older one."""
+    global yt_search_after_id
+    yt_search_after_id = None
+    safe_set_status(f"Searching YouTube for '{query}'...")
+    scheduler.submit(youtube_search_job, query, priority=PRIORITY_INTERACTIVE,
+                     key="youtube search", name=f"search {query}")
+
+def add_selected_search_result(event=None):
+    """Add the selected search result to the playlist."""
+    global current_index
+    yt_results_listbox = safe_get_global('yt_results_listbox')
+    if not yt_results_listbox:
+        return
+    selection = yt_results_listbox.curselection()
+    if not selection or selection[0] >= len(yt_search_results):
+        return
+    
+    result = yt_search_results[selection[0]]
+    current_playlist.append(dict(result))
+    if len(current_playlist) == 1:
+        current_index = 0
+    update_playlist_display()
+    safe_set_status(f"Added: {result['title']}")
+    send_command("updatePlaylist", {"playlist": current_playlist, "currentIndex": current_index})
+
 def send_command(command, data=None):
     """Send a command to connected WebSocket clients.
     
@@ -631,19 +1383,34 @@ def send_command(command, data=None):
         }
         
         # Convert to JSON string
-        json_message = json.dumps(message)
+        json_message = json.dumps(message, default=track_to_json)
+        
+        if debug_commands:
+            print(f"Sending message ({len(json_message)} bytes): {json_message[:DEBUG_COMMAND_CHARS]}")
         
-        print(f"Sending message: {json_message}")  # Debug output
+        # In-process server: apply the command directly, no loopback connection.
+        # The JSON round trip gives the server its own copy of the data.
+        if in_process_server is not None:
+            return in_process_server.send_command(json.loads(json_message))
+        
+        # Local control channel: one framed write on a persistent connection
+        if control_client is not None:
+            try:
+                control_client.send(json_message)
+                return True
+            except OSError as e:
+                print(f"Control channel error, falling back to WebSocket: {e}")
         
         # Use asyncio to send the message over WebSocket
         async def send_ws_message():
             try:
-                # Connect to the WebSocket server (default port 8765)
-                uri = "ws://localhost:8765"
+                # Connect to the WebSocket server on the port it reported
+                uri = f"ws://localhost:{server_port}"
                 # Remove 'timeout' argument for compatibility
                 async with websockets.connect(uri) as websocket:
                     await websocket.send(json_message)
-                    print(f"Successfully sent command: {command}")
+                    if debug_commands:
+                        print(f"Successfully sent command: {command}")
                     return True
             except (ConnectionRefusedError, websockets.exceptions.ConnectionClosedError) as e:
                 print(f"WebSocket connection error: {e}")
@@ -701,19 +1468,40 @@ def update_song_info():
             send_command("nowPlaying", song_info)
        
 
+def get_library():
+    """Open the SQLite library on first use, migrating saved_playlist.json if needed."""
+    global library
+    if library is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        library = MusicLibrary(os.path.join(script_dir, "music_library.db"))
+        if library.migrate_from_json(os.path.join(script_dir, "saved_playlist.json")):
+            print(f"Migrated saved_playlist.json into {library.db_path}")
+    return library
+
 def save_playlist_to_file():
     """Save playlist to a local file."""
     global current_playlist, current_index
     
+    if library_backend == "sqlite":
+        try:
+            lib = get_library()
+            written = lib.save_playlist(current_playlist)
+            lib.set_meta(currentIndex=current_index, syncedPlaylists=synced_playlists)
+            print(f"Playlist saved to {lib.db_path} ({written} rows written)")
+        except Exception as e:
+            print(f"Error saving playlist to library: {e}")
+        return
+    
     try:
         playlist_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_playlist.json")
         data = {
             "playlist": current_playlist,
-            "currentIndex": current_index
+            "currentIndex": current_index,
+            "syncedPlaylists": synced_playlists
         }
         
         with open(playlist_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(data, f, ensure_ascii=False, indent=2, default=track_to_json)
             
         print(f"Playlist saved to {playlist_file}")
     except Exception as e:
@@ -721,28 +1509,94 @@ def save_playlist_to_file():
 
 def load_playlist_from_file():
     """Load playlist from a local file on startup."""
-    global current_playlist, current_index
+    global current_playlist, current_index, synced_playlists
+    if library_backend == "sqlite":
+        try:
+            lib = get_library()
+            current_playlist = TrackList(lib.iter_tracks())
+            current_index = lib.get_meta("currentIndex", -1)
+            synced_playlists = lib.get_meta("syncedPlaylists", {})
+            print(f"Loaded {len(current_playlist)} tracks from {lib.db_path}")
+        except Exception as e:
+            print(f"Error loading library: {e}")
+            current_playlist = TrackList()
+            current_index = -1
+        return
+    
     try:
         playlist_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_playlist.json")
         if os.path.exists(playlist_file):
             with open(playlist_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                current_playlist = data.get("playlist", [])
+                current_playlist = TrackList(data.get("playlist", []))
                 current_index = data.get("currentIndex", -1)
+                synced_playlists = data.get("syncedPlaylists", {})
             print(f"Loaded playlist from {playlist_file}")
         else:
-            current_playlist = []
+            current_playlist = TrackList()
             current_index = -1
     except Exception as e:
         print(f"Error loading playlist: {e}")
-        current_playlist = []
+        current_playlist = TrackList()
         current_index = -1
 
+def request_playlist_display():
+    """Schedule a playlist re-render; multiple requests within a frame collapse into one."""
+    dispatch_ui(update_playlist_display, key="playlist")
+
+def get_search_query():
+    """Return the current search box text, or an empty string."""
+    search_var = safe_get_global('search_var')
+    try:
+        return search_var.get().strip() if search_var else ""
+    except Exception:
+        return ""
+
+def listbox_row_to_index(row):
+    """Map a listbox row to its playlist index, accounting for an active filter."""
+    if displayed_indexes is None:
+        return row
+    if 0 <= row < len(displayed_indexes):
+        return displayed_indexes[row]
+    return -1
+
+def on_search_changed(*args):
+    """Debounce search box keystrokes; filter once typing pauses."""
+    global search_after_id
+    root = safe_get_global('root')
+    if not root:
+        return
+    if search_after_id is not None:
+        try:
+            root.after_cancel(search_after_id)
+        except Exception:
+            pass
+    search_after_id = root.after(SEARCH_DEBOUNCE_MS, run_search)
+
+def run_search():
+    """Apply the search filter to the playlist display."""
+    global search_after_id
+    search_after_id = None
+    start = time.perf_counter()
+    update_playlist_display()
+    query = get_search_query()
+    if query:
+        count = len(displayed_indexes or [])
+        elapsed = (time.perf_counter() - start) * 1000
+        safe_set_status(f"{count} tracks match '{query}' ({elapsed:.0f} ms)")
+
+def clear_search():
+    """Clear the search box and show the whole playlist."""
+    search_var = safe_get_global('search_var')
+    if search_var:
+        search_var.set("")
+    run_search()
+
 def update_playlist_display():
     """Update the playlist in the UI."""
     # This function needs to be defined globally so it can be referenced
     # by other functions before the UI is created
-    global current_playlist, current_index
+    global current_playlist, current_index, displayed_indexes
     
     # Only update if the playlist_listbox has been created
     playlist_listbox = safe_get_global('playlist_listbox')
@@ -750,7 +1604,13 @@ def update_playlist_display():
         try:
             playlist_listbox.delete(0, tk.END)
             
-            for i, item in enumerate(current_playlist):
+            # Keep the search index current (only changed tracks are re-indexed)
+            search_index.refresh(current_playlist)
+            displayed_indexes = search_index.matching_indexes(current_playlist, get_search_query())
+            rows = displayed_indexes if displayed_indexes is not None else range(len(current_playlist))
+            
+            for i in rows:
+                item = current_playlist[i]
                 title = item.get("title", "Unknown Title")
                 author = item.get("author", "Unknown Artist")
                 display_text = f"{title} - {author}"
@@ -794,7 +1654,7 @@ def remove_selected():
             return
             
         # Get the selected index
-        selected_index = selection[0]
+        selected_index = listbox_row_to_index(selection[0])
         
         # Remove from playlist
         if 0 <= selected_index < len(current_playlist):
@@ -842,7 +1702,7 @@ def on_app_loaded():
 # UI Functions
 def play_current():
     print(f"[DEBUG] play_current called, current_index={current_index}, playlist length={len(current_playlist)}")
-    global is_playing, player, media, current_volume
+    global is_playing, player, current_volume
 
     if not current_playlist or current_index < 0 or current_index >= len(current_playlist):
         safe_set_status("No track selected")
@@ -857,88 +1717,203 @@ def play_current():
             safe_set_status("Invalid track (no video ID)")
             return
 
-        # Get audio stream URL
+        # Resolve the audio stream in the background at interactive priority;
+        # a newer play request supersedes this one
         safe_set_status(f"Getting audio for {track.get('title', 'Unknown')}...")
-        audio_url = get_audio_stream_url(video_id)
+        scheduler.submit(resolve_and_play, track, priority=PRIORITY_INTERACTIVE,
+                         key="play", name=f"play {video_id}")
+    except Exception as e:
+        safe_set_status(f"Playback error: {e}")
+        traceback.print_exc()
 
-        if not audio_url:
-            safe_set_status("Could not get audio stream")
-            return
+def resolve_and_play(track):
+    """Background job: resolve the track's audio stream, then start playback on the UI thread."""
+    video_id = track.get("id")
+    audio_url = get_cached_audio_stream_url(video_id)
+    checkpoint()
 
+    if not audio_url:
+        safe_set_status("Could not get audio stream")
+        return
+
+    dispatch_ui(lambda: start_playback(track, audio_url))
+
+def start_playback(track, audio_url):
+    """Start playing a resolved audio stream in VLC."""
+    global is_playing, player, current_volume
+
+    # Ignore stale results if the user moved on while the stream was resolving
+    if not (0 <= current_index < len(current_playlist)) or current_playlist[current_index] is not track:
+        return
+
+    try:
+        # Reuse the session's player; the previous track's media is released
+        # when the new one replaces it
         try:
-            # Stop any existing playback
-            if player:
-                player.stop()
-                # Remove previous event manager if any
-                try:
-                    event_manager = player.event_manager()
-                    event_manager.event_detach(MEDIAPLAYER_ENDREACHED)
-                except Exception:
-                    pass
-
-            # Create a new VLC instance if needed
-            if player is None:
-                vlc_instance = vlc.Instance('--no-xlib')
-                if vlc_instance is None:
-                    safe_set_status("VLC is not available. Please check your VLC installation.")
-                    print("Error: vlc.Instance() returned None. VLC may not be installed or configured correctly.")
-                    return
-                player = vlc_instance.media_player_new()
+            player = player_engine.ensure_player()
+        except RuntimeError as e:
+            safe_set_status("VLC is not available. Please check your VLC installation.")
+            print(f"Error: {e}")
+            return
+        player.stop()
+        player_engine.set_media(audio_url)
+
+        # Set the volume, normalized for this track's loudness if it was analyzed
+        player.audio_set_volume(track_volume(track))
+        queue_loudness_analysis(track.get("id"))
+
+        # Play the next song when this one ends, and send a progress anchor
+        # whenever playback starts, pauses or stops. VLC callbacks are
+        # attached once; this only sets the Python handlers behind them.
+        player_engine.on(MEDIAPLAYER_ENDREACHED, on_song_end)
+        for event_type in PROGRESS_EVENTS:
+            player_engine.on(event_type, on_progress_event)
+
+        # Start playback
+        player.play()
+        if visualizer_enabled:
+            start_visualizer(audio_url)
+
+        # Update status
+        title = track.get("title", "Unknown Title")
+        author = track.get("author", "Unknown Artist")
+        safe_set_status(f"Now playing: {title} - {author}")
+
+        # Update UI state
+        is_playing = True
+        update_ui_playback_state()
+        update_song_info()
+
+        # Display success message
+        safe_set_status(f"Playing: {title} - {author}")
 
-            # Create a new media object from the audio URL
-            media = vlc.Media(audio_url)
+        # Warm up the next track while this one plays
+        prefetch_next_track()
 
-            # Set the media to the player
-            player.set_media(media)
+    except Exception as e:
+        safe_set_status(f"Error playing track: {e}")
+        traceback.print_exc()
 
-            # Set the volume
-            player.audio_set_volume(current_volume)
+def on_song_end(event):
+    print(f"[DEBUG] on_song_end called, current_index={current_index}")
+    # Called on a VLC thread: hand off to the Tk main thread
+    safe_set_status("Song ended, playing next track...")
+    dispatch_ui(play_next)
+
+def on_progress_event(event):
+    # VLC thread again; only the latest anchor matters
+    dispatch_ui(publish_progress, key="progress")
+
+class VisualizerTap:
+    """A silent VLC player decoding the current stream for the spectrum feed."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.analyzer = spectrum.SpectrumAnalyzer()
+        self.feed = spectrum.SpectrumFeed(self.analyzer, send_visualizer_frame)
+        self.player = engine.new_player()
+        # ctypes callbacks must stay referenced for as long as VLC may call them
+        self._play_cb = vlc.CallbackDecorators.AudioPlayCb(self._on_play)
+        self._flush_cb = vlc.CallbackDecorators.AudioFlushCb(self._on_flush)
+        self.player.audio_set_callbacks(self._play_cb, None, None, self._flush_cb, None, None)
+        self.player.audio_set_format("S16N", spectrum.SAMPLE_RATE, spectrum.CHANNELS)
+        self.feed.start()
+
+    def _on_play(self, opaque, samples, count, pts):
+        # VLC audio thread: copy the buffer out, the analysis runs on the feed thread
+        self.analyzer.feed(ctypes.string_at(samples, count * spectrum.CHANNELS * 2))
+
+    def _on_flush(self, opaque, pts):
+        self.analyzer.clear()
+
+    def play(self, audio_url):
+        self.engine.set_media(audio_url, self.player)
+        self.player.play()
+
+    def pause(self):
+        self.player.set_pause(1)
+
+    def stop(self):
+        self.player.stop()
+        self.analyzer.clear()  # One silent frame so overlay bars drop
+
+    def sync(self, position_ms, playing):
+        """Follow the audible player's position and play state."""
+        if not playing:
+            self.pause()
+            return
+        if not self.player.is_playing():
+            self.player.set_pause(0)
+        if abs(self.player.get_time() - position_ms) > VISUALIZER_SYNC_MS:
+            self.player.set_time(position_ms)
 
-            # --- FIX: Detach all previous handlers before attaching a new one ---
-            try:
-                event_manager = player.event_manager()
-                event_manager.event_detach(MEDIAPLAYER_ENDREACHED)
-            except Exception:
-                pass
+    def close(self):
+        self.feed.stop()
+        self.engine.release_player(self.player)
 
-            # Attach event to play next song when current ends
-            def on_song_end(event):
-                print(f"[DEBUG] on_song_end called, current_index={current_index}")
-                safe_set_status("Song ended, playing next track...")
-                root = safe_get_global('root')
-                if root:
-                    root.after(0, play_next)
-                else:
-                    play_next()
+def send_visualizer_frame(frame):
+    """Send a spectrum frame to the server (called on the spectrum feed thread).
 
-            try:
-                event_manager = player.event_manager()
-                event_manager.event_attach(MEDIAPLAYER_ENDREACHED, on_song_end)
-            except Exception as e:
-                print(f"Error attaching end-of-song event: {e}")
+    Unlike send_command() this doesn't log or fall back to a new WebSocket
+    connection: at 30 fps a dropped frame is cheaper than either.
+    """
+    data = {"command": "visualizer", "params": {"frame": base64.b64encode(frame).decode("ascii")}}
+    if in_process_server is not None:
+        in_process_server.send_command(data)
+    elif control_client is not None:
+        try:
+            control_client.send(json.dumps(data))
+        except OSError:
+            pass
 
-            # Start playback
-            player.play()
+def start_visualizer(audio_url):
+    """Start decoding the stream that just started playing for the visualizer."""
+    global visualizer_tap
+    try:
+        if visualizer_tap is None:
+            visualizer_tap = VisualizerTap(player_engine)
+        visualizer_tap.play(audio_url)
+    except Exception as e:
+        print(f"Visualizer unavailable: {e}")
 
-            # Update status
-            title = track.get("title", "Unknown Title")
-            author = track.get("author", "Unknown Artist")
-            safe_set_status(f"Now playing: {title} - {author}")
+def publish_progress():
+    """Send the player's position, duration and play state to the server as an anchor."""
+    global progress_anchor
 
-            # Update UI state
-            is_playing = True
-            update_ui_playback_state()
-            update_song_info()
+    if not (0 <= current_index < len(current_playlist)) or player is None:
+        return
+    try:
+        position = max(0, player.get_time())
+        duration = max(0, player.get_length())
+        playing = bool(player.is_playing())
+    except Exception as e:
+        print(f"Error reading playback position: {e}")
+        return
 
-            # Display success message
-            safe_set_status(f"Playing: {title} - {author}")
+    if visualizer_tap is not None:
+        visualizer_tap.sync(position, playing)
 
-        except Exception as e:
-            safe_set_status(f"Error playing track: {e}")
-            traceback.print_exc()
+    video_id = current_playlist[current_index].get("id", "")
+    progress_anchor = (video_id, position, playing, time.monotonic())
+    send_command("progress", {"videoId": video_id, "positionMs": position,
+                              "durationMs": duration, "playing": playing})
+
+def check_progress_drift():
+    """Resend the progress anchor if the player drifted from what overlays extrapolate."""
+    if is_shutting_down:
+        return
+    try:
+        if player is not None and progress_anchor is not None:
+            video_id, position, playing, anchored_at = progress_anchor
+            expected = position + ((time.monotonic() - anchored_at) * 1000 if playing else 0)
+            if (bool(player.is_playing()) != playing
+                    or abs(max(0, player.get_time()) - expected) > PROGRESS_DRIFT_MS):
+                publish_progress()
+            elif visualizer_tap is not None:
+                visualizer_tap.sync(max(0, player.get_time()), playing)
     except Exception as e:
-        safe_set_status(f"Playback error: {e}")
-        traceback.print_exc()
+        print(f"Error checking playback drift: {e}")
+    safe_after(PROGRESS_CHECK_MS, check_progress_drift)
 
 def toggle_play_pause():
     """Toggle between play and pause states."""
@@ -952,6 +1927,8 @@ def toggle_play_pause():
         # Pause the VLC player
         if player:
             player.pause()
+        if visualizer_tap is not None:
+            visualizer_tap.pause()
             
         # Update display state
         is_playing = False
@@ -965,6 +1942,8 @@ def stop_playback():
     # Stop the VLC player
     if player:
         player.stop()
+    if visualizer_tap is not None:
+        visualizer_tap.stop()
     
     # Update state
     is_playing = False
@@ -1045,7 +2024,10 @@ def on_playlist_item_select(event):
             
         # Update current index and play
         global current_index
-        current_index = selection[0]
+        selected_index = listbox_row_to_index(selection[0])
+        if selected_index < 0:
+            return
+        current_index = selected_index
         
         # Update display and play
         update_playlist_display()
@@ -1064,9 +2046,10 @@ def set_volume(val):
         volume = int(float(val))
         current_volume = volume
         
-        # Update VLC player volume if it exists
+        # Update VLC player volume if it exists, keeping the current track's gain
         if player:
-            player.audio_set_volume(volume)
+            track = current_playlist[current_index] if 0 <= current_index < len(current_playlist) else None
+            player.audio_set_volume(track_volume(track))
             
         # Update volume label if it exists
         volume_label = safe_get_global('volume_label')
@@ -1083,15 +2066,28 @@ def set_volume(val):
                      
 
 def start_websocket_server():
-    """Start the WebSocket server in a separate process."""
-    global ws_server_process
+    """Start the WebSocket server, in-process or in a separate process."""
+    global ws_server_process, in_process_server, server_ready
     
     try:
         # Check if server is already running
-        if ws_server_process and ws_server_process.poll() is None:
+        if (ws_server_process and ws_server_process.poll() is None) or in_process_server is not None:
             print("Server is already running")
             safe_set_status("WebSocket server already running")
             return
+        server_ready = False
+        
+        if server_mode == "inprocess":
+            from youtube_music_server import InProcessServer
+            
+            server = InProcessServer(port=server_port)
+            # start() returns as soon as the server is listening
+            if server.start(timeout=SERVER_READY_TIMEOUT):
+                in_process_server = server
+                on_server_ready(server_port)
+            else:
+                safe_set_status(f"Failed to start WebSocket server: {server.error}")
+            return
             
         # Get server script path
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -1099,27 +2095,29 @@ def start_websocket_server():
         
         # Start the server (no --host argument)
         if os.path.exists(server_script):
-            ws_server_process = subprocess.Popen([sys.executable, server_script])
+            ws_server_process = subprocess.Popen(
+                [sys.executable, server_script, "--port", str(server_port), "--ready-signal"],
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1
+            )
+            print(f"Started server with PID: {ws_server_process.pid}")
+            safe_set_status("Starting WebSocket server...")
             
-            # Check if process started successfully
-            if ws_server_process.poll() is None:  # None means still running
-                safe_set_status("WebSocket server started")
-                print(f"Started server with PID: {ws_server_process.pid}")
-                
-                # Give the server a moment to initialize
-                time.sleep(0.5)
-                
-                # Send current song information to the overlay
-                update_song_info()
-                
-                # Set a timer to check server status after a few seconds
-                root = safe_get_global('root')
-                if root:
-                    root.after(3000, check_server_status)
-            else:
-                safe_set_status("Failed to start WebSocket server")
-                print("Server process exited immediately with code:", ws_server_process.returncode)
-                ws_server_process = None
+            # Wait for the server's ready line off the UI thread
+            threading.Thread(
+                target=watch_server_process,
+                args=(ws_server_process,),
+                name="server-watch",
+                daemon=True
+            ).start()
+            # A timer rather than root.after(): at startup this runs before the Tk root exists
+            watchdog = threading.Timer(
+                SERVER_READY_TIMEOUT,
+                lambda process=ws_server_process: dispatch_ui(lambda: check_server_ready(process))
+            )
+            watchdog.daemon = True
+            watchdog.start()
         else:
             safe_set_status("Server script not found")
             print(f"Server script not found: {server_script}")
@@ -1127,24 +2125,81 @@ def start_websocket_server():
         safe_set_status(f"Error starting server: {str(e)}")
         print(f"Error starting WebSocket server: {e}")
         traceback.print_exc()
-        
-def check_server_status():
-    """Check if WebSocket server is still running after initial startup."""
-    global ws_server_process
-    if ws_server_process:
-        # Check if process is still running
-        if ws_server_process.poll() is None:
-            print("WebSocket server is running properly")
-        else:
-            print(f"WebSocket server exited with code {ws_server_process.returncode}")
-            safe_set_status(f"WebSocket server crashed (code {ws_server_process.returncode})")
+
+def watch_server_process(process):
+    """Thread function: wait for the server's ready signal, then watch for it exiting."""
+    from youtube_music_server import READY_SIGNAL
+    
+    ready = False
+    started = time.monotonic()
+    
+    # Reading stdout until EOF also keeps the pipe from filling up
+    for line in process.stdout:
+        if not ready and line.startswith(READY_SIGNAL):
+            ready = True
+            fields = line.split()
+            port = int(fields[1])
+            control_path = fields[2] if len(fields) > 2 else None
+            print(f"WebSocket server ready on port {port} after {(time.monotonic() - started) * 1000:.0f} ms")
+            dispatch_ui(lambda: on_server_ready(port, control_path))
+        elif line.strip():
+            print(f"[server] {line.rstrip()}")
+    
+    returncode = process.wait()
+    if is_shutting_down or ws_server_process is not process:
+        return
+    
+    def on_server_exit():
+        global ws_server_process, control_client
+        if ws_server_process is process:
             ws_server_process = None
+            if control_client is not None:
+                control_client.close()
+                control_client = None
+        if ready:
+            print(f"WebSocket server exited with code {returncode}")
+            safe_set_status(f"WebSocket server crashed (code {returncode})")
+        else:
+            print("Server process exited before becoming ready, code:", returncode)
+            safe_set_status("Failed to start WebSocket server")
+    
+    dispatch_ui(on_server_exit)
+
+def check_server_ready(process):
+    """Report a server process that started but never signalled readiness."""
+    if process is ws_server_process and process.poll() is None and not server_ready:
+        print(f"WebSocket server did not become ready within {SERVER_READY_TIMEOUT} s")
+        safe_set_status("WebSocket server is not responding")
+
+def on_server_ready(port, control_path=None):
+    """Called on the UI thread once the server accepts connections."""
+    global server_port, server_ready, control_client
+    server_port = port
+    server_ready = True
+    if control_path:
+        control_client = ControlClient(control_path)
+    safe_set_status("WebSocket server started")
+    
+    # Send current song information to the overlay
+    if in_process_server is not None:
+        update_song_info()
+    else:
+        scheduler.submit(update_song_info, priority=PRIORITY_INTERACTIVE,
+                         key="song info", name="send song info")
 
 def stop_websocket_server():
     """Stop the WebSocket server."""
-    global ws_server_process
+    global ws_server_process, in_process_server, control_client
     
-    if ws_server_process:
+    if control_client is not None:
+        control_client.close()
+        control_client = None
+    
+    if in_process_server is not None:
+        in_process_server.stop()
+        in_process_server = None
+        safe_set_status("WebSocket server stopped")
+    elif ws_server_process:
         try:
             ws_server_process.terminate()
             ws_server_process.wait(timeout=5)
@@ -1163,17 +2218,23 @@ def stop_websocket_server():
 
 def on_window_close():
     """Handle window close event."""
-    global is_shutting_down, player, media
+    global is_shutting_down
     try:
         print("Application shutting down...")
         is_shutting_down = True
+        print(f"Scheduler stats: {scheduler.format_stats()}")
+        scheduler.shutdown()
+        if visualizer_tap is not None:
+            visualizer_tap.close()
         stop_websocket_server()
         save_playlist_to_file()
-        if player:
-            player.stop()
-            player.release()
-        if media:
-            media.release()
+        metadata_cache.flush()
+        search_cache.flush()
+        loudness_cache.flush()
+        if library:
+            library.close()
+        player_engine.close()
+        print(f"VLC resources: {player_engine.ledger.format_stats()}")
     except Exception as e:
         print(f"Error during shutdown: {e}")
         traceback.print_exc()
@@ -1187,7 +2248,8 @@ def on_window_close():
 
 def create_ui():
     """Create the main UI."""
-    global root, status_var, now_playing_var, url_entry, playlist_listbox
+    global root, status_var, now_playing_var, url_entry, playlist_listbox, search_var
+    global yt_search_var, yt_results_listbox
     
     # Create main window
     root = tk.Tk()
@@ -1224,6 +2286,31 @@ def create_ui():
     add_playlist_button = ttk.Button(url_buttons_frame, text="Add Playlist", command=add_playlist_videos)
     add_playlist_button.pack(side=tk.LEFT, padx=5)
     
+    add_many_button = ttk.Button(url_buttons_frame, text="Add Many...", command=open_bulk_import_dialog)
+    add_many_button.pack(side=tk.LEFT, padx=5)
+    
+    sync_playlist_button = ttk.Button(url_buttons_frame, text="Sync Playlist", command=sync_playlist)
+    sync_playlist_button.pack(side=tk.LEFT, padx=5)
+    
+    # YouTube search section
+    yt_search_frame = ttk.LabelFrame(main_frame, text="Search YouTube")
+    yt_search_frame.pack(fill=tk.X, padx=5, pady=5)
+    
+    yt_search_input_frame = ttk.Frame(yt_search_frame)
+    yt_search_input_frame.pack(fill=tk.X, padx=5, pady=5)
+    
+    yt_search_var = tk.StringVar()
+    yt_search_var.trace_add("write", on_youtube_search_changed)
+    yt_search_entry = ttk.Entry(yt_search_input_frame, textvariable=yt_search_var)
+    yt_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+    
+    add_result_button = ttk.Button(yt_search_input_frame, text="Add Selected", command=add_selected_search_result)
+    add_result_button.pack(side=tk.LEFT, padx=5)
+    
+    yt_results_listbox = tk.Listbox(yt_search_frame, height=5, font=("", 10))
+    yt_results_listbox.pack(fill=tk.X, padx=5, pady=(0, 5))
+    yt_results_listbox.bind('<Double-Button-1>', add_selected_search_result)
+    
     # Now Playing section
     now_playing_frame = ttk.LabelFrame(main_frame, text="Now Playing")
     now_playing_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -1288,6 +2375,20 @@ def create_ui():
     )
     resync_button.pack(side=tk.RIGHT, padx=5)
     
+    # Search box (filters the playlist as you type)
+    search_frame = ttk.Frame(playlist_frame)
+    search_frame.pack(fill=tk.X, pady=5, padx=5, side=tk.TOP)
+    
+    ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=5)
+    search_var = tk.StringVar()
+    search_var.trace_add("write", on_search_changed)
+    search_entry = ttk.Entry(search_frame, textvariable=search_var)
+    search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+    search_entry.bind('<Escape>', lambda event: clear_search())
+    
+    clear_search_button = ttk.Button(search_frame, text="Clear", command=clear_search)
+    clear_search_button.pack(side=tk.LEFT, padx=5)
+    
     # Create scrollable playlist listbox
     playlist_scroll = ttk.Scrollbar(playlist_frame)
     playlist_scroll.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1305,6 +2406,12 @@ def create_ui():
     # Initial UI update
     update_ui_playback_state()
     
+    # Start draining the main-thread dispatch queue
+    root.after(UI_FRAME_MS, drain_ui_queue)
+    
+    # Keep overlay progress bars in step with the player
+    root.after(PROGRESS_CHECK_MS, check_progress_drift)
+    
     # Register callback for when app is fully loaded
     root.after(100, on_app_loaded)
     
@@ -1312,6 +2419,12 @@ def create_ui():
 
 # Use the integer value for MediaPlayerEndReached event (265) as fallback
 MEDIAPLAYER_ENDREACHED = getattr(getattr(vlc, 'EventType', None), 'MediaPlayerEndReached', 265)
+# Events that change what overlays should show as playback progress
+# (Playing 260, Paused 261, Stopped 262, LengthChanged 273)
+PROGRESS_EVENTS = tuple(
+    getattr(getattr(vlc, 'EventType', None), name, fallback)
+    for name, fallback in (('MediaPlayerPlaying', 260), ('MediaPlayerPaused', 261),
+                           ('MediaPlayerStopped', 262), ('MediaPlayerLengthChanged', 273)))
 
 # Main function
 if __name__ == "__main__":
@@ -1322,9 +2435,6 @@ if __name__ == "__main__":
         # Create the UI
         root = create_ui()
         
-        # Make sure initial song info is sent if there's a song loaded
-        root.after(1000, update_song_info)  # Give the server a second to start up
-        
         root.mainloop()
     except Exception as e:
         print(f"Error starting application: {e}")